@@ -0,0 +1 @@
+"""Нагрузочные замеры бэкенда. Запуск из папки back: python -m benchmarks.<имя>"""
@@ -0,0 +1,64 @@
+"""
+Стоимость проверки доступа на один запрос.
+
+Сравниваются повторный вход через authenticate_user (как раньше приходилось
+перепроверять пользователя), проверка подписи токена и проверка токена,
+уже лежащего в кэше проверенных, а также полный GET /computers без
+аутентификации и с токеном.
+"""
+import time
+
+from benchmarks.common import temp_database, drop_database
+
+from database import Functions
+from license_manager_backend import auth
+from license_manager_backend.main import create_app
+
+
+def per_call_us(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1_000_000
+
+
+def main():
+    path = temp_database(computers=1000, licenses=1000)
+    try:
+        app = create_app(INIT_DB=False, EXPIRY_SCHEDULER=False, SECRET_KEY="bench")
+        client = app.test_client()
+        Functions.add_user("bench", "bench-password")
+        token = auth.issue_tokens("bench")["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        def verify_uncached():
+            auth.verified.clear()
+            auth.verify_token(token)
+
+        rows = [
+            ("authenticate_user()", per_call_us(
+                lambda: Functions.authenticate_user("bench", "bench-password"), 20)),
+            ("verify_token(), подпись", per_call_us(verify_uncached, 20000)),
+            ("verify_token(), из кэша", per_call_us(lambda: auth.verify_token(token), 20000)),
+        ]
+
+        url = "/computers?limit=10"
+        auth.configure("bench", enabled=False)
+        without_auth = per_call_us(lambda: client.get(url), 2000)
+        auth.configure("bench", enabled=True)
+        with_auth = per_call_us(lambda: client.get(url, headers=headers), 2000)
+        assert client.get(url, headers=headers).status_code == 200
+        rows += [
+            (f"GET {url} без аутентификации", without_auth),
+            (f"GET {url} с токеном", with_auth),
+        ]
+
+        for name, value in rows:
+            print(f"{name:45} {value:10.1f} мкс")
+        print(f"Накладные расходы токена на запрос: {with_auth - without_auth:.1f} мкс")
+    finally:
+        drop_database(path)
+
+
+if __name__ == "__main__":
+    main()
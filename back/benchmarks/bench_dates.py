@@ -0,0 +1,106 @@
+"""
+Даты лицензий текстом YYYY-MM-DD (схема до миграции 6) и номером дня:
+размер базы, время миграции, запросы по диапазону дат и сборка строк.
+
+    python -m benchmarks.bench_dates --licenses 500000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date
+from itertools import islice
+
+from benchmarks.common import drop_database
+
+from database import DB, Functions, seed
+
+REPEAT = 5
+
+QUERIES = [
+    ("активные на дату (проход по таблице)",
+     "SELECT COUNT(*) FROM licenses WHERE license_start <= :today AND license_end >= :today"),
+    ("истекают в ближайшие 60 дней (индекс)",
+     "SELECT COUNT(*) FROM licenses WHERE license_end > :today AND license_end <= :soon"),
+    ("10000 строк по дате окончания",
+     "SELECT * FROM licenses WHERE license_end >= :today ORDER BY license_end LIMIT 10000"),
+]
+
+
+def median_ms(func):
+    times = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - started) * 1000)
+    return sorted(times)[REPEAT // 2]
+
+
+def file_size_mb(conn):
+    """Размер файла базы после VACUUM, МиБ."""
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(DB.DB_NAME) / 2 ** 20
+
+
+def run_queries(conn, params):
+    return {name: median_ms(lambda: conn.execute(sql, params).fetchall()) for name, sql in QUERIES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Даты лицензий: текст или номер дня")
+    parser.add_argument("--licenses", type=int, default=500_000)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_")
+    os.close(fd)
+    os.remove(path)
+    DB.DB_NAME = path
+    try:
+        DB.init_db(version=5)
+        conn = DB.get_connection()
+        rnd = random.Random(1)
+        computer_ids = seed.seed_computers(args.licenses // 10, 500, rnd)
+        rows = (
+            (computer_id, software, DB.from_day(start).isoformat(), DB.from_day(end).isoformat(), budget)
+            for computer_id, software, start, end, budget in seed.license_rows(computer_ids, args.licenses, rnd)
+        )
+        while True:
+            chunk = list(islice(rows, seed.CHUNK_SIZE))
+            if not chunk:
+                break
+            with conn:
+                conn.executemany(
+                    "INSERT INTO licenses (computer_id, software, license_start, license_end, budget) "
+                    "VALUES (?, ?, ?, ?, ?)", chunk)
+
+        today = date.today()
+        text_size = file_size_mb(conn)
+        text_times = run_queries(conn, {"today": today.isoformat(),
+                                        "soon": DB.from_day(DB.to_day(today) + 60).isoformat()})
+
+        started = time.perf_counter()
+        DB.migrate()
+        migration = time.perf_counter() - started
+        day_size = file_size_mb(conn)
+        day_times = run_queries(conn, {"today": DB.to_day(today), "soon": DB.to_day(today) + 60})
+
+        print(f"Лицензий: {args.licenses}, миграция 6: {migration:.1f} с")
+        print(f"{'':40} {'текст':>10} {'номер дня':>10}")
+        print(f"{'размер базы, МиБ':40} {text_size:10.1f} {day_size:10.1f}")
+        for name, _ in QUERIES:
+            print(f"{name + ', мс':40} {text_times[name]:10.1f} {day_times[name]:10.1f}")
+
+        limit = 10000
+        plain = median_ms(lambda: conn.execute(
+            "SELECT id, computer_id, software, license_start, license_end, budget FROM licenses LIMIT ?",
+            (limit,)).fetchall())
+        typed = median_ms(lambda: Functions.get_licenses(limit=limit))
+        print(f"\n{limit} строк: кортежи {plain:.1f} мс, get_licenses (License с date) {typed:.1f} мс")
+    finally:
+        drop_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Массовое удаление: по одному (delete_computer / delete_license в цикле,
+как клиент вызывал DELETE /computers/<id>) против delete_computers,
+delete_licenses и delete_expired_licenses пачками по DELETE_CHUNK_SIZE.
+
+Каждый способ получает свежую базу: удалённое не вернуть.
+
+    python -m benchmarks.bench_delete --computers 20000 --licenses 200000 --delete 5000
+"""
+import argparse
+import time
+
+from benchmarks.common import temp_database, drop_database
+
+from database import DB
+import database.Functions as Functions
+
+
+def timed(computers, licenses, func):
+    """Секунды на func() во временной базе; возвращает также результат"""
+    path = temp_database(computers=computers, licenses=licenses)
+    try:
+        started = time.perf_counter()
+        result = func()
+        return time.perf_counter() - started, result
+    finally:
+        drop_database(path)
+
+
+def license_ids(count):
+    with DB.get_connection() as conn:
+        return [row[0] for row in conn.execute("SELECT id FROM licenses ORDER BY id LIMIT ?", (count,))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость массового удаления")
+    parser.add_argument("--computers", type=int, default=20_000)
+    parser.add_argument("--licenses", type=int, default=200_000)
+    parser.add_argument("--delete", type=int, default=5000, help="сколько компьютеров и лицензий удалять")
+    args = parser.parse_args()
+    ids = list(range(1, args.delete + 1))
+
+    def each_computer():
+        for computer_id in ids:
+            Functions.delete_computer(computer_id)
+        return len(ids)
+
+    def each_license():
+        for license_id in license_ids(args.delete):
+            Functions.delete_license(license_id)
+        return args.delete
+
+    def each_expired():
+        with DB.get_connection() as conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM licenses WHERE license_end < ?", (DB.to_day("2025-07-01"),))]
+        for license_id in expired:
+            Functions.delete_license(license_id)
+        return len(expired)
+
+    cases = [
+        ("компьютеры: delete_computer в цикле", each_computer),
+        ("компьютеры: delete_computers", lambda: Functions.delete_computers(ids)),
+        ("лицензии: delete_license в цикле", each_license),
+        ("лицензии: delete_licenses", lambda: Functions.delete_licenses(license_ids(args.delete))),
+        ("истекшие: delete_license в цикле", each_expired),
+        ("истекшие: delete_expired_licenses", lambda: Functions.delete_expired_licenses("2025-07-01")),
+    ]
+    print(f"{'способ':40} {'с':>8}  результат")
+    for title, func in cases:
+        elapsed, result = timed(args.computers, args.licenses, func)
+        print(f"{title:40} {elapsed:8.2f}  {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Пиковая память потоковой выгрузки /licenses/export.
+
+Выгрузка прогоняется на базах разного размера; пик выделенной Python-памяти
+(tracemalloc) не должен расти вместе с числом строк.
+"""
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import temp_database, drop_database, make_client
+
+SIZES = (100_000, 1_000_000)
+
+# Допустимый рост пика памяти между самой маленькой и самой большой базой
+MAX_PEAK_RATIO = 1.5
+
+
+def export_peak(client, export_format):
+    """Читает выгрузку целиком и возвращает (строк, пик памяти в байтах, секунд)."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(f"/licenses/export?format={export_format}", buffered=False)
+    lines = 0
+    for chunk in response.response:
+        lines += chunk.count(b"\n") if isinstance(chunk, bytes) else chunk.count("\n")
+    response.close()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return lines, peak, elapsed
+
+
+def main():
+    peaks = {}
+    for size in SIZES:
+        path = temp_database(computers=10_000, licenses=size)
+        try:
+            client = make_client()
+            for export_format in ("ndjson", "csv"):
+                lines, peak, elapsed = export_peak(client, export_format)
+                peaks.setdefault(export_format, []).append(peak)
+                print(f"{export_format:6} {size:>9} строк: {lines:>9} строк вывода, "
+                      f"пик {peak / 1024:8.0f} КБ, {elapsed:6.2f} с")
+        finally:
+            drop_database(path)
+
+    failed = [fmt for fmt, values in peaks.items() if values[-1] > values[0] * MAX_PEAK_RATIO]
+    if failed:
+        print("Память растёт с числом строк:", ", ".join(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
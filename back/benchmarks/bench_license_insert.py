@@ -0,0 +1,55 @@
+"""
+Задержка добавления лицензии при 100 тысячах компьютеров.
+
+Сравнивается прежняя проверка существования компьютера (get_computers()
+и поиск в списке) с computer_exists(), а также полный POST /licenses.
+"""
+import random
+import time
+
+from benchmarks.common import temp_database, drop_database, make_client
+
+import database.Functions as Functions
+
+COMPUTERS = 100_000
+
+
+def latency_ms(func, repeat):
+    """Средняя задержка одного вызова в миллисекундах."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    path = temp_database(computers=COMPUTERS, licenses=1000)
+    try:
+        client = make_client()
+        rnd = random.Random(1)
+
+        def legacy_check():
+            computer_id = rnd.randint(1, COMPUTERS)
+            return any(computer[0] == computer_id for computer in Functions.get_computers())
+
+        def cached_check():
+            return Functions.computer_exists(rnd.randint(1, COMPUTERS))
+
+        def post_license():
+            client.post("/licenses", json={
+                "computer_id": rnd.randint(1, COMPUTERS),
+                "software": "VS Code",
+                "license_start": "2025-01-01",
+                "license_end": "2026-01-01",
+                "budget": 100,
+            })
+
+        print(f"get_computers() + any(): {latency_ms(legacy_check, 20):8.3f} мс")
+        print(f"computer_exists():       {latency_ms(cached_check, 2000):8.3f} мс")
+        print(f"POST /licenses:          {latency_ms(post_license, 500):8.3f} мс")
+    finally:
+        drop_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Стоимость хэширования паролей и пропускная способность входа.
+
+1. Время одного хэша scrypt при разных N (по нему выбирают PASSWORD_SCRYPT_N).
+2. Волна входов: THREADS потоков одновременно входят под разными
+   пользователями. Сравнивается запись last_login при каждом входе
+   (LAST_LOGIN_INTERVAL = 0) с записью не чаще раза в интервал. Хэши здесь
+   дешёвые (STORM_N), чтобы замер показывал работу с базой, а не scrypt.
+"""
+import threading
+import time
+
+from benchmarks.common import temp_database, drop_database
+
+from database import DB, Functions, Passwords
+
+COSTS = (2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16)
+USERS = 32
+THREADS = 16
+LOGINS_PER_THREAD = 200
+STORM_N = 2 ** 8
+
+
+def hash_ms(n, repeat=5):
+    Passwords.SCRYPT_N = n
+    started = time.perf_counter()
+    for _ in range(repeat):
+        Passwords.hash_password("correct horse battery staple")
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def login_storm():
+    """Возвращает (входов в секунду, число записей в users)."""
+    counters = []
+
+    def worker(index):
+        changes = 0
+        for i in range(LOGINS_PER_THREAD):
+            user = (index + i) % USERS
+            conn = DB.get_connection()
+            before = conn.total_changes
+            assert Functions.authenticate_user(f"user{user}", f"pass{user}")
+            changes += conn.total_changes - before
+        counters.append(changes)
+        DB.close_connection()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return THREADS * LOGINS_PER_THREAD / elapsed, sum(counters)
+
+
+def main():
+    print("scrypt, R=8, P=1:")
+    for n in COSTS:
+        memory = 128 * n * Passwords.SCRYPT_R // 1024
+        print(f"  N=2^{n.bit_length() - 1:<3} память {memory:>6} КБ  {hash_ms(n):8.2f} мс на хэш")
+    Passwords.SCRYPT_N = STORM_N
+
+    path = temp_database(computers=10, licenses=10)
+    try:
+        for user in range(USERS):
+            Functions.add_user(f"user{user}", f"pass{user}")
+        print(f"\nВолна входов: {THREADS} потоков x {LOGINS_PER_THREAD}, N=2^{STORM_N.bit_length() - 1}")
+        for interval in (0, Functions.LAST_LOGIN_INTERVAL):
+            Functions.LAST_LOGIN_INTERVAL = interval
+            # Первые входы пользователей записывают last_login в любом случае
+            DB.get_connection().execute("UPDATE users SET last_login = NULL")
+            DB.get_connection().commit()
+            rate, writes = login_storm()
+            print(f"  LAST_LOGIN_INTERVAL={interval:<4} {rate:8.1f} входов/с, записей в users: {writes}")
+    finally:
+        drop_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Сравнение запросов в секунду на эндпоинтах Flask до и после пула подключений.
+
+"До" — каждое обращение к базе открывает новое подключение (DB.connect),
+"после" — используется подключение потока (DB.get_connection).
+"""
+from benchmarks.common import temp_database, drop_database, make_client, measure
+
+from database import DB
+import database.Functions as Functions
+
+ENDPOINTS = [
+    "/computers",
+    "/licenses?computer_id=1",
+    "/licenses/search?room=101",
+    "/licenses/search?active_only=true&room=105",
+]
+
+
+def run(repeat=200):
+    path = temp_database(computers=500, licenses=5000)
+    try:
+        client = make_client()
+
+        results = {}
+        for mode, factory in (("per-call", DB.connect), ("pooled", DB.get_connection)):
+            Functions.get_connection = factory
+            for url in ENDPOINTS:
+                results.setdefault(url, {})[mode] = measure(lambda: client.get(url), repeat)
+        Functions.get_connection = DB.get_connection
+
+        print(f"{'endpoint':45} {'per-call rps':>14} {'pooled rps':>12}")
+        for url, row in results.items():
+            print(f"{url:45} {row['per-call']:14.1f} {row['pooled']:12.1f}")
+    finally:
+        drop_database(path)
+
+
+if __name__ == "__main__":
+    run()
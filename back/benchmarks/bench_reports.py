@@ -0,0 +1,100 @@
+"""
+Время отчётов /reports/* на столбцах в памяти.
+
+Отчёты считаются на синтетических столбцах (по умолчанию 10 млн лицензий,
+собираются сразу в numpy, без базы); отдельно замеряется полный пересчёт
+флагов цепочек и агрегатов — то, что делает перезагрузка. Загрузка из
+SQLite и дочитывание изменений (пересчёт только затронутых пар ПК+ПО или,
+если их больше PATCH_PAIRS_LIMIT, полный) замеряются на базе поменьше
+(--db-licenses), заполненной database.seed.
+
+    python -m benchmarks.bench_reports --licenses 10000000 --db-licenses 200000
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+
+from benchmarks.common import drop_database, temp_database
+
+from database import DB, Functions, Reports, seed
+from database.seed import software_catalog
+
+import random
+
+REPEAT = 5
+
+
+def synthetic_columns(n, computers=1_000_000, rooms=10_000, seed_value=1):
+    rng = np.random.default_rng(seed_value)
+    catalog, _ = software_catalog(random.Random(seed_value), 1.1)
+    softwares = [name for name, _ in catalog]
+    # Популярность ПО по Ципфу, как в database.seed
+    weights = 1 / np.arange(1, len(softwares) + 1) ** 1.1
+    software = rng.choice(len(softwares), n, p=weights / weights.sum()).astype(np.int32)
+    computer_id = rng.integers(1, computers + 1, n)
+    room = (computer_id % rooms).astype(np.int32)
+    first = DB.to_day(date(2019, 1, 1))
+    start = rng.integers(first, DB.to_day(date(2026, 6, 1)), n).astype(np.int32)
+    end = start + rng.choice([364, 729, 89], n, p=[0.7, 0.15, 0.15]).astype(np.int32)
+    budget = np.round(rng.lognormal(9, 0.8, n), 2)
+    budget[rng.random(n) < 0.25] = np.nan
+    return Reports.LicenseColumns.from_arrays(
+        np.arange(1, n + 1, dtype=np.int64), computer_id, room, software, start, end, budget,
+        [str(100 + i) for i in range(rooms)], softwares)
+
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def report_times(columns):
+    reports = [
+        ("spend by=room", lambda: columns.spend("room")),
+        ("spend by=software", lambda: columns.spend("software")),
+        ("spend by=month, 2024", lambda: columns.spend("month", "2024-01", "2024-12")),
+        ("forecast months=12", lambda: columns.renewal_forecast(12)),
+        ("overlaps limit=100", lambda: columns.overlaps(100)),
+    ]
+    for name, func in reports:
+        first = timed(func)
+        repeated = sorted(timed(func) for _ in range(REPEAT))[REPEAT // 2]
+        print(f"{name:28} первый {first:9.1f} мс   повторный (медиана) {repeated:8.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер отчётов по лицензиям")
+    parser.add_argument("--licenses", type=int, default=10_000_000)
+    parser.add_argument("--db-licenses", type=int, default=200_000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    columns = synthetic_columns(args.licenses)
+    print(f"Синтетические столбцы: {len(columns)} лицензий за {time.perf_counter() - started:.1f} с, "
+          f"{sum(buffer.nbytes for buffer in columns._buffers.values()) / 2**20:.0f} МиБ")
+    print(f"Полный пересчёт флагов и агрегатов: {timed(columns._rebuild):.0f} мс")
+    report_times(columns)
+    del columns
+
+    path = temp_database(computers=0, licenses=0)
+    try:
+        seed.generate(rooms=500, computers=args.db_licenses // 10, licenses=args.db_licenses, users=1, seed=1)
+        store = Reports.LicenseColumns()
+        print(f"\nЗагрузка {args.db_licenses} лицензий из SQLite: {timed(store.ensure_fresh):.0f} мс")
+        print(f"Проверка без изменений: {timed(store.ensure_fresh):.2f} мс")
+        Functions.update_license(int(store.ids[0]), budget=1.0)
+        print(f"Дочитывание 1 изменённой: {timed(store.ensure_fresh):.1f} мс")
+        for license_id in store.ids[1:101].tolist():
+            Functions.update_license(license_id, budget=1.0)
+        Functions.add_license(1, "Новое ПО", "2026-01-01", "2026-12-31", 100.0)
+        print(f"Дочитывание 100 изменённых и 1 новой: {timed(store.ensure_fresh):.1f} мс")
+        store.unsubscribe()
+    finally:
+        drop_database(path)
+
+
+if __name__ == "__main__":
+    main()
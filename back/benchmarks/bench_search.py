@@ -0,0 +1,55 @@
+"""
+Задержка поиска по названию ПО: LIKE '%...%' против индекса licenses_fts.
+
+Запросы имитируют ввод в строку поиска (limit=50, как у выпадающего
+списка подсказок): от коротких частых подстрок до редких точных названий.
+Выводятся p50 и p99 в миллисекундах.
+"""
+import time
+
+from benchmarks.common import temp_database, drop_database
+
+import database.Functions as Functions
+
+LICENSES = 500_000
+SUGGEST_LIMIT = 50
+
+KEYSTROKES = ["Pho", "Photo", "Photoshop 2024 build 17",
+              "MATL", "MATLAB R2024a build 3", "R2024a build 150",
+              "Предп", "Предприятие build 99", "Zoom build 7",
+              "Blender", "Kompas-3D", "Visio"]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def timings(repeat, **kwargs):
+    """Время каждого вызова search_licenses для всех запросов KEYSTROKES, в миллисекундах."""
+    result = []
+    for _ in range(repeat):
+        for term in KEYSTROKES:
+            started = time.perf_counter()
+            Functions.search_licenses(software=term, limit=SUGGEST_LIMIT, **kwargs)
+            result.append((time.perf_counter() - started) * 1000)
+    return result
+
+
+def main():
+    path = temp_database(computers=20_000, licenses=LICENSES, software_variants=200)
+    try:
+        modes = [("LIKE", False, {}), ("FTS substring", True, {}),
+                 ("FTS prefix", True, {"match": "prefix"}), ("FTS fuzzy", True, {"match": "fuzzy"})]
+        print(f"{'режим':15} {'p50, мс':>10} {'p99, мс':>10}")
+        for name, use_fts, kwargs in modes:
+            Functions.USE_FTS_SEARCH = use_fts
+            values = timings(5, **kwargs)
+            print(f"{name:15} {percentile(values, 0.5):10.2f} {percentile(values, 0.99):10.2f}")
+        Functions.USE_FTS_SEARCH = True
+    finally:
+        drop_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Сборка JSON-ответа со списком лицензий: 1 тыс., 100 тыс. и 1 млн строк.
+
+Сравниваются прежний способ (словарь на строку в цикле и json.dumps),
+serialization.success_body на стандартном json и на orjson, а также
+сжатие готового тела gzip и brotli (если установлены). База не нужна:
+строки — именованные кортежи, как из Functions.get_licenses.
+
+    python -m benchmarks.bench_serialization --rows 1000 100000 1000000
+"""
+import argparse
+import json
+import random
+import time
+from collections import namedtuple
+from datetime import date
+
+from database.DB import from_day, to_day
+from database.Functions import LICENSE_FIELDS
+from license_manager_backend import main as api, serialization
+
+REPEAT = 3
+
+License = namedtuple("License", LICENSE_FIELDS)
+
+
+def license_rows(n, seed_value=1):
+    rnd = random.Random(seed_value)
+    softwares = ["MS Office 2023", "Adobe Photoshop 2024", "КОМПАС-3D v22", "SPSS 2023", "MATLAB R2024a"]
+    first = to_day(date(2020, 1, 1))
+    rows = []
+    for license_id in range(1, n + 1):
+        start = first + rnd.randrange(2500)
+        budget = round(rnd.lognormvariate(9, 0.8), 2) if rnd.random() > 0.25 else None
+        rows.append(License(license_id, rnd.randrange(1, n // 10 + 2), rnd.choice(softwares),
+                            from_day(start), from_day(start + 364), budget))
+    return rows
+
+
+def old_body(rows):
+    """Как было: dict(zip()) в цикле, затем json.dumps с ensure_ascii=False"""
+    items = [dict(zip(LICENSE_FIELDS, row)) for row in rows]
+    response = {"success": True, "message": "Успешно", "data": items, "meta": {"next_cursor": None, "limit": len(rows)}}
+    return json.dumps(response, ensure_ascii=False, default=serialization.json_default).encode("utf-8")
+
+
+def new_body(rows):
+    items, meta = api.page_payload(rows, list(LICENSE_FIELDS), len(rows) + 1)
+    return api.success_body(items, meta=meta)
+
+
+def median_ms(func):
+    times = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - started) * 1000)
+    return sorted(times)[REPEAT // 2], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость сериализации ответа API")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    backends = ["json"] + (["orjson"] if serialization.orjson is not None else [])
+    print(f"{'строк':>8} {'способ':28} {'мс':>9} {'МиБ':>8}")
+    for n in args.rows:
+        rows = license_rows(n)
+        elapsed, body = median_ms(lambda: old_body(rows))
+        print(f"{n:8} {'json.dumps, как было':28} {elapsed:9.1f} {len(body) / 2**20:8.2f}")
+        for backend in backends:
+            serialization.use(backend)
+            elapsed, body = median_ms(lambda: new_body(rows))
+            print(f"{n:8} {'success_body, ' + backend:28} {elapsed:9.1f} {len(body) / 2**20:8.2f}")
+        for encoding in serialization.encodings():
+            elapsed, compressed = median_ms(lambda: serialization.compress(body, encoding))
+            print(f"{n:8} {'+ ' + encoding:28} {elapsed:9.1f} {len(compressed) / 2**20:8.2f}")
+    serialization.use()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Тяжёлые чтения на основной базе и на снимке (DB.snapshot_read).
+
+Поток чтения без остановки выполняет полный поиск и сводку, поток записи
+добавляет лицензии по одной. Замеряется задержка записи, число чтений,
+размер WAL-файла к концу (долгие читатели не дают контрольной точке его
+обнулить) и время обновления снимка.
+
+    python -m benchmarks.bench_snapshot --computers 20000 --licenses 500000 --seconds 10
+"""
+import argparse
+import os
+import threading
+import time
+
+from benchmarks.common import temp_database, drop_database
+
+from database import DB
+import database.Functions as Functions
+
+
+def run(seconds):
+    """(задержки записи в мс, число чтений) за seconds секунд"""
+    stop = threading.Event()
+    reads = []
+
+    def reader():
+        count = 0
+        while not stop.is_set():
+            Functions.search_licenses(active_only=True)
+            Functions.get_license_summary()
+            count += 1
+        DB.close_connection()
+        reads.append(count)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    latencies = []
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        call_started = time.perf_counter()
+        Functions.add_license(1, "Bench Snapshot", "2025-01-01", "2026-01-01", None)
+        latencies.append((time.perf_counter() - call_started) * 1000)
+        time.sleep(0.005)
+    stop.set()
+    thread.join()
+    return sorted(latencies), reads[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Чтение со снимка при параллельной записи")
+    parser.add_argument("--computers", type=int, default=20_000)
+    parser.add_argument("--licenses", type=int, default=500_000)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    path = temp_database(computers=args.computers, licenses=args.licenses)
+    try:
+        started = time.perf_counter()
+        DB.refresh_snapshot()
+        print(f"Снимок {os.path.getsize(DB.snapshot_path()) / 2**20:.1f} МиБ "
+              f"за {time.perf_counter() - started:.2f} с")
+        print(f"{'чтение':14} {'запись p50, мс':>15} {'p95':>8} {'max':>8} {'чтений':>8} {'WAL, МиБ':>9}")
+        for title, enabled in (("основная база", False), ("снимок", True)):
+            DB.SNAPSHOT_ENABLED = enabled
+            DB.get_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            latencies, reads = run(args.seconds)
+            wal = os.path.getsize(path + "-wal") / 2**20
+            print(f"{title:14} {latencies[len(latencies) // 2]:15.2f} {latencies[len(latencies) * 95 // 100]:8.2f} "
+                  f"{latencies[-1]:8.2f} {reads:8} {wal:9.2f}")
+    finally:
+        DB.SNAPSHOT_ENABLED = False
+        drop_database(path)
+        os.remove(DB.snapshot_path())
+
+
+if __name__ == "__main__":
+    main()
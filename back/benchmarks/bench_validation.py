@@ -0,0 +1,111 @@
+"""
+Стоимость проверки тела запроса: прежняя проверка из main.py (обязательные
+поля, strip, разбор дат) и схемы license_manager_backend/schemas.py —
+на корректной лицензии, на лицензии с ошибкой и на записи массового
+импорта из CSV (все значения — строки). База не нужна.
+
+    python -m benchmarks.bench_validation --repeat 200000
+"""
+import argparse
+import time
+from datetime import date
+
+from license_manager_backend import schemas
+
+LICENSE = {"computer_id": 17, "software": " MS Office 2023 ", "license_start": "2025-01-01",
+           "license_end": "2026-01-01", "budget": 15000}
+BAD_LICENSE = dict(LICENSE, license_end="2024-01-01")
+CSV_LICENSE = {"computer_id": "", "room_number": "101", "computer_name": "PC-01", "software": "MS Office 2023",
+               "license_start": "2025-01-01", "license_end": "2026-01-01", "budget": "15000.50"}
+
+
+def parse_date(value):
+    """Разбор даты из main.py до схем"""
+    if not isinstance(value, str) or len(value) != 10 or value[4] != '-' or value[7] != '-':
+        raise ValueError(f"Неверный формат даты: {value!r}")
+    return date.fromisoformat(value)
+
+
+def legacy_license(data):
+    """POST /licenses до схем: validate_required_fields и разбор полей по одному"""
+    required = ['computer_id', 'software', 'license_start', 'license_end']
+    missing = [field for field in required if field not in data or not data[field]]
+    if missing:
+        return None, f"Отсутствуют обязательные поля: {', '.join(missing)}"
+    software = data['software'].strip()
+    try:
+        license_start = parse_date(data['license_start'])
+    except ValueError:
+        return None, "Неверный формат даты начала лицензии (требуется YYYY-MM-DD)"
+    try:
+        license_end = parse_date(data['license_end'])
+    except ValueError:
+        return None, "Неверный формат даты окончания лицензии (требуется YYYY-MM-DD)"
+    if license_end <= license_start:
+        return None, "Дата окончания лицензии должна быть больше даты начала"
+    return (data['computer_id'], software, license_start, license_end, data.get('budget', 0.0)), None
+
+
+def legacy_bulk_license(item):
+    """Запись POST /licenses/bulk до схем (parse_bulk_license)"""
+    def text(name):
+        value = item.get(name)
+        return value.strip() if isinstance(value, str) else ""
+
+    license_item = {'software': text('software'), 'license_start': text('license_start'),
+                    'license_end': text('license_end'), 'budget': None, 'computer_id': None}
+    if not license_item['software']:
+        return None, "Отсутствует обязательное поле: software"
+    computer_id = item.get('computer_id')
+    if computer_id not in (None, ''):
+        try:
+            license_item['computer_id'] = int(computer_id)
+        except (TypeError, ValueError):
+            return None, "computer_id должен быть целым числом"
+    else:
+        license_item['room_number'] = text('room_number')
+        license_item['computer_name'] = text('computer_name')
+        if not license_item['room_number'] or not license_item['computer_name']:
+            return None, "Нужно указать computer_id или room_number и computer_name"
+    try:
+        license_item['license_start'] = parse_date(license_item['license_start'])
+        license_item['license_end'] = parse_date(license_item['license_end'])
+    except ValueError:
+        return None, "Неверный формат даты"
+    if license_item['license_end'] <= license_item['license_start']:
+        return None, "Дата окончания лицензии должна быть больше даты начала"
+    budget = item.get('budget')
+    if budget not in (None, ''):
+        try:
+            license_item['budget'] = float(budget)
+        except (TypeError, ValueError):
+            return None, "budget должен быть числом"
+    return license_item, None
+
+
+def per_call_us(func, data, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(data)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Стоимость проверки тела запроса")
+    parser.add_argument("--repeat", type=int, default=200_000)
+    args = parser.parse_args()
+
+    cases = [
+        ("POST /licenses", LICENSE, legacy_license, schemas.LICENSE.parse),
+        ("POST /licenses, ошибка", BAD_LICENSE, legacy_license, schemas.LICENSE.parse),
+        ("запись импорта CSV", CSV_LICENSE, legacy_bulk_license, schemas.BULK_LICENSE.parse),
+    ]
+    print(f"{'тело':26} {'как было, мкс':>14} {'схема, мкс':>11}")
+    for title, data, legacy, schema in cases:
+        assert (legacy(data)[1] is None) == (schema(data)[1] is None)
+        print(f"{title:26} {per_call_us(legacy, data, args.repeat):14.2f} "
+              f"{per_call_us(schema, data, args.repeat):11.2f}")
+
+
+if __name__ == "__main__":
+    main()
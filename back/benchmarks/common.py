@@ -0,0 +1,94 @@
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+BACK_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, BACK_DIR)
+sys.path.append(os.path.join(BACK_DIR, 'database'))
+
+from database import DB, Cache
+
+# Замеры идут мимо кэша результатов, иначе повторные вызовы измеряют только кэш.
+# Сценарии, проверяющие сам кэш, включают его явно.
+Cache.ENABLED = False
+# Замеры намеренно гоняют тяжёлые запросы — лог медленных запросов только мешает выводу
+logging.getLogger("database.slow_queries").setLevel(logging.ERROR)
+
+SOFTWARES = ["MS Office 2021", "AutoCAD 2024", "Photoshop 2024", "VS Code", "PyCharm Pro",
+             "MATLAB R2024a", "Kaspersky Endpoint", "1C:Предприятие", "SolidWorks 2024", "Zoom"]
+
+
+def temp_database(computers=1000, licenses=10000, seed=42, software_variants=1):
+    """
+    Создаёт временную базу, заполненную случайными данными, и переключает на неё DB.
+    software_variants > 1 добавляет к названиям ПО номер сборки, чтобы названий было больше.
+    """
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="bench_")
+    os.close(fd)
+    os.remove(path)
+    DB.DB_NAME = path
+    DB.init_db()
+    fill_database(computers, licenses, seed, software_variants)
+    return path
+
+
+def fill_database(computers=1000, licenses=10000, seed=42, software_variants=1):
+    """Заполняет текущую базу DB.DB_NAME случайными данными (см. temp_database)."""
+    rnd = random.Random(seed)
+    conn = DB.get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO computers (room_number, computer_name) VALUES (?, ?)",
+            ((str(100 + i // 20), f"PC-{i:06d}") for i in range(computers))
+        )
+        base = DB.to_day(date(2024, 1, 1))
+
+        def software_name():
+            name = rnd.choice(SOFTWARES)
+            if software_variants > 1:
+                name += f" build {rnd.randint(1, software_variants)}"
+            return name
+
+        def license_rows():
+            for _ in range(licenses):
+                start = base + rnd.randint(0, 730)
+                yield (
+                    rnd.randint(1, computers),
+                    software_name(),
+                    start,
+                    start + 365,
+                    rnd.choice([None, rnd.randint(10000, 30000)]),
+                )
+
+        conn.executemany(
+            "INSERT INTO licenses (computer_id, software, license_start, license_end, budget) "
+            "VALUES (?, ?, ?, ?, ?)",
+            license_rows()
+        )
+
+
+def make_client():
+    """Тестовый клиент приложения поверх текущей базы DB.DB_NAME (без токенов и планировщика)."""
+    from license_manager_backend.main import create_app
+    return create_app(INIT_DB=False, EXPIRY_SCHEDULER=False, AUTH_ENABLED=False).test_client()
+
+
+def drop_database(path):
+    """Закрывает подключение и удаляет временную базу вместе с WAL-файлами."""
+    DB.close_connection()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def measure(func, repeat):
+    """Выполняет func repeat раз и возвращает число вызовов в секунду."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - started
+    return repeat / elapsed
@@ -0,0 +1,167 @@
+"""
+Нагрузочный тест рабочего режима при разном числе воркеров.
+
+    python -m benchmarks.load_test --workers 1 2 4 --clients 32 --duration 10
+    python -m benchmarks.load_test --server sync async --workers 1 --idle 1000
+
+Для каждого сервера (sync — license_manager_backend.serve, async —
+license_manager_backend.async_app) и числа воркеров запускается отдельный
+процесс на временной базе. Открывается idle простаивающих keep-alive
+соединений, после чего клиенты в потоках в течение duration секунд
+запрашивают URLS. Выводится число запросов в секунду, число ошибок и
+сколько простаивающих соединений сервер удержал до конца прогона.
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import BACK_DIR, temp_database, drop_database
+
+from database import DB
+
+SERVERS = {
+    "sync": "license_manager_backend.serve",
+    "async": "license_manager_backend.async_app",
+}
+
+URLS = [
+    "/licenses?limit=100",
+    "/computers?limit=100",
+    "/licenses/search?room=105",
+    "/licenses/search?software=Office&limit=50",
+    "/licenses/summary",
+]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Сервер не открыл порт {port} за {timeout} с")
+
+
+def start_server(server, db_path, port, workers, threads):
+    env = dict(os.environ,
+               LICENSE_MANAGER_DB_PATH=db_path,
+               LICENSE_MANAGER_PORT=str(port),
+               LICENSE_MANAGER_HOST="127.0.0.1",
+               LICENSE_MANAGER_WORKERS=str(workers),
+               LICENSE_MANAGER_THREADS=str(threads),
+               LICENSE_MANAGER_DB_THREADS=str(threads),
+               LICENSE_MANAGER_AUTH_ENABLED="false")
+    process = subprocess.Popen([sys.executable, "-m", SERVERS[server]],
+                               cwd=BACK_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port)
+    return process
+
+
+def open_idle(port, count):
+    """Открывает count соединений, которые отправили начало запроса и молчат."""
+    sockets = []
+    for _ in range(count):
+        try:
+            sock = socket.create_connection(("127.0.0.1", port), timeout=5)
+            sock.sendall(b"GET /licenses/summary HTTP/1.1\r\nHost: 127.0.0.1\r\n")
+        except OSError:
+            break
+        sockets.append(sock)
+    return sockets
+
+
+def close_idle(sockets):
+    """Закрывает простаивающие соединения и возвращает, сколько из них сервер не разорвал."""
+    alive = 0
+    for sock in sockets:
+        try:
+            sock.setblocking(False)
+            alive += sock.recv(1) != b""
+        except BlockingIOError:
+            alive += 1
+        except OSError:
+            pass
+        sock.close()
+    return alive
+
+
+def run_clients(port, clients, duration):
+    """Возвращает (успешных ответов, ошибок) за duration секунд."""
+    counts = {"ok": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        ok = errors = 0
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        i = index
+        while time.monotonic() < deadline:
+            try:
+                conn.request("GET", URLS[i % len(URLS)])
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    ok += 1
+                else:
+                    errors += 1
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            i += 1
+        conn.close()
+        with lock:
+            counts["ok"] += ok
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts["ok"], counts["errors"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--server", choices=SERVERS, nargs="+", default=["sync"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--idle", type=int, default=0,
+                        help="простаивающих соединений на время прогона")
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    path = temp_database(computers=5000, licenses=100_000)
+    DB.close_connection()
+    try:
+        print(f"{'сервер':>6} {'воркеры':>8} {'потоки':>7} {'запросов/с':>11} {'ошибок':>7} "
+              f"{'простой':>8}")
+        for server in args.server:
+            for workers in args.workers:
+                process = start_server(server, path, args.port, workers, args.threads)
+                try:
+                    idle = open_idle(args.port, args.idle)
+                    ok, errors = run_clients(args.port, args.clients, args.duration)
+                    alive = close_idle(idle)
+                finally:
+                    process.terminate()
+                    process.wait()
+                print(f"{server:>6} {workers:>8} {args.threads:>7} {ok / args.duration:>11.1f} "
+                      f"{errors:>7} {alive:>4}/{args.idle:<4}")
+    finally:
+        drop_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Проверка планов запросов: каждый поисковый запрос из Functions.py
+должен использовать индекс, а не полный просмотр таблицы.
+
+Запросы не дублируются здесь вручную: функции вызываются на временной
+базе, выполненный SQL перехватывается через trace callback и для него
+строится EXPLAIN QUERY PLAN. Проверку выполняет tests/test_query_plans.py;
+скрипт печатает планы, в том числе ожидаемые SCAN, и завершается с кодом 1,
+если в плане встретился неожиданный SCAN.
+"""
+import sys
+
+from benchmarks.common import temp_database, drop_database
+
+from database import DB
+import database.Functions as F
+
+# Функция -> аргументы. Функции, которым по смыслу нужен весь список
+# (get_licenses() без фильтра, get_computers, get_users), сюда не входят.
+LOOKUPS = [
+    (F.get_licenses, (7,), {}),
+    (F.get_licenses, (7,), {"after": 10, "limit": 50}),
+    (F.get_licenses, (), {"after": 1000, "limit": 50, "fields": ["software"]}),
+    (F.get_computers, (), {"after": 1000, "limit": 50}),
+    (F.search_licenses, (), {"room": "105"}),
+    (F.search_licenses, (), {"active_only": True}),
+    (F.search_licenses, (), {"room": "105", "active_only": True}),
+    (F.search_licenses, (), {"software": "Office"}),
+    (F.search_licenses, (), {"software": "Offcie", "match": "fuzzy"}),
+    (F.search_licenses, (), {"software": "Auto", "match": "prefix", "room": "105"}),
+    (F.get_computer_by_name, ("105", "PC-000100"), {}),
+    (F.get_licenses_for_computer, ("105", "PC-000100"), {}),
+    (F.get_licenses_for_room, ("105",), {}),
+    (F.get_room_tree, ("105",), {}),
+    (F.get_room_tree, ("105", "PC-000100"), {}),
+    (F.get_room_trees, (), {"after": "104", "limit": 5}),
+    (F.count_licenses, (), {}),
+    (F.add_license_by_room, ("105", "PC-000100", "VS Code", "2025-01-01", "2026-01-01", None), {}),
+    (F.update_license_by_details, ("105", "PC-000100", "VS Code", "2025-02-01", "2026-02-01"), {}),
+    (F.update_license, (1,), {"budget": 100}),
+    (F.update_license, (1,), {"license_end": "2030-01-01"}),
+    (F.update_licenses, ([(1, {"license_start": "2024-01-02"}), (2, {"software": "VS Code"})],), {}),
+    (F.delete_license, (2,), {}),
+    (F.delete_computer, (3,), {}),
+    (F.delete_licenses, ([4, 5],), {}),
+    (F.delete_computers, ([6, 7],), {}),
+    (F.delete_room, ("106",), {}),
+    (F.delete_expired_licenses, ("2024-03-01",), {}),
+    (F.get_expiring_licenses, (60,), {}),
+    (F.get_licenses_by_ids, ([5, 10, 15],), {}),
+    (F.record_license_events, ([(5, 60, "2026-01-01")],), {}),
+    (F.claim_undelivered_events, (), {}),
+    (F.release_events, ([1],), {}),
+    (F.mark_events_delivered, ([1],), {}),
+    (F.get_report_rows_by_ids, ([5, 10, 15],), {}),
+    (F.get_changes, (0,), {}),
+]
+
+# Запросы, для которых SCAN ожидаем: запрос короче трёх символов идёт через LIKE,
+# пересчёт сводки проходит по всей таблице один раз в сутки, шкала истечения
+# читает все даты окончания (по индексу) при пересинхронизации, очистка журнала
+# изменений просматривает его начало до первой свежей записи
+KNOWN_SCANS = [
+    (F.search_licenses, (), {"software": "Of"}),
+    (F.refresh_license_summary, (), {}),
+    (F.get_license_ends, (), {}),
+    (F.trim_changes, (), {}),
+]
+
+
+def capture_statements(func, args, kwargs):
+    """Выполняет функцию и возвращает список выполненных ею SQL-запросов."""
+    statements = []
+    conn = DB.get_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        func(*args, **kwargs)
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in statements
+            if sql.lstrip().split(None, 1)[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE")]
+
+
+def explain(sql):
+    """Возвращает строки EXPLAIN QUERY PLAN для запроса."""
+    rows = DB.get_connection().execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+    return [row[3] for row in rows]
+
+
+def is_scan(detail):
+    """SCAN таблицы без индекса (SCAN ... USING INDEX считается допустимым)."""
+    return detail.startswith("SCAN") and "USING" not in detail and "VIRTUAL TABLE" not in detail
+
+
+def check(lookups):
+    failures = []
+    for func, args, kwargs in lookups:
+        for sql in capture_statements(func, args, kwargs):
+            plan = explain(sql)
+            if any(is_scan(detail) for detail in plan):
+                failures.append((func.__name__, " ".join(sql.split()), plan))
+    return failures
+
+
+def main():
+    path = temp_database(computers=2000, licenses=20000)
+    try:
+        F.refresh_license_summary()
+        failures = check(LOOKUPS)
+        for name, sql, plan in failures:
+            print(f"SCAN в {name}:\n  {sql}\n  " + "\n  ".join(plan))
+        for name, sql, plan in check(KNOWN_SCANS):
+            print(f"(ожидаемо) SCAN в {name}: " + "; ".join(plan))
+        print("OK" if not failures else f"Найдено запросов с SCAN: {len(failures)}")
+        return 1 if failures else 0
+    finally:
+        drop_database(path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
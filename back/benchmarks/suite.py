@@ -0,0 +1,419 @@
+"""
+Набор замеров: каждая функция Functions.py и каждый маршрут main.py.
+
+    python -m benchmarks.suite --scale small
+    python -m benchmarks.suite --scale medium --output before.json
+    python -m benchmarks.suite --compare before.json after.json
+
+База создаётся генератором database.seed (размеры — SCALES) или берётся
+готовая (--db, например заранее сгенерированная на 10 млн лицензий; в неё
+будут записаны тестовые строки). Для каждого случая — медиана, p95 и
+минимум времени в миллисекундах; результаты сохраняются в JSON.
+--compare сравнивает два файла и завершается с кодом 1, если медиана
+какого-либо случая выросла больше чем на --threshold.
+
+Функции и маршруты без замера перечисляются в конце прогона: новый код
+должен добавлять свой случай в function_cases / route_cases.
+"""
+import argparse
+import inspect
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import BACK_DIR, drop_database
+
+from database import DB, seed
+import database.Functions as F
+
+SCALES = {
+    "small": dict(rooms=100, computers=5_000, licenses=50_000),
+    "medium": dict(rooms=1_000, computers=100_000, licenses=1_000_000),
+    "large": dict(rooms=10_000, computers=1_000_000, licenses=10_000_000),
+}
+
+# Каждый случай выполняется, пока не наберётся MIN_TIME секунд или MAX_REPEAT повторов
+MIN_TIME = 0.3
+MIN_REPEAT = 5
+MAX_REPEAT = 200
+
+
+class Case:
+    """
+    Замеряемый вызов. prepare (не замеряется) вызывается перед каждым повтором
+    и возвращает аргументы для run — так удаление получает заранее созданную строку.
+    """
+
+    def __init__(self, name, run, prepare=None, max_repeat=MAX_REPEAT):
+        self.name = name
+        self.run = run
+        self.prepare = prepare
+        self.max_repeat = max_repeat
+
+    def measure(self):
+        timings = []
+        started = time.perf_counter()
+        while len(timings) < self.max_repeat and (
+                len(timings) < MIN_REPEAT or time.perf_counter() - started < MIN_TIME):
+            args = self.prepare() if self.prepare else ()
+            call_started = time.perf_counter()
+            self.run(*args)
+            timings.append((time.perf_counter() - call_started) * 1000)
+        timings.sort()
+        return {
+            "median_ms": statistics.median(timings),
+            "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+            "min_ms": timings[0],
+            "repeat": len(timings),
+        }
+
+
+# Лицензии, которые создают случаи удаления истекших: раньше любых данных seed
+EXPIRED_END = "2000-01-01"
+EXPIRED_BEFORE = "2000-01-02"
+
+
+class Context:
+    """Данные для построения случаев: размеры базы, случайные id и уникальные имена."""
+
+    def __init__(self, seed_value=1):
+        conn = DB.get_connection()
+        self.rnd = random.Random(seed_value)
+        self.max_computer = conn.execute("SELECT MAX(id) FROM computers").fetchone()[0]
+        self.max_license = conn.execute("SELECT MAX(id) FROM licenses").fetchone()[0]
+        self.rooms = [row[0] for row in conn.execute("SELECT DISTINCT room_number FROM computers")]
+        self._counter = itertools.count(1)
+        self._tag = datetime.now().strftime("%H%M%S")
+
+    def unique(self, prefix):
+        return f"{prefix}-{self._tag}-{next(self._counter)}"
+
+    def computer_id(self):
+        return self.rnd.randint(1, self.max_computer)
+
+    def license_id(self):
+        return self.rnd.randint(1, self.max_license)
+
+    def room(self):
+        return self.rnd.choice(self.rooms)
+
+    def computer(self):
+        """(аудитория, имя) существующего компьютера."""
+        row = DB.get_connection().execute(
+            "SELECT room_number, computer_name FROM computers WHERE id >= ? ORDER BY id LIMIT 1",
+            (self.computer_id(),)
+        ).fetchone()
+        return row
+
+    def new_computer(self):
+        return F.add_computer(self.room(), self.unique("BENCH"))
+
+    def new_license(self, computer_id=None, software="Bench Suite"):
+        return F.add_license(computer_id or self.computer_id(), software,
+                             "2025-01-01", "2026-01-01", 1000)
+
+    def new_room(self, computers=20):
+        """Новая аудитория с компьютерами по одной лицензии; (аудитория, id компьютеров)"""
+        room = self.unique("BROOM")
+        ids = [result["id"] for result in F.add_computers_bulk(
+            [(room, f"PC-{index}") for index in range(computers)])]
+        F.add_licenses_bulk([{"computer_id": computer_id, "software": "Bench Delete", "license_start": "2025-01-01",
+                              "license_end": "2026-01-01", "budget": 100} for computer_id in ids])
+        return room, ids
+
+    def new_licenses(self, count=100, end="2026-01-01"):
+        """id новых лицензий; end в прошлом — для удаления истекших (граница EXPIRED_BEFORE)"""
+        return [F.add_license(self.computer_id(), "Bench Delete", "1999-01-01", end, None) for _ in range(count)]
+
+    def license_item(self):
+        return {"computer_id": self.computer_id(), "software": "Bench Bulk",
+                "license_start": "2025-01-01", "license_end": "2026-01-01", "budget": 100}
+
+
+def function_cases(ctx):
+    today = date.today()
+    soon = (today + timedelta(days=30)).isoformat()
+
+    def pc_with_license():
+        room, name = ctx.computer()
+        F.add_license_by_room(room, name, "Bench By Room", "2025-01-01", "2026-01-01", None)
+        return room, name
+
+    return [
+        Case("project_fields", lambda: F.project_fields(F.LICENSE_FIELDS, ["software", "budget"])),
+        Case("add_user", lambda: F.add_user(ctx.unique("bench"), "bench-password"), max_repeat=10),
+        Case("authenticate_user", lambda: F.authenticate_user("user1", "pass1"), max_repeat=10),
+        Case("get_users", lambda: F.get_users(limit=1000)),
+        Case("revoke_token", lambda: F.revoke_token(ctx.unique("jti"), int(time.time()) + 60)),
+        Case("get_revoked_tokens", lambda: F.get_revoked_tokens(0)),
+        Case("computer_exists", lambda: F.computer_exists(ctx.computer_id())),
+        Case("forget_computer", lambda: F.forget_computer(ctx.computer_id())),
+        Case("add_computer", lambda: ctx.new_computer()),
+        Case("get_computers", lambda: F.get_computers(after=ctx.computer_id(), limit=1000)),
+        Case("delete_computer", F.delete_computer, prepare=lambda: (ctx.new_computer(),)),
+        Case("delete_computers(20)", F.delete_computers, prepare=lambda: (ctx.new_room()[1],), max_repeat=20),
+        Case("delete_room", F.delete_room, prepare=lambda: (ctx.new_room()[0],), max_repeat=20),
+        Case("subscribe_license_changes", lambda: F.subscribe_license_changes(print)),
+        Case("unsubscribe_license_changes", lambda: F.unsubscribe_license_changes(print)),
+        Case("add_license", lambda: ctx.new_license()),
+        Case("get_licenses", lambda: F.get_licenses(after=ctx.license_id(), limit=1000)),
+        Case("get_licenses(computer_id)", lambda: F.get_licenses(ctx.computer_id())),
+        Case("update_license", lambda: F.update_license(ctx.license_id(), budget=ctx.rnd.randint(1, 9999))),
+        Case("update_licenses(1000)", lambda: F.update_licenses(
+            [(ctx.license_id(), {"budget": ctx.rnd.randint(1, 9999)}) for _ in range(1000)]), max_repeat=20),
+        Case("delete_license", F.delete_license, prepare=lambda: (ctx.new_license(),)),
+        Case("delete_licenses(100)", F.delete_licenses, prepare=lambda: (ctx.new_licenses(),), max_repeat=20),
+        Case("delete_expired_licenses(100)", lambda ids: F.delete_expired_licenses(EXPIRED_BEFORE),
+             prepare=lambda: (ctx.new_licenses(end=EXPIRED_END),), max_repeat=20),
+        Case("search_licenses(room)", lambda: F.search_licenses(room=ctx.room())),
+        Case("search_licenses(software)", lambda: F.search_licenses(software="Office", limit=50)),
+        Case("search_licenses(fuzzy)", lambda: F.search_licenses(software="Ofice", match="fuzzy", limit=50)),
+        Case("search_licenses(active_only)", lambda: F.search_licenses(room=ctx.room(), active_only=True)),
+        Case("iter_search_licenses", lambda: sum(1 for _ in F.iter_search_licenses(room=ctx.room()))),
+        Case("refresh_license_summary", F.refresh_license_summary, max_repeat=10),
+        Case("count_licenses", F.count_licenses),
+        Case("get_license_summary", F.get_license_summary, max_repeat=20),
+        Case("get_computer_by_name", lambda: F.get_computer_by_name(*ctx.computer())),
+        Case("get_licenses_for_computer", lambda: F.get_licenses_for_computer(*ctx.computer())),
+        Case("get_licenses_for_room", lambda: F.get_licenses_for_room(ctx.room())),
+        Case("get_all_rooms", F.get_all_rooms),
+        Case("get_room_trees", lambda: F.get_room_trees(limit=20)),
+        Case("get_room_tree", lambda: F.get_room_tree(ctx.room())),
+        Case("add_license_by_room", lambda: F.add_license_by_room(
+            *ctx.computer(), "Bench By Room", "2025-01-01", "2026-01-01", None)),
+        Case("update_license_by_details", lambda room, name: F.update_license_by_details(
+            room, name, "Bench By Room", "2025-02-01", "2026-02-01"), prepare=pc_with_license),
+        Case("add_computers_bulk(1000)", lambda: F.add_computers_bulk(
+            [{"room_number": ctx.room(), "computer_name": ctx.unique("BULK")} for _ in range(1000)]),
+            max_repeat=20),
+        Case("add_licenses_bulk(1000)", lambda: F.add_licenses_bulk(
+            [ctx.license_item() for _ in range(1000)]), max_repeat=20),
+        Case("get_license_ends", F.get_license_ends, max_repeat=10),
+        Case("get_licenses_by_ids(100)", lambda: F.get_licenses_by_ids(
+            [ctx.license_id() for _ in range(100)])),
+        Case("get_expiring_licenses(60)", lambda: F.get_expiring_licenses(60)),
+        Case("record_license_events", lambda: F.record_license_events(
+            [(ctx.license_id(), 60, soon)])),
+        Case("get_license_events", lambda: F.get_license_events(limit=1000)),
+        # lease=-1: уже захваченные прошлыми повторами события берутся снова
+        Case("claim_undelivered_events", lambda: F.claim_undelivered_events(100, lease=-1)),
+        Case("release_events", lambda: F.release_events(
+            row[0] for row in F.claim_undelivered_events(10, lease=-1))),
+        Case("mark_events_delivered", lambda: F.mark_events_delivered(
+            row[0] for row in F.claim_undelivered_events(10, lease=-1))),
+        Case("get_last_change_seq", F.get_last_change_seq),
+        Case("get_changes", lambda: F.get_changes(max(F.get_last_change_seq() - 1000, 0))),
+        Case("wait_for_changes", lambda: F.wait_for_changes(0, 0)),
+        Case("trim_changes", F.trim_changes, max_repeat=10),
+        Case("iter_report_rows", lambda: sum(len(rows) for rows in F.iter_report_rows()), max_repeat=10),
+        Case("get_report_rows_by_ids(100)", lambda: F.get_report_rows_by_ids(
+            [ctx.license_id() for _ in range(100)])),
+    ]
+
+
+def route_cases(ctx, client, headers):
+    def get(url):
+        return lambda: client.get(url() if callable(url) else url, headers=headers)
+
+    def post_json(url, body):
+        return lambda: client.post(url, json=body() if callable(body) else body, headers=headers)
+
+    def login_tokens():
+        return client.post("/auth/login", json={"login": "user1", "password": "pass1"}).get_json()["data"]
+
+    def new_license_body():
+        return {"computer_id": ctx.computer_id(), "software": "Bench Route",
+                "license_start": "2025-01-01", "license_end": "2026-01-01", "budget": 100}
+
+    return [
+        Case("GET /", get("/")),
+        Case("POST /auth/register", post_json("/auth/register", lambda: {
+            "login": ctx.unique("route"), "password": "bench-password"}), max_repeat=10),
+        Case("POST /auth/login", post_json("/auth/login", {"login": "user1", "password": "pass1"}),
+             max_repeat=10),
+        Case("POST /auth/refresh", lambda tokens: client.post(
+            "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}),
+            prepare=lambda: (login_tokens(),), max_repeat=10),
+        Case("POST /auth/logout", lambda tokens: client.post(
+            "/auth/logout", headers={"Authorization": f"Bearer {tokens['access_token']}"}),
+            prepare=lambda: (login_tokens(),), max_repeat=10),
+        Case("GET /cache/stats", get("/cache/stats")),
+        Case("GET /metrics", get("/metrics")),
+        Case("GET /users", get("/users")),
+        Case("POST /users", post_json("/users", lambda: {
+            "login": ctx.unique("route"), "password": "bench-password"}), max_repeat=10),
+        Case("GET /computers", get(lambda: f"/computers?after={ctx.computer_id()}&limit=100")),
+        Case("POST /computers", post_json("/computers", lambda: {
+            "room_number": ctx.room(), "computer_name": ctx.unique("ROUTE")})),
+        Case("POST /computers/bulk", post_json("/computers/bulk", lambda: [
+            {"room_number": ctx.room(), "computer_name": ctx.unique("RBULK")} for _ in range(500)]),
+            max_repeat=20),
+        Case("DELETE /computers/<int:computer_id>", lambda computer_id: client.delete(
+            f"/computers/{computer_id}", headers=headers), prepare=lambda: (ctx.new_computer(),)),
+        Case("DELETE /computers", lambda ids: client.delete("/computers", json=ids, headers=headers),
+             prepare=lambda: (ctx.new_room()[1],), max_repeat=20),
+        Case("GET /rooms", get("/rooms?limit=20")),
+        Case("GET /rooms/<room_number>", get(lambda: f"/rooms/{ctx.room()}")),
+        Case("GET /rooms/<room_number>/computers/<computer_name>/licenses",
+             get(lambda: "/rooms/{}/computers/{}/licenses".format(*ctx.computer()))),
+        Case("DELETE /rooms/<room_number>", lambda room: client.delete(f"/rooms/{room}", headers=headers),
+             prepare=lambda: (ctx.new_room()[0],), max_repeat=20),
+        Case("GET /licenses", get(lambda: f"/licenses?after={ctx.license_id()}&limit=100")),
+        Case("POST /licenses", post_json("/licenses", new_license_body)),
+        Case("POST /licenses/bulk", post_json("/licenses/bulk", lambda: [
+            ctx.license_item() for _ in range(500)]), max_repeat=20),
+        Case("PUT /licenses/<int:license_id>", lambda: client.put(
+            f"/licenses/{ctx.license_id()}", json={"budget": 500}, headers=headers)),
+        Case("PATCH /licenses", lambda: client.patch("/licenses", json=[
+            {"id": ctx.license_id(), "budget": 500} for _ in range(500)], headers=headers), max_repeat=20),
+        Case("DELETE /licenses/<int:license_id>", lambda license_id: client.delete(
+            f"/licenses/{license_id}", headers=headers), prepare=lambda: (ctx.new_license(),)),
+        Case("DELETE /licenses", lambda ids: client.delete("/licenses", json=ids, headers=headers),
+             prepare=lambda: (ctx.new_licenses(),), max_repeat=20),
+        Case("DELETE /licenses?expired_before", lambda ids: client.delete(
+            f"/licenses?expired_before={EXPIRED_BEFORE}", headers=headers),
+            prepare=lambda: (ctx.new_licenses(end=EXPIRED_END),), max_repeat=20),
+        Case("GET /licenses/search", get(lambda: f"/licenses/search?room={ctx.room()}")),
+        Case("GET /licenses/search?software", get("/licenses/search?software=Office&limit=50")),
+        Case("GET /licenses/export", get(lambda: f"/licenses/export?room={ctx.room()}")),
+        Case("GET /licenses/summary", get("/licenses/summary")),
+        Case("GET /licenses/summary?details", get("/licenses/summary?details=true"), max_repeat=20),
+        Case("GET /licenses/expiring", get("/licenses/expiring?days=30")),
+        Case("GET /licenses/events", get("/licenses/events?limit=100")),
+        Case("GET /changes", get(lambda: f"/changes?since={max(F.get_last_change_seq() - 100, 0)}")),
+        Case("GET /reports/spend", get("/reports/spend?by=room")),
+        Case("GET /reports/spend?month", get("/reports/spend?by=month&from=2024-01&to=2024-12")),
+        Case("GET /reports/forecast", get("/reports/forecast?months=12")),
+        Case("GET /reports/overlaps", get("/reports/overlaps?limit=100")),
+    ]
+
+
+def uncovered(function_names, route_names, app):
+    """Публичные функции Functions.py и маршруты приложения, для которых нет случая."""
+    covered = {name.split("(")[0] for name in function_names}
+    functions = [name for name, func in inspect.getmembers(F, inspect.isfunction)
+                 if func.__module__ == F.__name__ and not name.startswith("_") and name not in covered]
+    covered_routes = {name.split("?")[0] for name in route_names}
+    routes = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == "static":
+            continue
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            if f"{method} {rule.rule}" not in covered_routes:
+                routes.append(f"{method} {rule.rule}")
+    return functions, routes
+
+
+def run_suite(args):
+    from license_manager_backend.main import create_app
+    from license_manager_backend import auth
+
+    if args.db:
+        path, temporary = args.db, False
+        DB.DB_NAME = path
+        DB.init_db()
+    else:
+        fd, path = tempfile.mkstemp(suffix=".db", prefix="suite_")
+        os.close(fd)
+        os.remove(path)
+        temporary = True
+        DB.DB_NAME = path
+        started = time.perf_counter()
+        counts = seed.generate(seed=42, users=5, **SCALES[args.scale])
+        print(f"База {args.scale}: {counts} за {time.perf_counter() - started:.1f} с", flush=True)
+
+    try:
+        app = create_app(INIT_DB=False, EXPIRY_SCHEDULER=False, SECRET_KEY="suite")
+        client = app.test_client()
+        ctx = Context()
+        headers = {"Authorization": f"Bearer {auth.issue_tokens('user1')['access_token']}"}
+
+        functions = function_cases(ctx)
+        routes = route_cases(ctx, client, headers)
+        results = {}
+        selected = [("function", case) for case in functions] + [("route", case) for case in routes]
+        for kind, case in selected:
+            if args.filter and args.filter not in case.name:
+                continue
+            key = f"{kind}:{case.name}"
+            results[key] = case.measure()
+            print(f"{key:55} {results[key]['median_ms']:10.3f} мс  p95 {results[key]['p95_ms']:10.3f}",
+                  flush=True)
+
+        missing_functions, missing_routes = uncovered(
+            [case.name for case in functions], [case.name for case in routes], app)
+        if missing_functions or missing_routes:
+            print("Без замера:", ", ".join(missing_functions + missing_routes))
+        return {
+            "meta": {
+                "scale": "custom" if args.db else args.scale,
+                "db": args.db,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "machine": platform.machine(),
+            },
+            "results": results,
+        }
+    finally:
+        if temporary:
+            drop_database(path)
+
+
+def compare(old_path, new_path, threshold):
+    """Печатает изменение медиан и возвращает число регрессий."""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)["results"]
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)["results"]
+    regressions = 0
+    print(f"{'случай':55} {'было, мс':>10} {'стало, мс':>10} {'изменение':>10}")
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key]["median_ms"], new[key]["median_ms"]
+        change = after / before - 1 if before else 0.0
+        mark = ""
+        if change > threshold:
+            regressions += 1
+            mark = "  регрессия"
+        print(f"{key:55} {before:10.3f} {after:10.3f} {change:+10.1%}{mark}")
+    for key in sorted(new.keys() - old.keys()):
+        print(f"{key:55} {'—':>10} {new[key]['median_ms']:10.3f}")
+    print(f"Регрессий: {regressions}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--db", help="готовая база вместо сгенерированной")
+    parser.add_argument("--filter", help="только случаи, в названии которых есть эта строка")
+    parser.add_argument("--output", help="куда сохранить JSON (по умолчанию benchmarks/results/)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="допустимый рост медианы при сравнении (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    if args.compare:
+        return 1 if compare(*args.compare, args.threshold) else 0
+
+    report = run_suite(args)
+    output = args.output or os.path.join(
+        BACK_DIR, "benchmarks", "results",
+        f"{report['meta']['scale']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+# Кэш результатов функций чтения из Functions.py.
+# Запись в таблицу сбрасывает все результаты, помеченные именем этой таблицы.
+ENABLED = True
+MAX_ENTRIES = 1024
+# Время жизни записи в секундах. Ограничивает устаревание, когда данные
+# меняет другой процесс, и сдвиг дат (active_only, сводка) после полуночи.
+TTL = 30.0
+
+
+class ResultCache:
+    """
+    LRU-кэш с ограничением размера и временем жизни записей.
+
+    Сброс по тегам: у каждого тега есть номер поколения, запись хранит
+    поколения своих тегов на момент начала чтения. Если после этого тег
+    сбросили, запись считается устаревшей — даже если чтение завершилось
+    уже после записи в базу.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def generations(self, tags):
+        """Текущие поколения тегов — снимаются до выполнения запроса."""
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def get(self, key, tags):
+        """Возвращает (True, значение) при попадании, иначе (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, generations, expires = entry
+                if expires > time.monotonic() and generations == self.generations(tags):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, generations, value):
+        with self._lock:
+            self._entries[key] = (value, generations, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tags):
+        """Сбрасывает все записи с указанными тегами."""
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": ENABLED,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+cache = ResultCache()
+
+
+def _normalize(value):
+    """Приводит аргументы к хешируемому виду (списки полей и т.п.)."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _normalize(item)) for key, item in value.items()))
+    return value
+
+
+def cached(*tags, skip=None):
+    """
+    Кэширует результат функции чтения по нормализованным аргументам.
+
+    tags — таблицы, от которых зависит результат. Возвращаемые списки
+    общие для всех вызывающих, изменять их нельзя. skip() -> True — вызов
+    идёт мимо кэша (не читает и не сохраняет результат).
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED or (skip is not None and skip()):
+                return func(*args, **kwargs)
+            key = (func.__qualname__, _normalize(args), _normalize(kwargs))
+            hit, value = cache.get(key, tags)
+            if hit:
+                return value
+            generations = cache.generations(tags)
+            value = func(*args, **kwargs)
+            cache.set(key, generations, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidate(*tags):
+    """Сбрасывает кэш для таблиц после записи в них."""
+    cache.invalidate(*tags)
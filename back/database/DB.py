@@ -1,15 +1,476 @@
+import inspect
+import logging
+import os
 import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime
+from functools import lru_cache, wraps
+
+try:
+    from . import Metrics
+except ImportError:  # запуск как скрипта из папки database
+    import Metrics
 
 DB_NAME = "university.db"
 
+# Размер кэша подготовленных выражений на одно подключение
+CACHED_STATEMENTS = 256
+
+# Настройки, применяемые к каждому новому подключению
+PRAGMAS = (
+    ("journal_mode", "WAL"),        # читатели не блокируются писателем
+    ("synchronous", "NORMAL"),      # в режиме WAL безопасно и без fsync на каждый коммит
+    ("cache_size", -20000),         # ~20 МБ страничного кэша
+    ("mmap_size", 268435456),       # 256 МБ отображения файла в память
+    ("temp_store", "MEMORY"),
+    ("foreign_keys", "ON"),         # проверка computer_id и ON DELETE CASCADE
+)
+
+# Профилирование запросов: время и число строк каждого запроса в Metrics,
+# запросы дольше SLOW_QUERY_MS — в лог database.slow_queries вместе с планом.
+# Выключенное профилирование (или Metrics.ENABLED = False) — обычное подключение
+# sqlite3 без обёрток.
+PROFILE_SQL = True
+SLOW_QUERY_MS = 100
+# Сколько символов текста запроса попадает в метку метрики
+QUERY_LABEL_LENGTH = 120
+
+slow_query_log = logging.getLogger("database.slow_queries")
+
+_local = threading.local()
+_query_labels = {}
+
+
+def _query_label(sql):
+    label = _query_labels.get(sql)
+    if label is None:
+        label = " ".join(sql.split())[:QUERY_LABEL_LENGTH]
+        if len(_query_labels) < 10_000:  # тексты запросов с подставленными значениями не копим
+            _query_labels[sql] = label
+    return label
+
+
+def _log_slow_query(conn, sql, params, elapsed, rows):
+    plan = []
+    if params is not None:
+        try:
+            plan = [row[3] for row in sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, params)]
+        except sqlite3.Error:
+            pass
+    slow_query_log.warning(
+        "Медленный запрос: %.1f мс, строк %s\n%s\nПлан:\n  %s",
+        elapsed * 1000, rows, sql.strip(), "\n  ".join(plan) or "—"
+    )
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """
+    Курсор, замеряющий запросы. Время SELECT складывается из execute и всех
+    fetch*, запрос учитывается, когда строки выбраны (fetchall, fetchone,
+    неполный fetchmany), при следующем execute или при закрытии курсора.
+    """
+    _pending = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        elapsed = time.perf_counter() - started
+        if self.description is None:
+            self._record(sql, parameters, elapsed, max(self.rowcount, 0))
+        else:
+            self._pending = [sql, parameters, elapsed, 0]
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._record(sql, None, time.perf_counter() - started, max(self.rowcount, 0))
+        return self
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._account(started, 0 if row is None else 1, True)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._account(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._account(started, len(rows), True)
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _account(self, started, rows, done):
+        pending = self._pending
+        if pending is None:
+            return
+        pending[2] += time.perf_counter() - started
+        pending[3] += rows
+        if done:
+            self._finish()
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            self._record(*pending)
+
+    def _record(self, sql, params, elapsed, rows):
+        label = _query_label(sql)
+        Metrics.sql_duration.observe(elapsed, label)
+        Metrics.sql_rows.observe(rows, label)
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            Metrics.sql_slow.inc(label)
+            _log_slow_query(self.connection, sql, params, elapsed, rows)
+
+
+class ProfilingConnection(sqlite3.Connection):
+    """Подключение, все запросы которого (в том числе conn.execute) идут через ProfilingCursor."""
+
+    def cursor(self, factory=ProfilingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def profiling_enabled():
+    return PROFILE_SQL and Metrics.ENABLED
+
+
+def connect():
+    """Открывает новое подключение к базе данных с нужными настройками."""
+    factory = ProfilingConnection if profiling_enabled() else sqlite3.Connection
+    conn = sqlite3.connect(DB_NAME, cached_statements=CACHED_STATEMENTS, factory=factory)
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
 
 def get_connection():
-    """Создаёт подключение к базе данных."""
-    return sqlite3.connect(DB_NAME)
+    """
+    Возвращает подключение текущего потока.
+
+    Подключение открывается один раз на поток и переиспользуется,
+    поэтому кэш подготовленных выражений и страничный кэш не теряются
+    между запросами. Использование через `with` по-прежнему
+    фиксирует или откатывает транзакцию, но не закрывает подключение.
+    Внутри функции snapshot_read возвращается подключение к снимку.
+    """
+    snapshot = getattr(_local, "snapshot", None)
+    if snapshot is not None:
+        # Внутри функции, помеченной snapshot_read (см. «Снимок для отчётов»)
+        return snapshot
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.db_name != DB_NAME or _local.profiled != profiling_enabled():
+        close_connection()
+        conn = connect()
+        _local.conn = conn
+        _local.db_name = DB_NAME
+        _local.profiled = profiling_enabled()
+    return conn
+
+
+def close_connection():
+    """Закрывает подключение текущего потока, если оно было открыто."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+def _reset_after_fork():
+    """
+    Дочерний процесс (воркер WSGI-сервера) не должен пользоваться подключением,
+    открытым в родителе, — забываем его, не закрывая.
+    """
+    global _local
+    _local = threading.local()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# ---------------- Снимок для отчётов ---------------- #
+
+# Тяжёлые чтения (поиск, выгрузка, сводка, полный список лицензий) можно
+# направить на копию базы, чтобы они не делили файл с записью. Копия
+# снимается backup API раз в SNAPSHOT_INTERVAL секунд и открывается только
+# для чтения (immutable: без блокировок и проверки WAL). Функции, помеченные
+# snapshot_read, читают снимок, пока он не старше SNAPSHOT_MAX_AGE секунд,
+# иначе — основную базу. Запись всегда идёт в основную базу.
+SNAPSHOT_ENABLED = False
+# Путь к снимку; None — DB_NAME + ".snapshot"
+SNAPSHOT_PATH = None
+SNAPSHOT_INTERVAL = 60
+SNAPSHOT_MAX_AGE = 300
+SNAPSHOT_PRAGMAS = (
+    ("cache_size", -20000),
+    ("mmap_size", 268435456),
+    ("temp_store", "MEMORY"),
+)
+
+snapshot_log = logging.getLogger("database.snapshot")
+
+
+def snapshot_path():
+    return SNAPSHOT_PATH or DB_NAME + ".snapshot"
+
+
+def refresh_snapshot():
+    """
+    Снимает копию основной базы во временный файл и атомарно подменяет им снимок.
+    Время изменения файла — момент начала копирования: по нему считается возраст.
+    """
+    path = snapshot_path()
+    temporary = f"{path}.{os.getpid()}.tmp"
+    started = time.time()
+    source = sqlite3.connect(DB_NAME)
+    try:
+        target = sqlite3.connect(temporary)
+        try:
+            # Одним шагом: копия согласована на момент начала чтения, запись
+            # в режиме WAL при этом не ждёт
+            source.backup(target)
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+    finally:
+        source.close()
+    os.utime(temporary, (started, started))
+    os.replace(temporary, path)
+    return started
+
+
+def snapshot_age():
+    """Возраст снимка в секундах; None — снимки выключены, снимка нет или он старше SNAPSHOT_MAX_AGE."""
+    if not SNAPSHOT_ENABLED:
+        return None
+    try:
+        age = time.time() - os.stat(snapshot_path()).st_mtime
+    except FileNotFoundError:
+        return None
+    return age if age <= SNAPSHOT_MAX_AGE else None
+
+
+def _snapshot_connection():
+    """(подключение текущего потока к снимку, возраст снимка) или (None, None)"""
+    if not SNAPSHOT_ENABLED:
+        return None, None
+    path = snapshot_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None, None
+    age = time.time() - stat.st_mtime
+    if age > SNAPSHOT_MAX_AGE:
+        return None, None
+    # Новый снимок — новый файл (os.replace): старое подключение дочитывает прежний
+    key = (path, stat.st_ino, stat.st_mtime_ns)
+    conn = getattr(_local, "snapshot_conn", None)
+    if conn is None or _local.snapshot_key != key:
+        if conn is not None:
+            conn.close()
+        factory = ProfilingConnection if profiling_enabled() else sqlite3.Connection
+        conn = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True,
+                               cached_statements=CACHED_STATEMENTS, factory=factory)
+        for name, value in SNAPSHOT_PRAGMAS:
+            conn.execute(f"PRAGMA {name} = {value}")
+        _local.snapshot_conn = conn
+        _local.snapshot_key = key
+    return conn, age
+
+
+def _read_snapshot(conn, age):
+    """Запоминает возраст прочитанного снимка для ответа (pop_snapshot_age)."""
+    _local.snapshot = conn
+    _local.snapshot_age = max(age, getattr(_local, "snapshot_age", None) or 0)
+
+
+def snapshot_read(func):
+    """
+    Помечает функцию чтения: при включённых снимках её запросы
+    (get_connection внутри) выполняются на снимке. Генераторы читают снимок
+    на каждом шаге, между шагами поток пользуется основной базой.
+    """
+    if inspect.isgeneratorfunction(func):
+        @wraps(func)
+        def generator(*args, **kwargs):
+            conn, age = _snapshot_connection()
+            if conn is None:
+                yield from func(*args, **kwargs)
+                return
+            items = func(*args, **kwargs)
+            while True:
+                _read_snapshot(conn, age)
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                finally:
+                    _local.snapshot = None
+                yield item
+        return generator
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if getattr(_local, "snapshot", None) is not None:
+            return func(*args, **kwargs)
+        conn, age = _snapshot_connection()
+        if conn is None:
+            return func(*args, **kwargs)
+        _read_snapshot(conn, age)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.snapshot = None
+    return wrapper
+
+
+def reading_snapshot():
+    """Выполняется ли текущий запрос на снимке (в нём ничего нельзя записать)"""
+    return getattr(_local, "snapshot", None) is not None
+
+
+def pop_snapshot_age():
+    """Наибольший возраст снимка, прочитанного потоком с прошлого вызова; None — снимок не читался."""
+    age = getattr(_local, "snapshot_age", None)
+    _local.snapshot_age = None
+    return age
+
+
+class SnapshotRefresher:
+    """
+    Фоновый поток, обновляющий снимок раз в SNAPSHOT_INTERVAL секунд. Может
+    работать в каждом воркере: снимок, который недавно обновил другой процесс,
+    не копируется повторно.
+    """
+
+    def __init__(self):
+        self.interval = SNAPSHOT_INTERVAL
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        """Снимает снимок, если он устарел, и запускает поток (повторный вызов ничего не делает)."""
+        if self.running:
+            return
+        if interval is not None:
+            self.interval = interval
+        self._stop.clear()
+        self.tick()
+        self._thread = threading.Thread(target=self._run, name="snapshot-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.running:
+            self._thread.join()
+        self._thread = None
+
+    def tick(self):
+        try:
+            age = time.time() - os.stat(snapshot_path()).st_mtime
+        except FileNotFoundError:
+            age = None
+        # Снимок, обновлённый другим воркером меньше интервала назад, не копируется
+        if age is None or age >= self.interval:
+            started = time.perf_counter()
+            refresh_snapshot()
+            snapshot_log.debug("Снимок %s обновлён за %.2f с", snapshot_path(), time.perf_counter() - started)
 
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception:
+                snapshot_log.exception("Ошибка обновления снимка")
 
-def init_db():
-    """Создаёт таблицы, если их ещё нет."""
+
+snapshot_refresher = SnapshotRefresher()
+
+
+# ---------------- Даты и строки ---------------- #
+
+# Даты лицензий хранятся номером дня от 1970-01-01 (INTEGER, миграция 6):
+# сравнения диапазонов целочисленные, строки и индексы короче текста YYYY-MM-DD.
+# Из Functions.py они выходят объектами date в именованных кортежах (row_factory).
+DAY_COLUMNS = frozenset(("license_start", "license_end"))
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Сколько разных дат держать готовыми объектами date
+DATE_CACHE_SIZE = 100_000
+
+
+def to_day(value):
+    """date, строка YYYY-MM-DD или номер дня -> номер дня от 1970-01-01."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+class _Dates(dict):
+    """Номер дня -> date; объекты неизменяемые, поэтому одна и та же дата во всех строках — один объект."""
+
+    def __missing__(self, day):
+        value = date.fromordinal(EPOCH_ORDINAL + day)
+        if len(self) < DATE_CACHE_SIZE:
+            self[day] = value
+        return value
+
+
+_dates = _Dates()
+# from_day(номер дня) -> date
+from_day = _dates.__getitem__
+
+
+@lru_cache(maxsize=None)
+def row_factory(name, fields, dates=True):
+    """
+    row_factory для курсора: строки — именованные кортежи name с полями fields.
+    При dates=True номера дней в столбцах DAY_COLUMNS заменяются объектами date
+    (False — для таблиц, где столбцы с теми же именами хранят текст).
+    """
+    make = namedtuple(name, fields)._make
+    days = [index for index, field in enumerate(fields) if dates and field in DAY_COLUMNS]
+    if not days:
+        return lambda cursor, row: make(row)
+
+    def factory(cursor, row):
+        row = list(row)
+        for index in days:
+            row[index] = from_day(row[index])
+        return make(row)
+    return factory
+
+
+def init_db(version=None):
+    """
+    Создаёт таблицы, если их ещё нет, и применяет миграции
+    (version — только до этой миграции, например для замера старой схемы).
+    """
     with get_connection() as conn:
         cursor = conn.cursor()
 
@@ -32,7 +493,7 @@ def init_db():
         )
         """)
 
-        # Лицензии
+        # Лицензии (даты — номер дня от 1970-01-01 начиная с миграции 6)
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS licenses (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -47,6 +508,401 @@ def init_db():
 
         conn.commit()
 
+    migrate(version)
+
+
+# ---------------- Миграции ---------------- #
+
+# Сколько id строк с неразборчивой датой перечислять в ошибке миграции 6
+BAD_DATES_SHOWN = 50
+
+
+def _normalize_license_dates(conn):
+    """
+    Подготовка к миграции 6: даты, которые SQLite не разбирает (date() — NULL,
+    например 2025-1-5 без ведущих нулей), переписываются в YYYY-MM-DD. Если
+    какую-то дату не разобрать и так, миграция останавливается с перечнем id —
+    иначе она упала бы на NOT NULL без указания строк.
+    """
+    rows = conn.execute("""
+        SELECT id, license_start, license_end FROM licenses
+        WHERE date(license_start) IS NULL OR date(license_end) IS NULL
+    """).fetchall()
+    fixed, bad = [], []
+    for license_id, *values in rows:
+        try:
+            values = [datetime.strptime(str(value).strip(), "%Y-%m-%d").date().isoformat()
+                      for value in values]
+        except ValueError:
+            bad.append(license_id)
+            continue
+        fixed.append((*values, license_id))
+    if bad:
+        shown = ", ".join(map(str, bad[:BAD_DATES_SHOWN]))
+        more = f" и ещё {len(bad) - BAD_DATES_SHOWN}" if len(bad) > BAD_DATES_SHOWN else ""
+        raise sqlite3.IntegrityError(
+            f"Миграция 6: неверные даты у лицензий с id {shown}{more} — исправьте их (YYYY-MM-DD)")
+    conn.executemany("UPDATE licenses SET license_start = ?, license_end = ? WHERE id = ?", fixed)
+
+
+# Номер миграции = позиция в списке + 1, текущая версия хранится в PRAGMA user_version.
+# Уже выпущенные миграции не редактируются — изменения схемы добавляются новой записью.
+# Запись — SQL-скрипт или пара (функция подготовки от соединения, SQL-скрипт).
+MIGRATIONS = [
+    # 1. Индексы под поиск лицензий, выборки по аудитории/ПК и подсчёт по датам
+    """
+    CREATE INDEX IF NOT EXISTS idx_licenses_computer_id ON licenses (computer_id);
+    CREATE INDEX IF NOT EXISTS idx_licenses_end ON licenses (license_end);
+    CREATE INDEX IF NOT EXISTS idx_licenses_start_end ON licenses (license_start, license_end);
+    CREATE INDEX IF NOT EXISTS idx_licenses_software ON licenses (software);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_computers_room_name ON computers (room_number, computer_name);
+    """,
+
+    # 2. Сводка для дашборда: одна строка со счётчиками на дату computed_for.
+    #    Триггеры сдвигают счётчики при каждом изменении лицензий,
+    #    Functions.count_licenses пересчитывает строку при смене даты.
+    """
+    CREATE TABLE IF NOT EXISTS license_summary (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        computed_for DATE NOT NULL,
+        expiring_until DATE NOT NULL,
+        total INTEGER NOT NULL,
+        active INTEGER NOT NULL,
+        expiring INTEGER NOT NULL,
+        expired INTEGER NOT NULL,
+        budget_total REAL NOT NULL,
+        budget_active REAL NOT NULL
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_license_summary_insert AFTER INSERT ON licenses
+    BEGIN
+        UPDATE license_summary SET
+            total = total + 1,
+            active = active + (NEW.license_start <= computed_for AND NEW.license_end >= computed_for),
+            expiring = expiring + (NEW.license_end > computed_for AND NEW.license_end <= expiring_until),
+            expired = expired + (NEW.license_end < computed_for),
+            budget_total = budget_total + COALESCE(NEW.budget, 0),
+            budget_active = budget_active + CASE
+                WHEN NEW.license_start <= computed_for AND NEW.license_end >= computed_for
+                THEN COALESCE(NEW.budget, 0) ELSE 0 END
+        WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_license_summary_delete AFTER DELETE ON licenses
+    BEGIN
+        UPDATE license_summary SET
+            total = total - 1,
+            active = active - (OLD.license_start <= computed_for AND OLD.license_end >= computed_for),
+            expiring = expiring - (OLD.license_end > computed_for AND OLD.license_end <= expiring_until),
+            expired = expired - (OLD.license_end < computed_for),
+            budget_total = budget_total - COALESCE(OLD.budget, 0),
+            budget_active = budget_active - CASE
+                WHEN OLD.license_start <= computed_for AND OLD.license_end >= computed_for
+                THEN COALESCE(OLD.budget, 0) ELSE 0 END
+        WHERE id = 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_license_summary_update
+    AFTER UPDATE OF license_start, license_end, budget ON licenses
+    BEGIN
+        UPDATE license_summary SET
+            active = active
+                - (OLD.license_start <= computed_for AND OLD.license_end >= computed_for)
+                + (NEW.license_start <= computed_for AND NEW.license_end >= computed_for),
+            expiring = expiring
+                - (OLD.license_end > computed_for AND OLD.license_end <= expiring_until)
+                + (NEW.license_end > computed_for AND NEW.license_end <= expiring_until),
+            expired = expired
+                - (OLD.license_end < computed_for)
+                + (NEW.license_end < computed_for),
+            budget_total = budget_total - COALESCE(OLD.budget, 0) + COALESCE(NEW.budget, 0),
+            budget_active = budget_active
+                - CASE WHEN OLD.license_start <= computed_for AND OLD.license_end >= computed_for
+                       THEN COALESCE(OLD.budget, 0) ELSE 0 END
+                + CASE WHEN NEW.license_start <= computed_for AND NEW.license_end >= computed_for
+                       THEN COALESCE(NEW.budget, 0) ELSE 0 END
+        WHERE id = 1;
+    END;
+    """,
+
+    # 3. Полнотекстовый индекс по названию ПО (триграммы: поиск подстроки без полного
+    #    просмотра licenses). Содержимое хранится в самой licenses, индекс
+    #    поддерживается триггерами.
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS licenses_fts USING fts5(
+        software, content='licenses', content_rowid='id', tokenize='trigram'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_licenses_fts_insert AFTER INSERT ON licenses
+    BEGIN
+        INSERT INTO licenses_fts (rowid, software) VALUES (NEW.id, NEW.software);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_licenses_fts_delete AFTER DELETE ON licenses
+    BEGIN
+        INSERT INTO licenses_fts (licenses_fts, rowid, software) VALUES ('delete', OLD.id, OLD.software);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_licenses_fts_update AFTER UPDATE OF software ON licenses
+    BEGIN
+        INSERT INTO licenses_fts (licenses_fts, rowid, software) VALUES ('delete', OLD.id, OLD.software);
+        INSERT INTO licenses_fts (rowid, software) VALUES (NEW.id, NEW.software);
+    END;
+
+    INSERT INTO licenses_fts (licenses_fts) VALUES ('rebuild');
+    """,
+
+    # 4. Журнал событий истечения лицензий (outbox). Событие записывается один раз
+    #    на лицензию, порог и дату окончания — даже если планировщик запущен
+    #    в нескольких воркерах. delivered_at заполняется после отправки на webhook.
+    """
+    CREATE TABLE IF NOT EXISTS license_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        license_id INTEGER NOT NULL,
+        threshold INTEGER NOT NULL,
+        license_end TEXT NOT NULL,
+        created_at DATETIME NOT NULL,
+        delivered_at DATETIME,
+        UNIQUE (license_id, threshold, license_end)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_license_events_undelivered
+        ON license_events(id) WHERE delivered_at IS NULL;
+    """,
+
+    # 5. Отозванные токены (выход из системы). Каждый процесс держит их в памяти
+    #    и дочитывает новые записи по id; строки с истёкшим сроком удаляются.
+    """
+    CREATE TABLE IF NOT EXISTS revoked_tokens (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        jti TEXT NOT NULL UNIQUE,
+        expires_at INTEGER NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens(expires_at);
+    """,
+
+    # 6. Даты лицензий — номер дня от 1970-01-01 вместо текста YYYY-MM-DD.
+    #    Таблица пересоздаётся (id и счётчик AUTOINCREMENT сохраняются), вместе
+    #    со старой удаляются её индексы и триггеры — они создаются заново в том же
+    #    виде. Сводка пересчитывается на числовую дату при первом count_licenses.
+    #    Представление licenses_iso отдаёт даты текстом, как раньше, — для
+    #    отчётов и скриптов, читающих базу напрямую. Даты, которые SQLite не
+    #    разбирает, сначала приводятся к YYYY-MM-DD (_normalize_license_dates).
+    (_normalize_license_dates, """
+    CREATE TABLE licenses_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        computer_id INTEGER NOT NULL,
+        software TEXT NOT NULL,
+        license_start INTEGER NOT NULL,
+        license_end INTEGER NOT NULL,
+        budget REAL,
+        FOREIGN KEY (computer_id) REFERENCES computers (id) ON DELETE CASCADE
+    );
+
+    INSERT INTO licenses_new (id, computer_id, software, license_start, license_end, budget)
+    SELECT id, computer_id, software,
+           CAST(julianday(date(license_start)) - 2440587.5 AS INTEGER),
+           CAST(julianday(date(license_end)) - 2440587.5 AS INTEGER),
+           budget
+    FROM licenses;
+
+    DELETE FROM sqlite_sequence WHERE name = 'licenses_new';
+    INSERT INTO sqlite_sequence (name, seq) SELECT 'licenses_new', seq FROM sqlite_sequence WHERE name = 'licenses';
+
+    DROP TABLE licenses;
+    ALTER TABLE licenses_new RENAME TO licenses;
+
+    CREATE INDEX idx_licenses_computer_id ON licenses (computer_id);
+    CREATE INDEX idx_licenses_end ON licenses (license_end);
+    CREATE INDEX idx_licenses_start_end ON licenses (license_start, license_end);
+    CREATE INDEX idx_licenses_software ON licenses (software);
+
+    DELETE FROM license_summary;
+
+    CREATE TRIGGER trg_license_summary_insert AFTER INSERT ON licenses
+    BEGIN
+        UPDATE license_summary SET
+            total = total + 1,
+            active = active + (NEW.license_start <= computed_for AND NEW.license_end >= computed_for),
+            expiring = expiring + (NEW.license_end > computed_for AND NEW.license_end <= expiring_until),
+            expired = expired + (NEW.license_end < computed_for),
+            budget_total = budget_total + COALESCE(NEW.budget, 0),
+            budget_active = budget_active + CASE
+                WHEN NEW.license_start <= computed_for AND NEW.license_end >= computed_for
+                THEN COALESCE(NEW.budget, 0) ELSE 0 END
+        WHERE id = 1;
+    END;
+
+    CREATE TRIGGER trg_license_summary_delete AFTER DELETE ON licenses
+    BEGIN
+        UPDATE license_summary SET
+            total = total - 1,
+            active = active - (OLD.license_start <= computed_for AND OLD.license_end >= computed_for),
+            expiring = expiring - (OLD.license_end > computed_for AND OLD.license_end <= expiring_until),
+            expired = expired - (OLD.license_end < computed_for),
+            budget_total = budget_total - COALESCE(OLD.budget, 0),
+            budget_active = budget_active - CASE
+                WHEN OLD.license_start <= computed_for AND OLD.license_end >= computed_for
+                THEN COALESCE(OLD.budget, 0) ELSE 0 END
+        WHERE id = 1;
+    END;
+
+    CREATE TRIGGER trg_license_summary_update
+    AFTER UPDATE OF license_start, license_end, budget ON licenses
+    BEGIN
+        UPDATE license_summary SET
+            active = active
+                - (OLD.license_start <= computed_for AND OLD.license_end >= computed_for)
+                + (NEW.license_start <= computed_for AND NEW.license_end >= computed_for),
+            expiring = expiring
+                - (OLD.license_end > computed_for AND OLD.license_end <= expiring_until)
+                + (NEW.license_end > computed_for AND NEW.license_end <= expiring_until),
+            expired = expired
+                - (OLD.license_end < computed_for)
+                + (NEW.license_end < computed_for),
+            budget_total = budget_total - COALESCE(OLD.budget, 0) + COALESCE(NEW.budget, 0),
+            budget_active = budget_active
+                - CASE WHEN OLD.license_start <= computed_for AND OLD.license_end >= computed_for
+                       THEN COALESCE(OLD.budget, 0) ELSE 0 END
+                + CASE WHEN NEW.license_start <= computed_for AND NEW.license_end >= computed_for
+                       THEN COALESCE(NEW.budget, 0) ELSE 0 END
+        WHERE id = 1;
+    END;
+
+    CREATE TRIGGER trg_licenses_fts_insert AFTER INSERT ON licenses
+    BEGIN
+        INSERT INTO licenses_fts (rowid, software) VALUES (NEW.id, NEW.software);
+    END;
+
+    CREATE TRIGGER trg_licenses_fts_delete AFTER DELETE ON licenses
+    BEGIN
+        INSERT INTO licenses_fts (licenses_fts, rowid, software) VALUES ('delete', OLD.id, OLD.software);
+    END;
+
+    CREATE TRIGGER trg_licenses_fts_update AFTER UPDATE OF software ON licenses
+    BEGIN
+        INSERT INTO licenses_fts (licenses_fts, rowid, software) VALUES ('delete', OLD.id, OLD.software);
+        INSERT INTO licenses_fts (rowid, software) VALUES (NEW.id, NEW.software);
+    END;
+
+    CREATE VIEW licenses_iso AS
+    SELECT id, computer_id, software,
+           date(license_start * 86400, 'unixepoch') AS license_start,
+           date(license_end * 86400, 'unixepoch') AS license_end,
+           budget
+    FROM licenses;
+    """),
+
+    # 7. Журнал изменений для синхронизации клиентов (GET /changes?since=seq):
+    #    строка на каждую вставку, изменение и удаление компьютера или лицензии,
+    #    в том числе на каскадное удаление лицензий вместе с компьютером.
+    #    AUTOINCREMENT: seq не повторяются и после очистки старых записей.
+    #    Данные строк не копируются — клиенту отдаётся текущее состояние.
+    """
+    CREATE TABLE changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL,
+        entity_id INTEGER NOT NULL,
+        op TEXT NOT NULL,
+        changed_at INTEGER NOT NULL
+    );
+
+    CREATE TRIGGER trg_changes_computers_insert AFTER INSERT ON computers
+    BEGIN
+        INSERT INTO changes (entity, entity_id, op, changed_at)
+        VALUES ('computers', NEW.id, 'insert', CAST(strftime('%s', 'now') AS INTEGER));
+    END;
+
+    CREATE TRIGGER trg_changes_computers_update AFTER UPDATE ON computers
+    BEGIN
+        INSERT INTO changes (entity, entity_id, op, changed_at)
+        VALUES ('computers', NEW.id, 'update', CAST(strftime('%s', 'now') AS INTEGER));
+    END;
+
+    CREATE TRIGGER trg_changes_computers_delete AFTER DELETE ON computers
+    BEGIN
+        INSERT INTO changes (entity, entity_id, op, changed_at)
+        VALUES ('computers', OLD.id, 'delete', CAST(strftime('%s', 'now') AS INTEGER));
+    END;
+
+    CREATE TRIGGER trg_changes_licenses_insert AFTER INSERT ON licenses
+    BEGIN
+        INSERT INTO changes (entity, entity_id, op, changed_at)
+        VALUES ('licenses', NEW.id, 'insert', CAST(strftime('%s', 'now') AS INTEGER));
+    END;
+
+    CREATE TRIGGER trg_changes_licenses_update AFTER UPDATE ON licenses
+    BEGIN
+        INSERT INTO changes (entity, entity_id, op, changed_at)
+        VALUES ('licenses', NEW.id, 'update', CAST(strftime('%s', 'now') AS INTEGER));
+    END;
+
+    CREATE TRIGGER trg_changes_licenses_delete AFTER DELETE ON licenses
+    BEGIN
+        INSERT INTO changes (entity, entity_id, op, changed_at)
+        VALUES ('licenses', OLD.id, 'delete', CAST(strftime('%s', 'now') AS INTEGER));
+    END;
+    """,
+
+    # 8. Захват событий для отправки на webhook: delivering_at — когда воркер
+    #    взял событие в работу. Пока захват не истёк, другие воркеры его не берут,
+    #    так что одна и та же пачка не уходит на webhook из каждого воркера.
+    """
+    ALTER TABLE license_events ADD COLUMN delivering_at DATETIME;
+    """,
+]
+
+
+def get_schema_version(conn):
+    """Возвращает номер последней применённой миграции."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _split_statements(script):
+    """Делит SQL-скрипт на отдельные выражения (с учётом BEGIN ... END в триггерах)."""
+    statements, buffer = [], ""
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ""
+    if buffer.strip():
+        statements.append(buffer.strip())
+    return statements
+
+
+def migrate(target=None):
+    """
+    Применяет миграции, которых ещё нет в базе (до номера target, если он задан).
+
+    Каждая миграция выполняется в отдельной транзакции вместе с обновлением
+    user_version, поэтому при ошибке (например, дубликаты пары
+    аудитория + имя ПК при создании уникального индекса) база остаётся
+    на предыдущей версии. Транзакция начинается с BEGIN IMMEDIATE и версия
+    перечитывается уже под блокировкой записи, так что несколько процессов,
+    стартующих одновременно, не применят одну миграцию дважды.
+    """
+    conn = get_connection()
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(conn)
+            if version >= (len(MIGRATIONS) if target is None else target):
+                conn.rollback()
+                return version
+            migration = MIGRATIONS[version]
+            if isinstance(migration, tuple):
+                prepare, migration = migration
+                prepare(conn)
+            for statement in _split_statements(migration):
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
 
 if __name__ == "__main__":
     init_db()
@@ -1,44 +1,211 @@
+import logging
 import sqlite3
-from datetime import datetime, timedelta
-from DB import get_connection, init_db
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+
+try:
+    from .DB import (get_connection, init_db, row_factory, to_day, from_day, DAY_COLUMNS,
+                     snapshot_read, snapshot_age, reading_snapshot)
+    from .Cache import cached, invalidate
+    from .Passwords import hash_password, verify_password, verify_dummy, needs_rehash
+except ImportError:  # запуск как скрипта из папки database
+    from DB import (get_connection, init_db, row_factory, to_day, from_day, DAY_COLUMNS,
+                    snapshot_read, snapshot_age, reading_snapshot)
+    from Cache import cached, invalidate
+    from Passwords import hash_password, verify_password, verify_dummy, needs_rehash
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------- Постраничная выборка ---------------- #
+
+USER_FIELDS = ("id", "login", "last_login")
+COMPUTER_FIELDS = ("id", "room_number", "computer_name")
+LICENSE_FIELDS = ("id", "computer_id", "software", "license_start", "license_end", "budget")
+
+# Строки возвращаются именованными кортежами этих типов (DB.row_factory),
+# даты лицензий в них — объекты date
+_ROW_TYPES = {"users": "User", "computers": "Computer", "licenses": "License",
+              "license_events": "LicenseEvent"}
+
+
+def project_fields(allowed, fields=None):
+    """
+    Возвращает список столбцов для выборки.
+
+    Без fields — все столбцы таблицы. Столбец id добавляется всегда,
+    так как по нему строится курсор следующей страницы.
+    """
+    if not fields:
+        return list(allowed)
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+    columns = list(dict.fromkeys(fields))
+    if "id" not in columns:
+        columns.insert(0, "id")
+    return columns
+
+
+def _select_page(table, allowed, fields=None, after=None, limit=None, where=None, params=()):
+    """
+    Выборка с курсором по id: WHERE id > after ORDER BY id LIMIT limit.
+
+    В отличие от OFFSET стоимость страницы не зависит от её номера —
+    SQLite сразу переходит к нужному id по первичному ключу (или по индексу,
+    содержащему rowid, если задан фильтр where).
+    """
+    columns = project_fields(allowed, fields)
+    conditions = [where] if where else []
+    params = list(params)
+    if after is not None:
+        conditions.append("id > ?")
+        params.append(after)
+
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = row_factory(_ROW_TYPES[table], tuple(columns), table == "licenses")
+        cursor.execute(query, params)
+        return cursor.fetchall()
 
 
 # ---------------- Пользователи ---------------- #
 
+# last_login перезаписывается, только если с прошлой записи прошло больше
+# LAST_LOGIN_INTERVAL секунд: частые входы не становятся транзакциями записи
+# и не ждут блокировку SQLite друг за другом
+LAST_LOGIN_INTERVAL = 300
+LAST_LOGIN_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
 def add_user(login: str, password: str):
+    password_hash = hash_password(password)
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO users (login, password, last_login) VALUES (?, ?, ?)",
-            (login, password, None)
+            (login, password_hash, None)
         )
         conn.commit()
+    invalidate("users")
+
+
+def _last_login_due(last_login, now):
+    if not last_login:
+        return True
+    try:
+        previous = datetime.strptime(last_login, LAST_LOGIN_FORMAT)
+    except ValueError:
+        return True
+    return (now - previous).total_seconds() >= LAST_LOGIN_INTERVAL
 
 
 def authenticate_user(login: str, password: str) -> bool:
+    """
+    Проверяет логин и пароль.
+
+    Пароли, сохранённые открытым текстом или с устаревшими параметрами scrypt,
+    после успешного входа перехэшируются. Запись в базу происходит только
+    тогда (вместе с last_login) или когда last_login старше LAST_LOGIN_INTERVAL.
+    """
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT id FROM users WHERE login = ? AND password = ?", (login, password))
+        cursor.execute("SELECT id, password, last_login FROM users WHERE login = ?", (login,))
         user = cursor.fetchone()
-        if user:
-            cursor.execute(
-                "UPDATE users SET last_login = ? WHERE id = ?",
-                (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user[0])
-            )
-            conn.commit()
-            return True
+    if not user:
+        # Столько же работы, сколько при неверном пароле: время ответа не выдаёт, есть ли логин
+        return verify_dummy(password)
+    user_id, stored, last_login = user
+    if not verify_password(password, stored):
         return False
 
+    now = datetime.now()
+    rehash = needs_rehash(stored)
+    if rehash or _last_login_due(last_login, now):
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            if rehash:
+                cursor.execute(
+                    "UPDATE users SET password = ?, last_login = ? WHERE id = ? AND password = ?",
+                    (hash_password(password), now.strftime(LAST_LOGIN_FORMAT), user_id, stored)
+                )
+            else:
+                cursor.execute(
+                    "UPDATE users SET last_login = ? WHERE id = ?",
+                    (now.strftime(LAST_LOGIN_FORMAT), user_id)
+                )
+            conn.commit()
+        invalidate("users")
+    return True
+
+
+def revoke_token(jti, expires_at):
+    """Записывает отозванный токен (expires_at — unix-время окончания его срока)."""
+    now = int(datetime.now().timestamp())
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM revoked_tokens WHERE expires_at < ?", (now,))
+        cursor.execute("INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                       (jti, expires_at))
+        conn.commit()
+
 
-def get_users():
+def get_revoked_tokens(after=0):
+    """Отозванные и ещё не истёкшие токены с id больше after: (id, jti, expires_at)."""
+    now = int(datetime.now().timestamp())
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT id, login, last_login FROM users")
+        cursor.execute("""
+            SELECT id, jti, expires_at FROM revoked_tokens
+            WHERE id > ? AND expires_at >= ? ORDER BY id
+        """, (after, now))
         return cursor.fetchall()
 
 
+@cached("users")
+def get_users(after=None, limit=None, fields=None):
+    return _select_page("users", USER_FIELDS, fields, after, limit)
+
+
 # ---------------- Компьютеры ---------------- #
 
+# id компьютеров, существование которых уже проверено в этом процессе.
+# Хранятся только подтверждённые id: новый компьютер из другого процесса
+# найдётся запросом по первичному ключу, а удалённый в другом процессе
+# отсеет внешний ключ licenses.computer_id при вставке.
+_known_computer_ids = set()
+
+
+def computer_exists(computer_id):
+    """Проверяет, что компьютер с таким id есть (сначала по кэшу, затем по первичному ключу)."""
+    if computer_id in _known_computer_ids:
+        return True
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM computers WHERE id = ?", (computer_id,))
+        if cursor.fetchone() is None:
+            return False
+    _known_computer_ids.add(computer_id)
+    return True
+
+
+def forget_computer(computer_id):
+    """Убирает id из кэша (например, после ошибки внешнего ключа)."""
+    _known_computer_ids.discard(computer_id)
+
+
 def add_computer(room_number, computer_name):
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -47,26 +214,73 @@ def add_computer(room_number, computer_name):
             (room_number, computer_name)
         )
         conn.commit()
-        return cursor.lastrowid
+    invalidate("computers")
+    _known_computer_ids.add(cursor.lastrowid)
+    return cursor.lastrowid
 
 
-def get_computers():
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM computers")
-        return cursor.fetchall()
+@cached("computers")
+def get_computers(after=None, limit=None, fields=None):
+    return _select_page("computers", COMPUTER_FIELDS, fields, after, limit)
 
 
 def delete_computer(computer_id):
     with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM computers WHERE id = ?", (computer_id,))
-        conn.commit()
+        with _write_transaction(conn) as cursor:
+            # Лицензии компьютера удаляются каскадно, их id нужны подписчикам
+            cursor.execute("SELECT id FROM licenses WHERE computer_id = ?", (computer_id,))
+            license_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("DELETE FROM computers WHERE id = ?", (computer_id,))
+    invalidate("computers", "licenses")
+    _known_computer_ids.discard(computer_id)
+    _notify_license_changes((license_id, None) for license_id in license_ids)
 
 
 # ---------------- Лицензии ---------------- #
 
+# Подписчики на изменения лицензий (например, шкала истечения в Timeline.py).
+# Вызываются после фиксации транзакции как listener(license_id, license_end),
+# license_end — номер дня (DB.to_day): license_end=None — лицензия удалена,
+# license_id=None — изменилось сразу много строк (массовый импорт, каскадное
+# удаление), нужна полная пересинхронизация.
+_license_listeners = []
+
+
+def subscribe_license_changes(listener):
+    if listener not in _license_listeners:
+        _license_listeners.append(listener)
+
+
+def unsubscribe_license_changes(listener):
+    if listener in _license_listeners:
+        _license_listeners.remove(listener)
+
+
+def _notify_license_change(license_id=None, license_end=None):
+    for listener in list(_license_listeners):
+        try:
+            listener(license_id, license_end)
+        except Exception:
+            logger.exception("Ошибка в обработчике изменения лицензии %s", license_id)
+
+
+# Больше изменённых строк — одно уведомление без id: слушателю дешевле перечитать всё
+NOTIFY_EACH_LIMIT = 1000
+
+
+def _notify_license_changes(pairs):
+    """Уведомляет о пачке изменений (license_id, license_end) по одной или разом."""
+    pairs = list(pairs)
+    if len(pairs) > NOTIFY_EACH_LIMIT:
+        _notify_license_change()
+        return
+    for license_id, license_end in pairs:
+        _notify_license_change(license_id, license_end)
+
+
 def add_license(computer_id, software, license_start, license_end, budget):
+    """Даты — date, строка YYYY-MM-DD или номер дня."""
+    license_start, license_end = to_day(license_start), to_day(license_end)
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
@@ -74,28 +288,134 @@ def add_license(computer_id, software, license_start, license_end, budget):
             VALUES (?, ?, ?, ?, ?)
         """, (computer_id, software, license_start, license_end, budget))
         conn.commit()
+    invalidate("licenses")
+    _notify_license_change(cursor.lastrowid, license_end)
+    return cursor.lastrowid
 
 
-def get_licenses(computer_id=None):
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        if computer_id:
-            cursor.execute("SELECT * FROM licenses WHERE computer_id = ?", (computer_id,))
-        else:
-            cursor.execute("SELECT * FROM licenses")
-        return cursor.fetchall()
+def _snapshot_fresh():
+    """
+    Чтение пойдёт на снимок (DB.snapshot_read). Такие вызовы идут мимо кэша
+    результатов: из кэша ответ не получил бы X-Snapshot-Age, а данные
+    устаревали бы на SNAPSHOT_MAX_AGE + Cache.TTL вместо SNAPSHOT_MAX_AGE.
+    """
+    return snapshot_age() is not None
+
+
+def get_licenses(computer_id=None, after=None, limit=None, fields=None):
+    if computer_id is None and limit is None and _snapshot_fresh():
+        # Полный список со снимка — мимо кэша, как search_licenses
+        return _scan_licenses(after, fields)
+    return _get_licenses(computer_id, after, limit, fields)
+
+
+@cached("licenses")
+def _get_licenses(computer_id, after, limit, fields):
+    if computer_id is not None:
+        return _select_page("licenses", LICENSE_FIELDS, fields, after, limit,
+                            "computer_id = ?", (computer_id,))
+    if limit is None:
+        return _scan_licenses(after, fields)
+    return _select_page("licenses", LICENSE_FIELDS, fields, after, limit)
+
+
+@snapshot_read
+def _scan_licenses(after, fields):
+    """Все лицензии без ограничения — на снимке, если он включён (DB.snapshot_read)"""
+    return _select_page("licenses", LICENSE_FIELDS, fields, after)
+
+
+# Поля лицензии, которые можно изменить (update_license, update_licenses)
+LICENSE_UPDATE_FIELDS = ("computer_id", "software", "license_start", "license_end", "budget")
+
+LICENSE_NOT_FOUND = "Лицензия не найдена"
+LICENSE_DATES_ERROR = "Дата окончания лицензии должна быть больше даты начала"
+
+
+@lru_cache(maxsize=None)
+def _license_update_sql(fields):
+    """
+    Текст UPDATE для набора полей в порядке LICENSE_UPDATE_FIELDS: вариантов не
+    больше 31, все они остаются в кэше подготовленных запросов sqlite3. Если меняется
+    одна из дат, она сравнивается с сохранённой второй датой той же строки прямо в WHERE.
+    Дата окончания возвращается для уведомления слушателей.
+    """
+    assignments = ", ".join(f"{field} = ?" for field in fields)
+    sql = f"UPDATE licenses SET {assignments} WHERE id = ?"
+    if "license_start" in fields or "license_end" in fields:
+        start = "?" if "license_start" in fields else "license_start"
+        end = "?" if "license_end" in fields else "license_end"
+        sql += f" AND {start} < {end}"
+    return sql + " RETURNING license_end"
+
+
+def _apply_license_update(cursor, license_id, changes):
+    """Изменяет одну лицензию в текущей транзакции; возвращает (license_end, None) или (None, ошибка)."""
+    unknown = [field for field in changes if field not in LICENSE_UPDATE_FIELDS]
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+    changes = {field: to_day(value) if field in DAY_COLUMNS else value for field, value in changes.items()}
+    fields = tuple(field for field in LICENSE_UPDATE_FIELDS if field in changes)
+    params = [changes[field] for field in fields] + [license_id]
+    params += [changes[field] for field in ("license_start", "license_end") if field in changes]
+    try:
+        updated = cursor.execute(_license_update_sql(fields), params).fetchall()
+    except sqlite3.IntegrityError as e:
+        return None, "Компьютер не найден" if "FOREIGN KEY" in str(e) else str(e)
+    if updated:
+        return updated[0][0], None
+    # Строка не изменена: либо её нет, либо не прошла проверка дат
+    cursor.execute("SELECT 1 FROM licenses WHERE id = ?", (license_id,))
+    return None, LICENSE_DATES_ERROR if cursor.fetchone() else LICENSE_NOT_FOUND
 
 
 def update_license(license_id, **kwargs):
-    """Редактирует данные лицензии (только переданные поля)."""
+    """
+    Редактирует данные лицензии (только переданные поля из LICENSE_UPDATE_FIELDS).
+    Возвращает False, если лицензии нет. Неизвестные поля, несуществующий компьютер
+    и дата окончания не позже даты начала (с учётом сохранённых значений) — ValueError.
+    """
     if not kwargs:
-        return
+        raise ValueError("Не переданы поля для изменения")
+    with get_connection() as conn:
+        license_end, error = _apply_license_update(conn.cursor(), license_id, kwargs)
+        conn.commit()
+    if error == LICENSE_NOT_FOUND:
+        return False
+    if error:
+        raise ValueError(error)
+    invalidate("licenses")
+    _notify_license_change(license_id, license_end)
+    return True
+
+
+def update_licenses(updates, atomic=False):
+    """
+    Изменяет несколько лицензий в одной транзакции.
+
+    updates — список пар (license_id, словарь изменённых полей). Возвращает
+    результаты по строкам: {"status": "updated", "id": ...} или {"status": "error", ...}.
+    При atomic=True любая ошибка откатывает всю пачку (статус остальных — "skipped").
+    """
+    results, changed = [], {}
     with get_connection() as conn:
         cursor = conn.cursor()
-        fields = ", ".join([f"{key} = ?" for key in kwargs.keys()])
-        values = list(kwargs.values()) + [license_id]
-        cursor.execute(f"UPDATE licenses SET {fields} WHERE id = ?", values)
+        for license_id, changes in updates:
+            license_end, error = _apply_license_update(cursor, license_id, changes)
+            if error:
+                results.append({"status": "error", "id": license_id, "error": error})
+            else:
+                results.append({"status": "updated", "id": license_id})
+                changed[license_id] = license_end
+        results, proceed = _bulk_result(results, atomic)
+        if not proceed:
+            conn.rollback()
+            return results
         conn.commit()
+    if changed:
+        invalidate("licenses")
+        _notify_license_changes(changed.items())
+    return results
 
 
 def delete_license(license_id):
@@ -103,74 +423,238 @@ def delete_license(license_id):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM licenses WHERE id = ?", (license_id,))
         conn.commit()
+    invalidate("licenses")
+    if cursor.rowcount:
+        _notify_license_change(license_id, None)
+
+
+SEARCH_FIELDS = ("id", "room_number", "computer_name", "software", "license_start", "license_end", "budget")
+_details_rows = row_factory("LicenseDetails", SEARCH_FIELDS)
+
+# Искать по названию ПО через полнотекстовый индекс licenses_fts
+USE_FTS_SEARCH = True
+
+# Триграммный индекс находит только строки от трёх символов,
+# более короткие запросы выполняются через LIKE
+FTS_MIN_LENGTH = 3
+
+# substring — вхождение подстроки (как LIKE '%...%'),
+# prefix — название начинается с запроса,
+# fuzzy — нечёткое совпадение по общим триграммам (опечатки), лучшие — первыми
+SEARCH_MATCH_MODES = ("substring", "prefix", "fuzzy")
+
 
+def _fts_phrase(text):
+    """Экранирует строку как фразу запроса FTS5."""
+    return '"' + text.replace('"', '""') + '"'
 
-def search_licenses(software=None, room=None, active_only=False):
+
+def _fts_query(software, match):
+    """Строит выражение MATCH для licenses_fts."""
+    if match == "fuzzy":
+        text = software.lower()
+        trigrams = dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2))
+        return " OR ".join(_fts_phrase(trigram) for trigram in trigrams)
+    return _fts_phrase(software)
+
+
+def _like_escape(text):
+    """Экранирует % и _ во вводе пользователя для LIKE ... ESCAPE '\\'"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _search_query(software=None, room=None, active_only=False, match="substring", limit=None):
+    """Собирает запрос поиска лицензий и его параметры."""
+    if match not in SEARCH_MATCH_MODES:
+        raise ValueError(f"Неизвестный режим поиска: {match}")
+
+    use_fts = USE_FTS_SEARCH and software and len(software) >= FTS_MIN_LENGTH
+    params = []
+    query = """
+        SELECT l.id, c.room_number, c.computer_name, l.software, l.license_start, l.license_end, l.budget
+        FROM licenses l
+        JOIN computers c ON l.computer_id = c.id
+    """
+    if use_fts:
+        query += """
+        JOIN (SELECT rowid, rank FROM licenses_fts WHERE licenses_fts MATCH ?) f ON f.rowid = l.id
+        """
+        params.append(_fts_query(software, match))
+    query += " WHERE 1=1"
+
+    if software and match == "prefix":
+        query += " AND l.software LIKE ? ESCAPE '\\'"
+        params.append(f"{_like_escape(software)}%")
+    elif software and not use_fts:
+        query += " AND l.software LIKE ? ESCAPE '\\'"
+        params.append(f"%{_like_escape(software)}%")
+
+    if room:
+        query += " AND c.room_number = ?"
+        params.append(room)
+
+    if active_only:
+        today = to_day(date.today())
+        query += " AND l.license_start <= ? AND l.license_end >= ?"
+        params.extend([today, today])
+
+    # Для подстроки и префикса все совпадения равноценны, сортировка
+    # по релевантности нужна только нечёткому поиску
+    if use_fts and match == "fuzzy":
+        query += " ORDER BY f.rank"
+
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    return query, params
+
+
+@cached("licenses", "computers", skip=_snapshot_fresh)
+@snapshot_read
+def search_licenses(software=None, room=None, active_only=False, match="substring", limit=None):
     """
     Поиск лицензий по параметрам:
-    - software: название ПО (LIKE)
+    - software: название ПО (через индекс licenses_fts, режим задаёт match)
     - room: номер аудитории
     - active_only: только активные лицензии
+    - match: substring, prefix или fuzzy (см. SEARCH_MATCH_MODES);
+      при fuzzy результаты упорядочены по релевантности (bm25)
+    - limit: не больше limit результатов (для строки поиска)
     """
+    query, params = _search_query(software, room, active_only, match, limit)
     with get_connection() as conn:
         cursor = conn.cursor()
-        query = """
-            SELECT l.id, c.room_number, c.computer_name, l.software, l.license_start, l.license_end, l.budget
-            FROM licenses l
-            JOIN computers c ON l.computer_id = c.id
-            WHERE 1=1
-        """
-        params = []
+        cursor.row_factory = _details_rows
+        cursor.execute(query, params)
+        return cursor.fetchall()
 
-        if software:
-            query += " AND l.software LIKE ?"
-            params.append(f"%{software}%")
 
-        if room:
-            query += " AND c.room_number = ?"
-            params.append(room)
+@snapshot_read
+def iter_search_licenses(software=None, room=None, active_only=False, match="substring",
+                         batch_size=1000):
+    """
+    То же, что search_licenses, но отдаёт строки пачками по batch_size
+    прямо из курсора — в памяти одновременно находится не больше одной пачки.
+    """
+    query, params = _search_query(software, room, active_only, match)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = _details_rows
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
 
-        if active_only:
-            today = datetime.now().strftime("%Y-%m-%d")
-            query += " AND l.license_start <= ? AND l.license_end >= ?"
-            params.extend([today, today])
 
-        cursor.execute(query, params)
-        return cursor.fetchall()
+# ---------------- Количество лицензий ---------------- #
+
+# Лицензия считается истекающей, если заканчивается в ближайшие EXPIRING_DAYS дней
+EXPIRING_DAYS = 60
+
+# Читать счётчики из таблицы license_summary (поддерживается триггерами)
+# вместо подсчёта по всей таблице licenses
+USE_LICENSE_SUMMARY = True
 
+# Все корзины за один проход: условия возвращают 0/1, SUM даёт количество
+_BUCKETS_SELECT = """
+    COUNT(*),
+    COALESCE(SUM(l.license_start <= :today AND l.license_end >= :today), 0),
+    COALESCE(SUM(l.license_end > :today AND l.license_end <= :soon), 0),
+    COALESCE(SUM(l.license_end < :today), 0),
+    TOTAL(l.budget),
+    TOTAL(CASE WHEN l.license_start <= :today AND l.license_end >= :today THEN l.budget END)
+"""
 
-        # ---------------- Количество лицензий ---------------- #
+_BUCKET_KEYS = ("total", "active", "expiring", "expired", "budget_total", "budget_active")
+
+
+def _bucket_params(today=None):
+    today = to_day(today or date.today())
+    return {"today": today, "soon": today + EXPIRING_DAYS}
+
+
+def refresh_license_summary(today=None):
+    """
+    Пересчитывает таблицу license_summary на указанную дату.
+
+    Триггеры поддерживают счётчики при изменении лицензий, но корзины
+    зависят от текущей даты, поэтому после полуночи сводку нужно
+    пересчитать целиком — count_licenses делает это автоматически.
+    """
+    params = _bucket_params(today)
+    with get_connection() as conn:
+        conn.execute(f"""
+            INSERT OR REPLACE INTO license_summary
+                (id, computed_for, expiring_until, {", ".join(_BUCKET_KEYS)})
+            SELECT 1, :today, :soon, {_BUCKETS_SELECT}
+            FROM licenses l
+        """, params)
+        conn.commit()
 
+
+@snapshot_read
 def count_licenses():
     """Возвращает количество лицензий: активные, истекают через 2 месяца, истекшие."""
-    today = datetime.now().date()
-    two_months = today + timedelta(days=60)
+    params = _bucket_params()
 
     with get_connection() as conn:
         cursor = conn.cursor()
 
-        # Активные (сегодня входит в диапазон)
-        cursor.execute("""
-            SELECT COUNT(*) FROM licenses 
-            WHERE license_start <= ? AND license_end >= ?
-        """, (today, today))
-        active = cursor.fetchone()[0]
+        row = None
+        if USE_LICENSE_SUMMARY:
+            cursor.execute(f"""
+                SELECT {", ".join(_BUCKET_KEYS)} FROM license_summary
+                WHERE id = 1 AND computed_for = :today
+            """, params)
+            row = cursor.fetchone()
+            if row is None and not reading_snapshot():
+                # Сводки нет или она посчитана на прошлую дату
+                refresh_license_summary()
+                return count_licenses()
+        if row is None:
+            # Без сводки или на снимке со сводкой на прошлую дату (снимок только для чтения)
+            cursor.execute(f"SELECT {_BUCKETS_SELECT} FROM licenses l", params)
+            row = cursor.fetchone()
 
-        # Истекают в ближайшие 2 месяца
-        cursor.execute("""
-            SELECT COUNT(*) FROM licenses 
-            WHERE license_end > ? AND license_end <= ?
-        """, (today, two_months))
-        expiring = cursor.fetchone()[0]
+    return dict(zip(_BUCKET_KEYS, row))
 
-        # Истекшие
-        cursor.execute("""
-            SELECT COUNT(*) FROM licenses 
-            WHERE license_end < ?
-        """, (today,))
-        expired = cursor.fetchone()[0]
 
-    return {"active": active, "expiring": expiring, "expired": expired}
+@cached("licenses", "computers", skip=_snapshot_fresh)
+@snapshot_read
+def get_license_summary():
+    """
+    Сводка для дашборда: общие счётчики и разбивка по аудиториям и ПО.
+
+    Каждая разбивка считается одним запросом с условной агрегацией.
+    """
+    params = _bucket_params()
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(f"""
+            SELECT c.room_number, {_BUCKETS_SELECT}
+            FROM licenses l
+            JOIN computers c ON l.computer_id = c.id
+            GROUP BY c.room_number
+            ORDER BY c.room_number
+        """, params)
+        by_room = [{"room_number": row[0], **dict(zip(_BUCKET_KEYS, row[1:]))}
+                   for row in cursor.fetchall()]
+
+        cursor.execute(f"""
+            SELECT l.software, {_BUCKETS_SELECT}
+            FROM licenses l
+            GROUP BY l.software
+            ORDER BY l.software
+        """, params)
+        by_software = [{"software": row[0], **dict(zip(_BUCKET_KEYS, row[1:]))}
+                       for row in cursor.fetchall()]
+
+    return {"totals": count_licenses(), "by_room": by_room, "by_software": by_software}
 
 
 # ---------------- Поиск по имени компьютера ---------------- #
@@ -179,8 +663,9 @@ def get_computer_by_name(room_number, computer_name):
     """Получает компьютер по аудитории и имени (уникальная пара)."""
     with get_connection() as conn:
         cursor = conn.cursor()
+        cursor.row_factory = row_factory("Computer", COMPUTER_FIELDS)
         cursor.execute("""
-            SELECT * FROM computers WHERE room_number = ? AND computer_name = ?
+            SELECT id, room_number, computer_name FROM computers WHERE room_number = ? AND computer_name = ?
         """, (room_number, computer_name))
         return cursor.fetchone()
 
@@ -191,6 +676,7 @@ def get_licenses_for_computer(room_number, computer_name):
     """Возвращает все лицензии для конкретного ПК в аудитории."""
     with get_connection() as conn:
         cursor = conn.cursor()
+        cursor.row_factory = row_factory("License", ("id", "software", "license_start", "license_end", "budget"))
         cursor.execute("""
             SELECT l.id, l.software, l.license_start, l.license_end, l.budget
             FROM licenses l
@@ -204,6 +690,8 @@ def get_licenses_for_room(room_number):
     """Возвращает все лицензии со всех компьютеров в аудитории."""
     with get_connection() as conn:
         cursor = conn.cursor()
+        cursor.row_factory = row_factory(
+            "License", ("computer_name", "software", "license_start", "license_end", "budget"))
         cursor.execute("""
             SELECT c.computer_name, l.software, l.license_start, l.license_end, l.budget
             FROM licenses l
@@ -215,6 +703,7 @@ def get_licenses_for_room(room_number):
 
 # ---------------- Все аудитории ---------------- #
 
+@cached("computers")
 def get_all_rooms():
     """Возвращает список всех аудиторий (уникальные номера)."""
     with get_connection() as conn:
@@ -223,10 +712,93 @@ def get_all_rooms():
         return [row[0] for row in cursor.fetchall()]
 
 
+# ---------------- Деревья аудиторий ---------------- #
+
+# Аудитория -> компьютеры -> лицензии одним запросом: LEFT JOIN по индексу
+# idx_computers_room_name уже упорядочен по аудитории и имени ПК, строки
+# группируются по мере чтения курсора (без запроса на каждый компьютер).
+ROOM_LICENSE_FIELDS = ("id", "software", "license_start", "license_end", "budget")
+
+_ROOM_TREE_SELECT = """
+    SELECT c.room_number, c.id, c.computer_name,
+           l.id, l.software, l.license_start, l.license_end, l.budget
+    FROM computers c
+    LEFT JOIN licenses l ON l.computer_id = c.id
+    WHERE {where}
+    ORDER BY c.room_number, c.computer_name, l.id
+"""
+
+
+def _room_trees(rows, today=None):
+    """
+    Строки _ROOM_TREE_SELECT -> деревья аудиторий (генератор).
+    totals — те же счётчики, что в сводке (_BUCKET_KEYS), и число компьютеров.
+    """
+    params = _bucket_params(today)
+    today, soon = params["today"], params["soon"]
+    for room_number, room_rows in groupby(rows, itemgetter(0)):
+        computers = []
+        total = active = expiring = expired = 0
+        budget_total = budget_active = 0.0
+        for (computer_id, computer_name), computer_rows in groupby(room_rows, itemgetter(1, 2)):
+            licenses = []
+            for _, _, _, license_id, software, start, end, budget in computer_rows:
+                if license_id is None:  # компьютер без лицензий
+                    continue
+                licenses.append({"id": license_id, "software": software, "license_start": from_day(start),
+                                 "license_end": from_day(end), "budget": budget})
+                total += 1
+                if budget is not None:
+                    budget_total += budget
+                if start <= today <= end:
+                    active += 1
+                    if budget is not None:
+                        budget_active += budget
+                if end < today:
+                    expired += 1
+                elif today < end <= soon:
+                    expiring += 1
+            computers.append({"id": computer_id, "computer_name": computer_name, "licenses": licenses})
+        totals = dict(zip(_BUCKET_KEYS, (total, active, expiring, expired,
+                                         round(budget_total, 2), round(budget_active, 2))))
+        yield {"room_number": room_number, "computers": computers,
+               "totals": {"computers": len(computers), **totals}}
+
+
+@cached("computers", "licenses")
+def get_room_trees(after=None, limit=None):
+    """
+    Аудитории с компьютерами и лицензиями, по номеру аудитории
+    (постранично: after — последний номер предыдущей страницы, limit — аудиторий).
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(_ROOM_TREE_SELECT.format(where="""c.room_number IN (
+            SELECT DISTINCT room_number FROM computers WHERE room_number > ?
+            ORDER BY room_number LIMIT ?)"""), (after or "", -1 if limit is None else limit))
+        return list(_room_trees(cursor))
+
+
+def get_room_tree(room_number, computer_name=None):
+    """
+    Дерево одной аудитории (при computer_name — только с этим компьютером);
+    None, если такой аудитории или компьютера нет.
+    """
+    where, params = "c.room_number = ?", [room_number]
+    if computer_name is not None:
+        where += " AND c.computer_name = ?"
+        params.append(computer_name)
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(_ROOM_TREE_SELECT.format(where=where), params)
+        return next(_room_trees(cursor), None)
+
+
 # ---------------- Добавление лицензии (по аудитории и ПК) ---------------- #
 
 def add_license_by_room(room_number, computer_name, software, license_start, license_end, budget):
     """Добавляет лицензию через аудиторию и ПК (без ручного выбора computer_id)."""
+    license_start, license_end = to_day(license_start), to_day(license_end)
     with get_connection() as conn:
         cursor = conn.cursor()
         # Получаем id ПК
@@ -243,6 +815,8 @@ def add_license_by_room(room_number, computer_name, software, license_start, lic
             VALUES (?, ?, ?, ?, ?)
         """, (comp_id, software, license_start, license_end, budget))
         conn.commit()
+    invalidate("licenses")
+    _notify_license_change(cursor.lastrowid, license_end)
 
 
 # ---------------- Изменение лицензии (по аудитории, ПК и названию) ---------------- #
@@ -251,6 +825,7 @@ def update_license_by_details(room_number, computer_name, software, new_start, n
     """
     Находит лицензию по аудитории, ПК и ПО, после чего обновляет даты.
     """
+    new_start, new_end = to_day(new_start), to_day(new_end)
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
@@ -267,6 +842,541 @@ def update_license_by_details(room_number, computer_name, software, new_start, n
             UPDATE licenses SET license_start = ?, license_end = ? WHERE id = ?
         """, (new_start, new_end, license_id))
         conn.commit()
+    invalidate("licenses")
+    _notify_license_change(license_id, new_end)
+
+
+# ---------------- Массовый импорт ---------------- #
+
+# Не больше 999 параметров на запрос (ограничение старых сборок SQLite)
+_RESOLVE_CHUNK = 400
+
+
+def _resolve_computers(cursor, pairs):
+    """
+    Находит id компьютеров по парам (аудитория, имя ПК) одним запросом на пачку.
+    Возвращает словарь {(room_number, computer_name): id}.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    found = {}
+    for start in range(0, len(pairs), _RESOLVE_CHUNK):
+        chunk = pairs[start:start + _RESOLVE_CHUNK]
+        values = ", ".join(["(?, ?)"] * len(chunk))
+        cursor.execute(f"""
+            WITH wanted(room_number, computer_name) AS (VALUES {values})
+            SELECT c.id, c.room_number, c.computer_name
+            FROM wanted w
+            JOIN computers c ON c.room_number = w.room_number AND c.computer_name = w.computer_name
+        """, [value for pair in chunk for value in pair])
+        for comp_id, room_number, computer_name in cursor.fetchall():
+            found[(room_number, computer_name)] = comp_id
+    return found
+
+
+def _existing_computer_ids(cursor, ids):
+    """Возвращает множество id из списка, для которых есть компьютер."""
+    ids = list(set(ids))
+    found = set()
+    for start in range(0, len(ids), _RESOLVE_CHUNK):
+        chunk = ids[start:start + _RESOLVE_CHUNK]
+        cursor.execute(
+            f"SELECT id FROM computers WHERE id IN ({', '.join(['?'] * len(chunk))})", chunk
+        )
+        found.update(row[0] for row in cursor.fetchall())
+    return found
+
+
+def _bulk_result(results, atomic):
+    """В атомарном режиме при любой ошибке остальные строки помечаются пропущенными."""
+    if atomic and any(result["status"] == "error" for result in results):
+        for result in results:
+            if result["status"] != "error":
+                result["status"] = "skipped"
+        return results, False
+    return results, True
+
+
+def add_computers_bulk(computers, atomic=False):
+    """
+    Добавляет компьютеры пачкой в одной транзакции.
+
+    computers — список пар (room_number, computer_name). Возвращает список
+    результатов по строкам в том же порядке: {"status": "created", "id": ...}
+    или {"status": "error", "error": ...}. При atomic=True ничего не
+    добавляется, если хотя бы одна строка ошибочна (статус остальных — "skipped").
+    """
+    computers = [tuple(pair) for pair in computers]
+    results = [{"status": "created"} for _ in computers]
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        existing = _resolve_computers(cursor, computers)
+        seen = set()
+        for result, pair in zip(results, computers):
+            if pair in existing:
+                result.update(status="error", error="Компьютер уже существует")
+            elif pair in seen:
+                result.update(status="error", error="Повтор компьютера в загрузке")
+            seen.add(pair)
+
+        results, proceed = _bulk_result(results, atomic)
+        to_insert = [pair for result, pair in zip(results, computers) if result["status"] == "created"]
+        if not proceed or not to_insert:
+            return results
+
+        cursor.executemany(
+            "INSERT INTO computers (room_number, computer_name) VALUES (?, ?)", to_insert
+        )
+        created = _resolve_computers(cursor, to_insert)
+        conn.commit()
+    invalidate("computers")
+
+    for result, pair in zip(results, computers):
+        if result["status"] == "created":
+            result["id"] = created[pair]
+            _known_computer_ids.add(result["id"])
+    return results
+
+
+def add_licenses_bulk(licenses, atomic=False):
+    """
+    Добавляет лицензии пачкой в одной транзакции.
+
+    licenses — список словарей с полями software, license_start, license_end,
+    budget и либо computer_id, либо парой room_number + computer_name.
+    Все пары аудитория/ПК и все computer_id проверяются одним запросом на
+    пачку, вставка выполняется через executemany. Результаты и atomic —
+    как в add_computers_bulk.
+    """
+    results = [{"status": "created"} for _ in licenses]
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        by_name = _resolve_computers(cursor, [
+            (item["room_number"], item["computer_name"])
+            for item in licenses if item.get("computer_id") is None
+        ])
+        by_id = _existing_computer_ids(cursor, [
+            item["computer_id"] for item in licenses if item.get("computer_id") is not None
+        ])
+
+        rows = []
+        for result, item in zip(results, licenses):
+            comp_id = item.get("computer_id")
+            if comp_id is None:
+                comp_id = by_name.get((item["room_number"], item["computer_name"]))
+            elif comp_id not in by_id:
+                comp_id = None
+            if comp_id is None:
+                result.update(status="error", error="Компьютер не найден")
+                continue
+            rows.append((comp_id, item["software"], to_day(item["license_start"]),
+                         to_day(item["license_end"]), item.get("budget")))
+
+        results, proceed = _bulk_result(results, atomic)
+        if not proceed or not rows:
+            return results
+
+        cursor.executemany("""
+            INSERT INTO licenses (computer_id, software, license_start, license_end, budget)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    invalidate("licenses")
+    _notify_license_change()
+
+    return results
+
+
+# ---------------- Массовое удаление ---------------- #
+
+# Строк на одну транзакцию: блокировка записи снимается между пачками,
+# и остальные запросы на запись не ждут окончания всего удаления
+DELETE_CHUNK_SIZE = 500
+
+
+@contextmanager
+def _write_transaction(conn):
+    """Транзакция с блокировкой записи с самого начала (BEGIN IMMEDIATE)."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def _deleted(computer_ids, license_ids):
+    """Кэш и подписчики после удаления (в том числе частичного — до ошибки в одной из пачек)."""
+    if computer_ids:
+        invalidate("computers", "licenses")
+        _known_computer_ids.difference_update(computer_ids)
+    elif license_ids:
+        invalidate("licenses")
+    _notify_license_changes((license_id, None) for license_id in license_ids)
+
+
+def delete_computers(ids):
+    """
+    Удаляет компьютеры по списку id вместе с их лицензиями, транзакциями
+    по DELETE_CHUNK_SIZE компьютеров. Возвращает {"computers": n, "licenses": m}.
+    """
+    ids = list(dict.fromkeys(ids))
+    computer_ids, license_ids = [], []
+    try:
+        with get_connection() as conn:
+            for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+                chunk = ids[start:start + DELETE_CHUNK_SIZE]
+                placeholders = ", ".join(["?"] * len(chunk))
+                with _write_transaction(conn) as cursor:
+                    # Лицензии удаляются каскадно (ON DELETE CASCADE), их id нужны подписчикам
+                    cursor.execute(f"SELECT id FROM licenses WHERE computer_id IN ({placeholders})", chunk)
+                    chunk_licenses = [row[0] for row in cursor.fetchall()]
+                    cursor.execute(f"DELETE FROM computers WHERE id IN ({placeholders}) RETURNING id", chunk)
+                    chunk_computers = [row[0] for row in cursor.fetchall()]
+                computer_ids += chunk_computers
+                license_ids += chunk_licenses
+    finally:
+        _deleted(computer_ids, license_ids)
+    return {"computers": len(computer_ids), "licenses": len(license_ids)}
+
+
+def delete_room(room_number):
+    """Удаляет все компьютеры аудитории с их лицензиями (см. delete_computers)."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM computers WHERE room_number = ?", (room_number,))
+        ids = [row[0] for row in cursor.fetchall()]
+    return delete_computers(ids)
+
+
+def delete_licenses(ids):
+    """Удаляет лицензии по списку id транзакциями по DELETE_CHUNK_SIZE; возвращает число удалённых."""
+    ids = list(dict.fromkeys(ids))
+    deleted = []
+    try:
+        with get_connection() as conn:
+            for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+                chunk = ids[start:start + DELETE_CHUNK_SIZE]
+                with _write_transaction(conn) as cursor:
+                    cursor.execute(f"DELETE FROM licenses WHERE id IN ({', '.join(['?'] * len(chunk))}) RETURNING id",
+                                   chunk)
+                    chunk_deleted = [row[0] for row in cursor.fetchall()]
+                deleted += chunk_deleted
+    finally:
+        _deleted((), deleted)
+    return len(deleted)
+
+
+def delete_expired_licenses(before):
+    """
+    Удаляет лицензии, закончившиеся раньше даты before (date, YYYY-MM-DD или
+    номер дня), транзакциями по DELETE_CHUNK_SIZE строк; возвращает их число.
+    """
+    before = to_day(before)
+    deleted = []
+    try:
+        with get_connection() as conn:
+            while True:
+                with _write_transaction(conn) as cursor:
+                    # Пачка по индексу idx_licenses_end; следующая транзакция берёт следующую
+                    cursor.execute("""
+                        DELETE FROM licenses WHERE id IN (
+                            SELECT id FROM licenses WHERE license_end < ? LIMIT ?
+                        ) RETURNING id
+                    """, (before, DELETE_CHUNK_SIZE))
+                    chunk = [row[0] for row in cursor.fetchall()]
+                deleted += chunk
+                if len(chunk) < DELETE_CHUNK_SIZE:
+                    break
+    finally:
+        _deleted((), deleted)
+    return len(deleted)
+
+
+# ---------------- Истечение лицензий ---------------- #
+
+EVENT_FIELDS = ("id", "license_id", "threshold", "license_end", "created_at", "delivered_at")
+# Через сколько секунд захват события для отправки на webhook считается брошенным
+CLAIM_TIMEOUT = 300
+
+
+def get_license_ends():
+    """
+    Пары (license_end, id) всех лицензий по возрастанию даты окончания (номер дня) —
+    для шкалы истечения (читаются из индекса idx_licenses_end без сортировки).
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT license_end, id FROM licenses ORDER BY license_end, id")
+        return cursor.fetchall()
+
+
+def get_licenses_by_ids(ids):
+    """Строки в формате SEARCH_FIELDS для списка id, в порядке ids."""
+    ids = list(ids)
+    found = {}
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = _details_rows
+        for start in range(0, len(ids), _RESOLVE_CHUNK):
+            chunk = ids[start:start + _RESOLVE_CHUNK]
+            cursor.execute(f"""
+                SELECT l.id, c.room_number, c.computer_name, l.software, l.license_start, l.license_end, l.budget
+                FROM licenses l
+                JOIN computers c ON l.computer_id = c.id
+                WHERE l.id IN ({', '.join(['?'] * len(chunk))})
+            """, chunk)
+            found.update((row[0], row) for row in cursor.fetchall())
+    return [found[license_id] for license_id in ids if license_id in found]
+
+
+@cached("licenses", "computers")
+def get_expiring_licenses(days, today=None):
+    """Лицензии, которые заканчиваются в ближайшие days дней (включая сегодня), по дате окончания."""
+    today = to_day(today or date.today())
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = _details_rows
+        cursor.execute("""
+            SELECT l.id, c.room_number, c.computer_name, l.software, l.license_start, l.license_end, l.budget
+            FROM licenses l
+            JOIN computers c ON l.computer_id = c.id
+            WHERE l.license_end >= ? AND l.license_end <= ?
+            ORDER BY l.license_end, l.id
+        """, (today, today + days))
+        return cursor.fetchall()
+
+
+def record_license_events(events):
+    """
+    Записывает события истечения (license_id, threshold, license_end) в license_events
+    одной транзакцией. Возвращает те из них, которых ещё не было, — с id события.
+    В журнале дата окончания хранится текстом YYYY-MM-DD.
+    """
+    created_at = datetime.now().isoformat(timespec="seconds")
+    recorded = []
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for license_id, threshold, license_end in events:
+            license_end = from_day(to_day(license_end)).isoformat()
+            cursor.execute("""
+                INSERT OR IGNORE INTO license_events (license_id, threshold, license_end, created_at)
+                VALUES (?, ?, ?, ?)
+            """, (license_id, threshold, license_end, created_at))
+            if cursor.rowcount:
+                recorded.append((cursor.lastrowid, license_id, threshold, license_end))
+        conn.commit()
+    if recorded:
+        invalidate("license_events")
+    return recorded
+
+
+@cached("license_events")
+def get_license_events(after=None, limit=None, fields=None):
+    return _select_page("license_events", EVENT_FIELDS, fields, after, limit)
+
+
+def claim_undelivered_events(limit=100, lease=None):
+    """
+    Захватывает до limit недоставленных событий для отправки на webhook и
+    возвращает их по возрастанию id. Событие, захваченное другим воркером меньше
+    lease секунд (по умолчанию CLAIM_TIMEOUT) назад, пропускается; более старый захват (воркер упал, не
+    отправив) считается брошенным. Отбор и отметка — один UPDATE под
+    BEGIN IMMEDIATE, поэтому два воркера не получат одно событие.
+    """
+    now = datetime.now()
+    lease = CLAIM_TIMEOUT if lease is None else lease
+    claimed_at = now.isoformat(timespec="seconds")
+    expired = (now - timedelta(seconds=lease)).isoformat(timespec="seconds")
+    with get_connection() as conn:
+        with _write_transaction(conn) as cursor:
+            cursor.row_factory = row_factory("LicenseEvent", EVENT_FIELDS, dates=False)
+            cursor.execute(f"""
+                UPDATE license_events SET delivering_at = ?
+                WHERE id IN (
+                    SELECT id FROM license_events
+                    WHERE delivered_at IS NULL AND (delivering_at IS NULL OR delivering_at < ?)
+                    ORDER BY id LIMIT ?
+                )
+                RETURNING {', '.join(EVENT_FIELDS)}
+            """, (claimed_at, expired, limit))
+            events = cursor.fetchall()
+    # Порядок строк RETURNING не определён
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def release_events(event_ids):
+    """Снимает захват с событий, которые не удалось отправить: их возьмёт следующая попытка."""
+    event_ids = list(event_ids)
+    if not event_ids:
+        return
+    with get_connection() as conn:
+        conn.executemany("UPDATE license_events SET delivering_at = NULL WHERE id = ?",
+                         [(event_id,) for event_id in event_ids])
+        conn.commit()
+
+
+def mark_events_delivered(event_ids):
+    event_ids = list(event_ids)
+    if not event_ids:
+        return
+    delivered_at = datetime.now().isoformat(timespec="seconds")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("UPDATE license_events SET delivered_at = ? WHERE id = ?",
+                           [(delivered_at, event_id) for event_id in event_ids])
+        conn.commit()
+    invalidate("license_events")
+
+
+# ---------------- Отчёты ---------------- #
+
+# Строки для отчётов (database/Reports.py) — обычные кортежи, даты в них
+# остаются номерами дней: столбцы собираются прямо в массивы numpy
+REPORT_FIELDS = ("id", "computer_id", "room_number", "software", "license_start", "license_end", "budget")
+
+_REPORT_SELECT = """
+    SELECT l.id, l.computer_id, c.room_number, l.software, l.license_start, l.license_end, l.budget
+    FROM licenses l
+    JOIN computers c ON l.computer_id = c.id
+"""
+
+
+def iter_report_rows(after=0, batch_size=100_000):
+    """Строки REPORT_FIELDS с id больше after по возрастанию id, пачками по batch_size."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(_REPORT_SELECT + " WHERE l.id > ? ORDER BY l.id", (after,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+
+
+def get_report_rows_by_ids(ids):
+    """Строки REPORT_FIELDS для списка id по возрастанию id; удалённых лицензий в ответе нет."""
+    ids = sorted(set(ids))
+    rows = []
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(ids), _RESOLVE_CHUNK):
+            chunk = ids[start:start + _RESOLVE_CHUNK]
+            cursor.execute(_REPORT_SELECT + f" WHERE l.id IN ({', '.join(['?'] * len(chunk))}) ORDER BY l.id",
+                           chunk)
+            rows += cursor.fetchall()
+    return rows
+
+
+# ---------------- Журнал изменений ---------------- #
+
+# Таблица changes заполняется триггерами (миграция 7) при любой записи
+# в computers и licenses, в том числе при каскадном удалении и массовых
+# операциях. Клиент запоминает seq последнего изменения и забирает только
+# новые: вставки и изменения — с текущими данными строки, удаления — без них.
+CHANGE_ENTITIES = {"computers": COMPUTER_FIELDS, "licenses": LICENSE_FIELDS}
+CHANGES_PAGE_LIMIT = 1000
+# Изменения старше стольких дней удаляются (trim_changes); клиент,
+# отставший сильнее, получает отказ и делает полную синхронизацию
+CHANGES_RETENTION_DAYS = 30
+# Как часто wait_for_changes проверяет журнал: он общий для всех процессов
+CHANGES_POLL_INTERVAL = 0.2
+
+
+def get_last_change_seq():
+    """seq последнего записанного изменения (0, если изменений не было)."""
+    with get_connection() as conn:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+
+def _changed_rows(cursor, entity, ids):
+    """Текущие строки таблицы entity по списку id: словарь {id: строка}."""
+    fields = CHANGE_ENTITIES[entity]
+    cursor.row_factory = row_factory(_ROW_TYPES[entity], fields, entity == "licenses")
+    found = {}
+    for start in range(0, len(ids), _RESOLVE_CHUNK):
+        chunk = ids[start:start + _RESOLVE_CHUNK]
+        cursor.execute(f"SELECT {', '.join(fields)} FROM {entity} WHERE id IN ({', '.join(['?'] * len(chunk))})",
+                       chunk)
+        found.update((row[0], row) for row in cursor.fetchall())
+    return found
+
+
+def get_changes(since=0, limit=CHANGES_PAGE_LIMIT):
+    """
+    Изменения с seq больше since (не больше limit записей журнала).
+
+    Несколько изменений одной строки схлопываются в последнее. Возвращает
+    {"changes": [{"seq", "entity", "id", "op", "data"}], "last_seq", "has_more"}:
+    op — insert, update или delete, data — текущая строка (None у удалённых;
+    строка, удалённая позже, сразу приходит как delete). None — если журнал
+    после since уже очищен и нужна полная синхронизация.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT seq, entity, entity_id, op FROM changes WHERE seq > ? ORDER BY seq LIMIT ?
+        """, (since, limit + 1))
+        rows = cursor.fetchall()
+        # Лишняя строка — признак следующей страницы
+        has_more = len(rows) > limit
+        del rows[limit:]
+        # seq идут подряд (откат транзакции откатывает и sqlite_sequence), trim_changes
+        # удаляет только начало журнала: пропуск после since — значит, он очищен.
+        # since больше последнего seq — курсор от другой (восстановленной) базы.
+        last = get_last_change_seq()
+        if since > last or (rows[0][0] if rows else last + 1) > since + 1:
+            return None
+
+        latest = {}
+        for seq, entity, entity_id, op in rows:
+            latest.pop((entity, entity_id), None)
+            latest[(entity, entity_id)] = (seq, op)
+        current = {}
+        for entity in CHANGE_ENTITIES:
+            ids = [entity_id for (kind, entity_id), (_, op) in latest.items() if kind == entity and op != "delete"]
+            current[entity] = _changed_rows(cursor, entity, ids) if ids else {}
+
+    changes = []
+    for (entity, entity_id), (seq, op) in latest.items():
+        row = current[entity].get(entity_id) if op != "delete" else None
+        if row is None:
+            op = "delete"
+        changes.append({"seq": seq, "entity": entity, "id": entity_id, "op": op,
+                        "data": row._asdict() if row is not None else None})
+    return {"changes": changes, "last_seq": rows[-1][0] if rows else max(since, 0),
+            "has_more": has_more}
+
+
+def wait_for_changes(since, timeout):
+    """Ждёт до timeout секунд изменения с seq больше since; True, если оно есть."""
+    deadline = time.monotonic() + timeout
+    while get_last_change_seq() <= since:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(CHANGES_POLL_INTERVAL, remaining))
+    return True
+
+
+def trim_changes(days=None):
+    """Удаляет изменения старше days (по умолчанию CHANGES_RETENTION_DAYS) дней; возвращает их число."""
+    days = CHANGES_RETENTION_DAYS if days is None else days
+    cutoff = int(time.time()) - days * 86400
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # changed_at растёт вместе с seq: удаляется начало журнала до первой свежей
+        # записи. Последняя запись остаётся всегда — по ней get_last_change_seq.
+        cursor.execute("""
+            DELETE FROM changes WHERE seq < COALESCE(
+                (SELECT seq FROM changes WHERE changed_at >= ? ORDER BY seq LIMIT 1),
+                (SELECT MAX(seq) FROM changes))
+        """, (cutoff,))
+        conn.commit()
+    return cursor.rowcount
 
 
 # ---------------- Пример ---------------- #
@@ -0,0 +1,96 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import os
+
+# Хэширование паролей через scrypt (требует много памяти — перебор на GPU дорог).
+# Стоимость: N — число итераций (степень двойки), память ~ 128 * N * R байт.
+# Значения можно переопределить из настроек приложения (PASSWORD_SCRYPT_*);
+# время одного хэша при разных N показывает benchmarks/bench_password.py.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+PREFIX = "scrypt"
+# Больше памяти на проверку сохранённый хэш потребовать не может (защита от
+# испорченной записи с огромным N)
+MAX_SCRYPT_MEMORY = 2 ** 30
+
+# Хэши пустого пароля для входа под несуществующим логином, по параметрам scrypt
+_dummy_hashes = {}
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=2 * 128 * n * r * p + 1024 * 1024, dklen=HASH_BYTES)
+
+
+def hash_password(password):
+    """Возвращает строку вида scrypt$N$R$P$соль$хэш (соль и хэш в base64)."""
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{PREFIX}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def _parse(stored):
+    """
+    Разбирает сохранённый хэш; None — пароль хранится открытым текстом (старые записи).
+    Испорченный хэш (не числа, не base64, недопустимые параметры) — ValueError.
+    """
+    parts = stored.split("$")
+    if len(parts) != 6 or parts[0] != PREFIX:
+        return None
+    _, n, r, p, salt, digest = parts
+    try:
+        n, r, p = int(n), int(r), int(p)
+        salt, digest = base64.b64decode(salt, validate=True), base64.b64decode(digest, validate=True)
+    except (ValueError, binascii.Error):
+        raise ValueError("Испорченный хэш пароля") from None
+    if n < 2 or n & (n - 1) or r < 1 or p < 1 or 128 * n * r * p > MAX_SCRYPT_MEMORY:
+        raise ValueError("Недопустимые параметры scrypt в хэше пароля")
+    return n, r, p, salt, digest
+
+
+def verify_password(password, stored):
+    """
+    Проверяет пароль по сохранённому значению (хэшу или открытому тексту старых записей).
+    С испорченным хэшем вход не выполняется.
+    """
+    try:
+        parsed = _parse(stored)
+    except ValueError:
+        return False
+    if parsed is None:
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    n, r, p, salt, digest = parsed
+    return hmac.compare_digest(_scrypt(password, salt, n, r, p), digest)
+
+
+def verify_dummy(password):
+    """
+    Проверка пароля для несуществующего логина: scrypt с текущими параметрами,
+    как у настоящего пользователя, чтобы по времени ответа нельзя было узнать,
+    есть ли такой логин. Всегда False.
+    """
+    params = (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    stored = _dummy_hashes.get(params)
+    if stored is None:
+        stored = _dummy_hashes[params] = hash_password("")
+    verify_password(password, stored)
+    return False
+
+
+def needs_rehash(stored):
+    """True, если пароль хранится открытым текстом или захэширован с другими параметрами."""
+    try:
+        parsed = _parse(stored)
+    except ValueError:
+        return True
+    return parsed is None or parsed[:3] != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
@@ -0,0 +1,503 @@
+"""
+Отчёты по бюджету и продлению лицензий.
+
+Лицензии вместе с аудиторией компьютера держатся в памяти по столбцам
+(массивы numpy, даты — номер дня от 1970-01-01, аудитории и названия ПО —
+коды в словарях). По столбцам поддерживаются агрегаты, из которых отчёты
+собираются без прохода по всем строкам:
+
+- бюджет по (месяц начала, аудитория) и (месяц начала, ПО) — отчёт spend;
+- непродлённые лицензии по дню окончания — прогноз продлений;
+- флаги «последняя в цепочке» и «пересекается с другой лицензией той же
+  пары ПК+ПО» у каждой строки — прогноз и дубликаты.
+
+Изменения через Functions.py приходят через subscribe_license_changes:
+перечитываются только изменённые строки и новые (id больше загруженных),
+а флаги и агрегаты пересчитываются только для затронутых пар ПК+ПО.
+Массовые изменения и изменения из других процессов подхватывает полная
+перезагрузка (не реже RELOAD_INTERVAL).
+
+numpy — необязательная зависимость (группа reports в pyproject.toml):
+без неё available() возвращает False, а маршруты /reports/* отвечают 503.
+"""
+import threading
+import time
+from datetime import date, datetime
+
+try:
+    import numpy as np
+except ImportError:  # отчёты недоступны
+    np = None
+
+try:
+    from . import DB
+    from .Functions import (
+        iter_report_rows, get_report_rows_by_ids,
+        subscribe_license_changes, unsubscribe_license_changes
+    )
+except ImportError:  # запуск как скрипта из папки database
+    import DB
+    from Functions import (
+        iter_report_rows, get_report_rows_by_ids,
+        subscribe_license_changes, unsubscribe_license_changes
+    )
+
+# Полная перезагрузка столбцов не реже чем раз в столько секунд —
+# подхватывает изменения, сделанные другими процессами
+RELOAD_INTERVAL = 600.0
+# Если изменения затронули больше пар ПК+ПО, флаги и агрегаты пересчитываются
+# целиком: каждая пара — отдельный проход по столбцу pair
+PATCH_PAIRS_LIMIT = 32
+
+SPEND_GROUPS = ("room", "software", "month")
+
+# Пара ПК+ПО — одно число: computer_id << SOFTWARE_BITS | код ПО.
+# Ключ сортировки цепочек — пара << DAY_BITS | (день - DAY_BASE), поэтому
+# computer_id должен быть меньше 2^(63 - SOFTWARE_BITS - DAY_BITS) = 2^25.
+SOFTWARE_BITS = 20
+DAY_BITS = 18
+DAY_BASE = -25567  # 1900-01-01; до 2617 года день помещается в DAY_BITS
+
+# Запас агрегатов на будущие месяцы и дни и на новые аудитории и названия ПО,
+# чтобы новые лицензии не требовали перестройки
+MONTHS_AHEAD = 36
+DAYS_AHEAD = 3 * 366
+GROUPS_AHEAD = 16
+
+_COLUMNS = (
+    ("ids", "int64"), ("pair", "int64"), ("room", "int32"), ("software", "int32"),
+    ("start", "int32"), ("end", "int32"), ("month", "int32"), ("budget", "float64"),
+    ("alive", "bool"), ("latest", "bool"), ("involved", "bool"), ("overlap_head", "bool"),
+)
+
+
+def available():
+    return np is not None
+
+
+def epoch_month(value):
+    """date или строка YYYY-MM -> номер месяца от января 1970."""
+    if isinstance(value, str):
+        value = datetime.strptime(value, "%Y-%m").date()
+    return (value.year - 1970) * 12 + value.month - 1
+
+
+def _months(days):
+    """Номера месяцев от января 1970 для массива дней."""
+    return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int32)
+
+
+def _month_label(month):
+    return str(np.datetime64(int(month), "M"))
+
+
+def _month_first_day(month):
+    return int(np.datetime64(int(month), "M").astype("datetime64[D]").astype(np.int64))
+
+
+class LicenseColumns:
+    """
+    Столбцы лицензий (атрибуты — представления длины size поверх буферов с запасом):
+    ids по возрастанию, pair (ПК+ПО), room и software (коды в rooms и softwares),
+    start, end (дни) и month (месяц начала), budget (NaN — бюджет не указан),
+    alive (False у удалённых до ближайшей перезагрузки) и флаги цепочек latest,
+    involved, overlap_head.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pending_lock = threading.Lock()
+        self._dirty = set()
+        self._stale = True
+        self._loaded_at = 0.0
+        self._db_name = None
+        self._subscribed = False
+        self._clear()
+
+    def _clear(self):
+        self.size = 0
+        self._buffers = {name: np.zeros(0, dtype) for name, dtype in _COLUMNS}
+        self._bind()
+        self.rooms, self.softwares = [], []
+        self._room_codes, self._software_codes = {}, {}
+        self._month0 = self._day0 = 0
+        self._room_cube = self._software_cube = np.zeros((3, 0, 0))
+        self._renewals = np.zeros((3, 0))
+
+    def _bind(self):
+        for name, _ in _COLUMNS:
+            setattr(self, name, self._buffers[name][:self.size])
+
+    def _reserve(self, extra):
+        capacity = len(self._buffers["ids"])
+        if self.size + extra <= capacity:
+            return
+        capacity = max(self.size + extra, capacity * 2, 1024)
+        for name, dtype in _COLUMNS:
+            buffer = np.zeros(capacity, dtype)
+            buffer[:self.size] = self._buffers[name][:self.size]
+            self._buffers[name] = buffer
+
+    @classmethod
+    def from_arrays(cls, ids, computer_id, room, software, start, end, budget, rooms, softwares):
+        """Столбцы из готовых массивов (коды room/software — индексы в rooms/softwares), без базы."""
+        columns = cls()
+        columns.rooms, columns.softwares = list(rooms), list(softwares)
+        columns._room_codes = {name: code for code, name in enumerate(columns.rooms)}
+        columns._software_codes = {name: code for code, name in enumerate(columns.softwares)}
+        columns._write(None, (ids, computer_id, room, software, start, end, budget))
+        columns._rebuild()
+        columns._stale = False
+        columns._loaded_at = float("inf")
+        columns._db_name = DB.DB_NAME
+        return columns
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive))
+
+    # ---------------- Загрузка ---------------- #
+
+    def on_license_change(self, license_id=None, license_end=None):
+        """Обработчик subscribe_license_changes: строка перечитывается при следующем отчёте."""
+        with self._pending_lock:
+            if license_id is None:
+                self._stale = True
+            else:
+                self._dirty.add(license_id)
+
+    def subscribe(self):
+        if not self._subscribed:
+            subscribe_license_changes(self.on_license_change)
+            self._subscribed = True
+
+    def unsubscribe(self):
+        unsubscribe_license_changes(self.on_license_change)
+        self._subscribed = False
+
+    def ensure_fresh(self):
+        """Перезагружает столбцы целиком или дочитывает изменения, если они были."""
+        self.subscribe()
+        with self._lock:
+            if (self._stale or self._db_name != DB.DB_NAME
+                    or time.monotonic() - self._loaded_at > RELOAD_INTERVAL):
+                self.reload()
+            else:
+                self.refresh()
+
+    def reload(self):
+        with self._lock:
+            with self._pending_lock:
+                self._stale = False
+                self._dirty = set()
+            self._loaded_at = time.monotonic()
+            self._db_name = DB.DB_NAME
+            self._clear()
+            for rows in iter_report_rows(0):
+                self._write(None, self._row_arrays(rows))
+            self._rebuild()
+
+    def refresh(self):
+        """Перечитывает изменённые лицензии и дочитывает новые (id больше загруженных)."""
+        with self._lock:
+            with self._pending_lock:
+                dirty, self._dirty = self._dirty, set()
+            last_id = int(self.ids[-1]) if self.size else 0
+            changed = sorted(license_id for license_id in dirty if license_id <= last_id)
+            changed_rows = get_report_rows_by_ids(changed) if changed else []
+            new_rows = [row for rows in iter_report_rows(last_id) for row in rows]
+            if changed or new_rows:
+                self._apply(changed, changed_rows, new_rows)
+
+    def _code(self, codes, names, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def _row_arrays(self, rows):
+        """Строки REPORT_FIELDS -> массивы (ids, computer_id, room, software, start, end, budget)."""
+        if not rows:
+            return tuple(np.zeros(0, dtype) for dtype in
+                         ("int64", "int64", "int32", "int32", "int32", "int32", "float64"))
+        ids, computer_ids, rooms, softwares, starts, ends, budgets = zip(*rows)
+        return (
+            np.array(ids, np.int64),
+            np.array(computer_ids, np.int64),
+            np.array([self._code(self._room_codes, self.rooms, room) for room in rooms], np.int32),
+            np.array([self._code(self._software_codes, self.softwares, name) for name in softwares], np.int32),
+            np.array(starts, np.int32),
+            np.array(ends, np.int32),
+            np.array(budgets, np.float64),  # None -> NaN
+        )
+
+    def _write(self, at, arrays):
+        """Записывает строки в позиции at (None — в конец) и делает их действующими."""
+        ids, computer_id, room, software, start, end, budget = arrays
+        if at is None:
+            self._reserve(len(ids))
+            at = np.arange(self.size, self.size + len(ids))
+            self.size += len(ids)
+            self._bind()
+            self.ids[at] = ids
+        self.pair[at] = (np.asarray(computer_id, np.int64) << SOFTWARE_BITS) | software
+        self.room[at], self.software[at] = room, software
+        self.start[at], self.end[at], self.budget[at] = start, end, budget
+        self.month[at] = _months(np.asarray(start))
+        self.alive[at] = True
+
+    def _positions(self, ids):
+        """Позиции загруженных строк с данными id (id без строки отбрасываются)."""
+        ids = np.asarray(ids, np.int64)
+        if not self.size or not len(ids):
+            return np.zeros(0, np.int64)
+        at = np.minimum(np.searchsorted(self.ids, ids), self.size - 1)
+        return at[self.ids[at] == ids]
+
+    def _apply(self, requested, changed_rows, new_rows):
+        """
+        Применяет перечитанные строки (из запрошенных по id requested не
+        вернувшиеся удалены) и новые строки, пересчитывая флаги и агрегаты
+        только для затронутых пар ПК+ПО.
+        """
+        changed = self._row_arrays(changed_rows)
+        new = self._row_arrays(new_rows)
+        requested_at = self._positions(requested)
+        changed_at = self._positions(changed[0])
+        keep = np.isin(changed[0], self.ids[changed_at])
+        changed = tuple(column[keep] for column in changed)
+        pairs = np.unique(np.concatenate([
+            self.pair[requested_at],
+            (changed[1] << SOFTWARE_BITS) | changed[3],
+            (new[1] << SOFTWARE_BITS) | new[3],
+        ]))
+
+        if len(pairs) > PATCH_PAIRS_LIMIT:
+            self.alive[requested_at] = False
+            self._write(changed_at, changed)
+            self._write(None, new)
+            self._rebuild()
+            return
+
+        self._account(self._pair_rows(pairs), -1)
+        self.alive[requested_at] = False
+        self._write(changed_at, changed)
+        self._write(None, new)
+        rows = self._pair_rows(pairs)
+        self._mark_chains(rows)
+        if not self._account(rows, 1):
+            self._rebuild_aggregates()
+
+    def _pair_rows(self, pairs):
+        """Позиции всех строк (в том числе удалённых) данных пар ПК+ПО."""
+        found = np.zeros(self.size, bool)
+        for pair in pairs:
+            found |= self.pair == pair
+        return np.flatnonzero(found)
+
+    # ---------------- Флаги цепочек и агрегаты ---------------- #
+
+    def _rebuild(self):
+        self._mark_chains(np.arange(self.size))
+        self._rebuild_aggregates()
+
+    def _mark_chains(self, rows):
+        """
+        Пересчитывает флаги строк rows (все строки своих пар ПК+ПО). Действующие
+        строки упорядочиваются по (пара, дата начала): latest — последняя в паре
+        (лицензию ещё не продлили), involved — срок пересекается с другой лицензией
+        пары (накопленный максимум даты окончания по составному ключу не переходит
+        границу пары), overlap_head — первая такая строка пары.
+        """
+        self.latest[rows] = self.involved[rows] = self.overlap_head[rows] = False
+        rows = rows[self.alive[rows]]
+        if not len(rows):
+            return
+        key = (self.pair[rows] << DAY_BITS) | (self.start[rows] - DAY_BASE)
+        order = rows[np.argsort(key)]
+        pair = self.pair[order]
+        shifted = pair << DAY_BITS
+
+        last = np.ones(len(order), bool)
+        last[:-1] = pair[1:] != pair[:-1]
+        self.latest[order[last]] = True
+
+        reach = np.maximum.accumulate(shifted | (self.end[order] - DAY_BASE))
+        overlaps_previous = (shifted[1:] | (self.start[order[1:]] - DAY_BASE)) <= reach[:-1]
+        involved = np.zeros(len(order), bool)
+        involved[1:] |= overlaps_previous
+        involved[:-1] |= overlaps_previous
+        involved = np.flatnonzero(involved)
+        self.involved[order[involved]] = True
+
+        involved_pairs = pair[involved]
+        head = np.ones(len(involved), bool)
+        head[1:] = involved_pairs[1:] != involved_pairs[:-1]
+        self.overlap_head[order[involved[head]]] = True
+
+    def _rebuild_aggregates(self):
+        """Агрегаты spend и прогноза продлений заново по всем действующим строкам."""
+        live = np.flatnonzero(self.alive)
+        if len(live):
+            self._month0 = int(self.month[live].min())
+            months = int(self.month[live].max()) - self._month0 + 1 + MONTHS_AHEAD
+            self._day0 = int(self.end[live].min())
+            days = int(self.end[live].max()) - self._day0 + 1 + DAYS_AHEAD
+        else:
+            self._month0, self._day0 = epoch_month(date.today()), DB.to_day(date.today())
+            months, days = MONTHS_AHEAD, DAYS_AHEAD
+
+        month = (self.month[live] - self._month0).astype(np.int64)
+        priced = ~np.isnan(self.budget[live])
+        spent = np.nan_to_num(self.budget[live])
+
+        def cube(codes, groups):
+            index = month * groups + codes
+            size = months * groups
+            return np.stack([
+                np.bincount(index, minlength=size).astype(np.float64),
+                np.bincount(index, weights=priced, minlength=size),
+                np.bincount(index, weights=spent, minlength=size),
+            ]).reshape(3, months, groups)
+
+        self._room_cube = cube(self.room[live], len(self.rooms) + GROUPS_AHEAD)
+        self._software_cube = cube(self.software[live], len(self.softwares) + GROUPS_AHEAD)
+
+        latest = live[self.latest[live]]
+        day = self.end[latest] - self._day0
+        self._renewals = np.stack([
+            np.bincount(day, minlength=days).astype(np.float64),
+            np.bincount(day, weights=np.isnan(self.budget[latest]), minlength=days),
+            np.bincount(day, weights=np.nan_to_num(self.budget[latest]), minlength=days),
+        ])
+
+    def _account(self, rows, sign):
+        """
+        Добавляет (sign=1) или вычитает (sign=-1) вклад строк в агрегаты. Если строка
+        не помещается в границы агрегатов, ничего не меняет и возвращает False.
+        """
+        live = rows[self.alive[rows]]
+        latest = live[self.latest[live]]
+        month = self.month[live] - self._month0
+        day = self.end[latest] - self._day0
+        if len(live) and (month.min() < 0 or month.max() >= self._room_cube.shape[1]
+                          or self.room[live].max() >= self._room_cube.shape[2]
+                          or self.software[live].max() >= self._software_cube.shape[2]):
+            return False
+        if len(latest) and (day.min() < 0 or day.max() >= self._renewals.shape[1]):
+            return False
+
+        budget = self.budget[live]
+        for cube, codes in ((self._room_cube, self.room[live]), (self._software_cube, self.software[live])):
+            np.add.at(cube[0], (month, codes), sign)
+            np.add.at(cube[1], (month, codes), sign * ~np.isnan(budget))
+            np.add.at(cube[2], (month, codes), sign * np.nan_to_num(budget))
+        budget = self.budget[latest]
+        np.add.at(self._renewals[0], day, sign)
+        np.add.at(self._renewals[1], day, sign * np.isnan(budget))
+        np.add.at(self._renewals[2], day, sign * np.nan_to_num(budget))
+        return True
+
+    # ---------------- Отчёты ---------------- #
+
+    def spend(self, by="room", month_from=None, month_to=None):
+        """
+        Бюджет лицензий по аудиториям, ПО или месяцам начала действия.
+        month_from, month_to (YYYY-MM, включительно) ограничивают месяц начала лицензии.
+        Возвращает список {key, licenses, priced, spend}: для аудиторий и ПО —
+        по убыванию суммы, для месяцев — по порядку.
+        """
+        if by not in SPEND_GROUPS:
+            raise ValueError(f"Группировка должна быть одной из: {', '.join(SPEND_GROUPS)}")
+        with self._lock:
+            cube = self._room_cube if by == "room" else self._software_cube
+            low = 0 if month_from is None else max(epoch_month(month_from) - self._month0, 0)
+            high = cube.shape[1] if month_to is None else max(epoch_month(month_to) - self._month0 + 1, 0)
+            window = cube[:, low:max(high, low)]
+            if by == "month":
+                totals = window.sum(axis=2)
+                month0 = self._month0 + low
+                label = lambda code: _month_label(month0 + code)
+            else:
+                totals = window.sum(axis=1)
+                label = (self.rooms if by == "room" else self.softwares).__getitem__
+        groups = np.flatnonzero(totals[0] > 0.5)
+        if by != "month":
+            groups = groups[np.argsort(-totals[2][groups], kind="stable")]
+        licenses, priced = np.rint(totals[:2, groups]).astype(np.int64).tolist()
+        spent = np.round(totals[2, groups], 2).tolist()
+        return [{"key": label(code), "licenses": count, "priced": with_budget, "spend": total}
+                for code, count, with_budget, total in zip(groups.tolist(), licenses, priced, spent)]
+
+    def renewal_forecast(self, months=12, today=None):
+        """
+        Продления на ближайшие months месяцев (включая текущий): лицензии, которые
+        заканчиваются в этом месяце, начиная с сегодняшнего дня, и ещё не продлены
+        (у пары ПК+ПО нет лицензии с более поздней датой начала). budget — сумма
+        продлений по прежней цене, unpriced — сколько из них без бюджета.
+        """
+        today = today or datetime.now().date()
+        first = epoch_month(today)
+        with self._lock:
+            low = max(DB.to_day(today) - self._day0, 0)
+            high = min(_month_first_day(first + months) - self._day0, self._renewals.shape[1])
+            window = self._renewals[:, low:max(high, low)]
+            month = _months(np.arange(low, low + window.shape[1]) + self._day0) - first
+        licenses, unpriced, budget = (np.bincount(month, weights=values, minlength=months)
+                                      for values in window)
+        return [{"month": _month_label(first + code), "licenses": int(round(licenses[code])),
+                 "unpriced": int(round(unpriced[code])), "budget": round(float(budget[code]), 2)}
+                for code in range(months)]
+
+    def overlaps(self, limit=100):
+        """
+        Дублирующиеся лицензии: одно и то же ПО на одном компьютере с
+        пересекающимися сроками. Возвращает число таких пар ПК+ПО, число лицензий
+        в них и первые limit пар по id компьютера.
+        """
+        with self._lock:
+            selected = self.pair[self.overlap_head]
+            groups = len(selected)
+            if groups > limit:
+                selected = np.partition(selected, limit - 1)[:limit] if limit else selected[:0]
+            selected = np.sort(selected)
+            items = []
+            if len(selected):
+                # Строки выбранных пар: сначала дешёвый отбор по верхней границе пары
+                rows = np.flatnonzero(self.involved & (self.pair <= selected[-1]))
+                pairs = self.pair[rows]
+                at = np.searchsorted(selected, pairs)
+                rows = rows[selected[at] == pairs]
+                rows = rows[np.lexsort((self.start[rows], self.pair[rows]))]
+                for group in np.split(rows, np.flatnonzero(np.diff(self.pair[rows])) + 1):
+                    first = group[0]
+                    items.append({
+                        "computer_id": int(self.pair[first] >> SOFTWARE_BITS),
+                        "room_number": self.rooms[self.room[first]],
+                        "software": self.softwares[self.software[first]],
+                        "licenses": [{
+                            "id": int(self.ids[row]),
+                            "license_start": DB.from_day(int(self.start[row])),
+                            "license_end": DB.from_day(int(self.end[row])),
+                            "budget": None if np.isnan(self.budget[row]) else float(self.budget[row]),
+                        } for row in group],
+                    })
+            return {"groups": groups, "licenses": int(np.count_nonzero(self.involved)), "items": items}
+
+
+columns = LicenseColumns() if available() else None
+
+
+def spend(by="room", month_from=None, month_to=None):
+    columns.ensure_fresh()
+    return columns.spend(by, month_from, month_to)
+
+
+def renewal_forecast(months=12, today=None):
+    columns.ensure_fresh()
+    return columns.renewal_forecast(months, today)
+
+
+def overlaps(limit=100):
+    columns.ensure_fresh()
+    return columns.overlaps(limit)
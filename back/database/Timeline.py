@@ -0,0 +1,254 @@
+import json
+import logging
+import threading
+import time
+import urllib.request
+from bisect import bisect_right, insort
+from datetime import datetime, timedelta
+
+try:
+    from .DB import to_day
+    from .Functions import (
+        EXPIRING_DAYS, EVENT_FIELDS, get_license_ends, get_licenses_by_ids,
+        get_expiring_licenses, record_license_events, claim_undelivered_events,
+        release_events, mark_events_delivered, subscribe_license_changes, unsubscribe_license_changes
+    )
+except ImportError:  # запуск как скрипта из папки database
+    from DB import to_day
+    from Functions import (
+        EXPIRING_DAYS, EVENT_FIELDS, get_license_ends, get_licenses_by_ids,
+        get_expiring_licenses, record_license_events, claim_undelivered_events,
+        release_events, mark_events_delivered, subscribe_license_changes, unsubscribe_license_changes
+    )
+
+logger = logging.getLogger(__name__)
+
+# Шкала истечения лицензий и планировщик событий.
+# Событие с порогом T записывается, когда до окончания лицензии остаётся
+# не больше T дней (0 — последний день действия).
+EXPIRY_THRESHOLDS = (EXPIRING_DAYS, 0)
+# Как часто планировщик проверяет смену дня и отправляет события, секунд
+CHECK_INTERVAL = 60.0
+# Полная пересинхронизация шкалы с базой — подхватывает изменения,
+# сделанные другими процессами (воркерами, скриптами), секунд
+RESYNC_INTERVAL = 600.0
+# Порог, пересечённый не раньше чем CATCHUP_DAYS дней назад (например, пока
+# сервер был остановлен или лицензию добавили задним числом), ещё даёт событие;
+# более старые считаются историей
+CATCHUP_DAYS = 7
+# Событий за одну отправку на webhook
+WEBHOOK_BATCH = 100
+
+
+class ExpiryTimeline:
+    """
+    Лицензии, упорядоченные по дате окончания: отсортированный список пар
+    (license_end, id) и словарь id -> license_end (даты — номер дня, DB.to_day).
+
+    Выборка диапазона дат — два двоичных поиска и срез, O(log n + k).
+    """
+
+    def __init__(self):
+        self._ends = []
+        self._by_id = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, pairs):
+        """Заменяет содержимое парами (license_end, id)."""
+        ends = sorted(pairs)
+        with self._lock:
+            self._ends = ends
+            self._by_id = {license_id: license_end for license_end, license_id in ends}
+            self.loaded = True
+
+    def upsert(self, license_id, license_end):
+        with self._lock:
+            self._discard(license_id)
+            insort(self._ends, (license_end, license_id))
+            self._by_id[license_id] = license_end
+
+    def remove(self, license_id):
+        with self._lock:
+            self._discard(license_id)
+
+    def _discard(self, license_id):
+        license_end = self._by_id.pop(license_id, None)
+        if license_end is not None:
+            index = bisect_right(self._ends, (license_end, license_id)) - 1
+            if index >= 0 and self._ends[index] == (license_end, license_id):
+                del self._ends[index]
+
+    def between(self, after, until):
+        """Пары (license_end, id) с датой окончания в (after, until], по возрастанию даты."""
+        with self._lock:
+            low = bisect_right(self._ends, (after, float("inf")))
+            high = bisect_right(self._ends, (until, float("inf")))
+            return self._ends[low:high]
+
+    def expiring_within(self, days, today=None):
+        """id лицензий, которые заканчиваются в ближайшие days дней (включая сегодня)."""
+        today = to_day(today or datetime.now().date())
+        pairs = self.between(today - 1, today + days)
+        return [license_id for _, license_id in pairs]
+
+    def __len__(self):
+        return len(self._ends)
+
+
+class ExpiryScheduler:
+    """
+    Фоновый поток, который держит шкалу в актуальном состоянии и записывает
+    события истечения в license_events (outbox) и в лог, а при заданном
+    webhook_url отправляет их POST-запросом.
+
+    Изменения через Functions.py (add_license, update_license и т.д.)
+    попадают в шкалу сразу через subscribe_license_changes. Одно и то же
+    событие не записывается дважды (уникальный ключ в license_events), поэтому
+    планировщик можно запускать в каждом воркере. Пачку для webhook воркер
+    захватывает (claim_undelivered_events), так что воркеры отправляют разные
+    события. Доставка — «хотя бы один раз»: если ответ webhook не дошёл или
+    воркер упал после отправки, событие придёт повторно.
+    """
+
+    def __init__(self, timeline, thresholds=EXPIRY_THRESHOLDS):
+        self.timeline = timeline
+        self.thresholds = thresholds
+        self.interval = CHECK_INTERVAL
+        self.resync_interval = RESYNC_INTERVAL
+        self.webhook_url = None
+        self._today = None
+        self._stale = False
+        self._synced_at = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None, webhook_url=None):
+        """Загружает шкалу и запускает поток (повторный вызов ничего не делает)."""
+        if self.running:
+            return
+        if interval is not None:
+            self.interval = interval
+        self.webhook_url = webhook_url or None
+        self._stop.clear()
+        self._today = datetime.now().date()
+        self.resync()
+        subscribe_license_changes(self.on_license_change)
+        self._thread = threading.Thread(target=self._run, name="expiry-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        unsubscribe_license_changes(self.on_license_change)
+        self._stop.set()
+        if self.running:
+            self._thread.join()
+        self._thread = None
+
+    def _bound(self, threshold, today=None):
+        return to_day(today or self._today) + threshold
+
+    def _catchup_bound(self, threshold):
+        return self._bound(threshold, self._today - timedelta(days=CATCHUP_DAYS))
+
+    def resync(self):
+        """Перечитывает шкалу из базы и записывает пропущенные события за последние CATCHUP_DAYS дней."""
+        self._stale = False
+        self.timeline.load(get_license_ends())
+        self._synced_at = time.monotonic()
+        self._emit_ranges({threshold: self._catchup_bound(threshold) for threshold in self.thresholds})
+
+    def ensure_fresh(self):
+        """Пересинхронизирует шкалу, если после массового изменения она помечена устаревшей."""
+        if self._stale:
+            self.resync()
+
+    def on_license_change(self, license_id, license_end):
+        if license_id is None:
+            # Массовое изменение — шкала перечитывается при следующем обращении
+            self._stale = True
+            return
+        if license_end is None:
+            self.timeline.remove(license_id)
+            return
+        self.timeline.upsert(license_id, license_end)
+        # Новая или изменённая лицензия сразу оказывается за порогом — событие
+        # только для самого близкого из пересечённых (давно истёкшие — история)
+        if license_end <= self._bound(0, self._today - timedelta(days=CATCHUP_DAYS)):
+            return
+        crossed = [threshold for threshold in self.thresholds if license_end <= self._bound(threshold)]
+        if crossed:
+            self._emit([(license_id, min(crossed), license_end)])
+
+    def tick(self, today=None):
+        """Одна проверка: смена дня, плановая пересинхронизация и отправка событий."""
+        today = today or datetime.now().date()
+        if today != self._today:
+            previous = {threshold: self._bound(threshold) for threshold in self.thresholds}
+            self._today = today
+            self._emit_ranges(previous)
+        if self._stale or time.monotonic() - self._synced_at >= self.resync_interval:
+            self.resync()
+        if self.webhook_url:
+            self.deliver()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Ошибка планировщика истечения лицензий")
+
+    def _emit_ranges(self, since):
+        """События для лицензий, пересёкших порог после since[threshold] и до сегодняшнего дня."""
+        self._emit([
+            (license_id, threshold, license_end)
+            for threshold, after in since.items()
+            for license_end, license_id in self.timeline.between(after, self._bound(threshold))
+        ])
+
+    def _emit(self, events):
+        if not events:
+            return
+        for _, license_id, threshold, license_end in record_license_events(events):
+            if threshold:
+                logger.info("Лицензия %s истекает %s (осталось не больше %s дн.)",
+                            license_id, license_end, threshold)
+            else:
+                logger.info("Лицензия %s истекает сегодня (%s)", license_id, license_end)
+
+    def deliver(self):
+        """Отправляет недоставленные события на webhook пачками по WEBHOOK_BATCH."""
+        while True:
+            events = claim_undelivered_events(WEBHOOK_BATCH)
+            if not events:
+                return
+            body = json.dumps([dict(zip(EVENT_FIELDS, event)) for event in events]).encode("utf-8")
+            request = urllib.request.Request(self.webhook_url, data=body, method="POST",
+                                             headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=10):
+                    pass
+            except OSError as e:
+                logger.warning("Не удалось отправить события истечения на %s: %s", self.webhook_url, e)
+                release_events(event[0] for event in events)
+                return
+            mark_events_delivered(event[0] for event in events)
+
+
+timeline = ExpiryTimeline()
+scheduler = ExpiryScheduler(timeline)
+
+
+def expiring_licenses(days, today=None):
+    """
+    Лицензии, которые заканчиваются в ближайшие days дней, по дате окончания.
+    При запущенном планировщике id берутся из шкалы, иначе — запросом к базе.
+    """
+    if not scheduler.running:
+        return get_expiring_licenses(days, today)
+    scheduler.ensure_fresh()
+    return get_licenses_by_ids(timeline.expiring_within(days, today))
@@ -0,0 +1,151 @@
+"""
+Обслуживание базы.
+
+    python -m database.maintenance                 # все шаги
+    python -m database.maintenance --no-vacuum     # без VACUUM (он блокирует базу)
+
+Шаги:
+- лицензии без компьютера: в базах, которые заполнялись с выключенной
+  проверкой внешних ключей (PRAGMA foreign_keys = OFF), удаление компьютера
+  оставляло его лицензии; они удаляются пачками через Functions.delete_licenses,
+  а остальные нарушения внешних ключей печатаются (PRAGMA foreign_key_check);
+- журнал изменений старше Functions.CHANGES_RETENTION_DAYS дней;
+- статистика планировщика запросов (PRAGMA optimize);
+- VACUUM: файл базы сжимается после массовых удалений, WAL-файл обнуляется.
+
+Журнал изменений, кроме того, очищает фоновый поток ChangesTrimmer, который
+сервер запускает в каждом воркере (CHANGES_TRIM_INTERVAL).
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+try:
+    from . import DB
+    from .DB import get_connection
+    from .Functions import delete_licenses, trim_changes
+except ImportError:  # запуск как скрипта из папки database
+    import DB
+    from DB import get_connection
+    from Functions import delete_licenses, trim_changes
+
+logger = logging.getLogger(__name__)
+
+# Как часто фоновый поток очищает журнал изменений, секунд
+CHANGES_TRIM_INTERVAL = 3600.0
+
+
+def find_orphan_licenses():
+    """id лицензий, чей computer_id не ссылается на существующий компьютер"""
+    with get_connection() as conn:
+        return [row[0] for row in conn.execute(
+            "SELECT id FROM licenses WHERE computer_id NOT IN (SELECT id FROM computers)")]
+
+
+def foreign_key_violations():
+    """Нарушения внешних ключей: (таблица, rowid, таблица ссылки) по всем таблицам"""
+    with get_connection() as conn:
+        return [row[:3] for row in conn.execute("PRAGMA foreign_key_check")]
+
+
+def delete_orphans():
+    """Удаляет лицензии без компьютера; возвращает их число."""
+    return delete_licenses(find_orphan_licenses())
+
+
+def optimize():
+    with get_connection() as conn:
+        conn.execute("PRAGMA optimize")
+
+
+def vacuum():
+    """Пересобирает файл базы и обнуляет WAL; возвращает размер файла до и после."""
+    before = os.path.getsize(DB.DB_NAME)
+    conn = get_connection()
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return before, os.path.getsize(DB.DB_NAME)
+
+
+class ChangesTrimmer:
+    """
+    Фоновый поток, удаляющий из журнала изменений записи старше
+    Functions.CHANGES_RETENTION_DAYS дней раз в CHANGES_TRIM_INTERVAL секунд.
+    Не зависит от планировщика истечения лицензий; может работать в каждом
+    воркере: повторная очистка удаляет только то, что успело устареть.
+    """
+
+    def __init__(self):
+        self.interval = CHANGES_TRIM_INTERVAL
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        """Очищает журнал и запускает поток (повторный вызов ничего не делает)."""
+        if self.running:
+            return
+        if interval is not None:
+            self.interval = interval
+        self._stop.clear()
+        self.tick()
+        self._thread = threading.Thread(target=self._run, name="changes-trimmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.running:
+            self._thread.join()
+        self._thread = None
+
+    def tick(self):
+        removed = trim_changes()
+        if removed:
+            logger.info("Из журнала изменений удалено записей: %s", removed)
+        return removed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Ошибка очистки журнала изменений")
+
+
+changes_trimmer = ChangesTrimmer()
+
+
+def _step(title, func):
+    started = time.perf_counter()
+    result = func()
+    value = "" if result is None else f": {result}"
+    print(f"{title}{value} ({time.perf_counter() - started:.2f} с)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обслуживание базы")
+    parser.add_argument("--db", help="путь к базе (по умолчанию DB.DB_NAME)")
+    parser.add_argument("--no-vacuum", action="store_true", help="не пересобирать файл базы")
+    args = parser.parse_args()
+
+    if args.db:
+        DB.DB_NAME = args.db
+    _step("Удалено лицензий без компьютера", delete_orphans)
+    violations = foreign_key_violations()
+    for table, rowid, parent in violations:
+        print(f"Нарушение внешнего ключа: {table} rowid={rowid} -> {parent}")
+    _step("Удалено записей журнала изменений", trim_changes)
+    _step("PRAGMA optimize", optimize)
+    if not args.no_vacuum:
+        before, after = _step("VACUUM, байт до и после", vacuum)
+        print(f"Освобождено {(before - after) / 2**20:.1f} МиБ")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,232 @@
+"""
+Заполнение базы синтетическими данными.
+
+    python -m database.seed                                  # небольшой набор для разработки
+    python -m database.seed --rooms 10000 --computers 1000000 --licenses 10000000
+
+Строки вставляются пачками через executemany. На время загрузки триггеры
+licenses (сводка, полнотекстовый индекс) снимаются, после загрузки индекс
+перестраивается, а сводка пересчитывается одним проходом.
+
+Распределения:
+- компьютеры раскиданы по аудиториям неравномерно (есть большие классы и маленькие);
+- популярность ПО по закону Ципфа: несколько названий встречаются намного чаще остальных;
+- лицензии идут цепочками продлений: следующая начинается на следующий день
+  после окончания предыдущей, с вероятностью renewal_rate;
+- у части лицензий (null_budget_rate) бюджет не указан.
+"""
+import argparse
 import random
-from datetime import datetime, timedelta
-from DB import init_db, get_connection
-from Functions import add_user, add_computer, add_license
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from itertools import accumulate, islice
+
+try:
+    from . import DB
+    from .DB import init_db, get_connection
+    from .Functions import refresh_license_summary
+    from .Passwords import hash_password
+except ImportError:  # запуск как скрипта из папки database
+    import DB
+    from DB import init_db, get_connection
+    from Functions import refresh_license_summary
+    from Passwords import hash_password
+
+# Названия ПО и базовая цена годовой лицензии; к названию добавляется год версии
+SOFTWARE_TITLES = [
+    ("MS Office", 15000), ("Windows 11 Pro", 12000), ("Kaspersky Endpoint", 3000),
+    ("AutoCAD", 25000), ("Photoshop", 18000), ("Illustrator", 18000), ("Premiere Pro", 20000),
+    ("VS Code", 0), ("PyCharm Pro", 9000), ("IntelliJ IDEA", 14000), ("MATLAB", 30000),
+    ("SolidWorks", 40000), ("1C:Предприятие", 11000), ("Zoom", 5000), ("Compass-3D", 22000),
+    ("Mathcad", 16000), ("CorelDRAW", 17000), ("ArchiCAD", 35000), ("Statistica", 13000),
+    ("SPSS", 21000), ("ABBYY FineReader", 6000), ("WinRAR", 1500), ("Консультант Плюс", 9000),
+    ("Dr.Web", 2500), ("Blender", 0), ("Unity Pro", 19000), ("Revit", 33000), ("Lightroom", 8000),
+]
+SOFTWARE_VERSIONS = range(2019, 2026)
+
+# Сроки лицензий в днях и их доли
+TERMS = (365, 730, 90)
+TERM_WEIGHTS = (0.7, 0.15, 0.15)
+
+# Строк в одной транзакции
+CHUNK_SIZE = 50_000
+
+
+def software_catalog(rnd, skew):
+    """Список (название, цена) и накопленные веса популярности по Ципфу."""
+    catalog = [(f"{title} {version}", price) for title, price in SOFTWARE_TITLES
+               for version in SOFTWARE_VERSIONS]
+    rnd.shuffle(catalog)
+    weights = [1 / rank ** skew for rank in range(1, len(catalog) + 1)]
+    return catalog, list(accumulate(weights))
+
+
+def _insert_chunks(conn, sql, rows):
+    """Вставляет строки пачками по CHUNK_SIZE, каждая пачка — отдельная транзакция."""
+    count = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return count
+        with conn:
+            conn.executemany(sql, chunk)
+        count += len(chunk)
+
+
+# Триггеры журнала изменений (миграция 7)
+CHANGE_TRIGGER_PREFIX = "trg_changes_"
 
 
-def random_date(start, end):
-    """Генерирует случайную дату между start и end"""
-    return start + timedelta(days=random.randint(0, (end - start).days))
+@contextmanager
+def _triggers_suspended(conn, table, log_changes=True):
+    """
+    Снимает триггеры таблицы на время массовой загрузки и возвращает их после.
+    Триггеры журнала изменений остаются, если log_changes: в рабочей базе
+    клиенты GET /changes иначе не узнают о добавленных строках.
+    """
+    triggers = [
+        (name, sql) for name, sql in conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,))
+        if not (log_changes and name.startswith(CHANGE_TRIGGER_PREFIX))
+    ]
+    with conn:
+        for name, _ in triggers:
+            conn.execute(f"DROP TRIGGER {name}")
+    try:
+        yield
+    finally:
+        with conn:
+            for _, sql in triggers:
+                conn.execute(sql)
+
+
+def _is_empty(conn):
+    """В базе ещё нет ни компьютеров, ни лицензий"""
+    return not conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM computers) OR EXISTS (SELECT 1 FROM licenses)").fetchone()[0]
 
 
 def seed_users(n=20):
-    for i in range(n):
-        login = f"user{i+1}"
-        password = f"pass{i+1}"
-        add_user(login, password)
+    conn = get_connection()
+    return _insert_chunks(
+        conn, "INSERT OR IGNORE INTO users (login, password, last_login) VALUES (?, ?, NULL)",
+        ((f"user{i + 1}", hash_password(f"pass{i + 1}")) for i in range(n))
+    )
 
 
-def seed_computers(n=20):
-    ids = []
-    for i in range(n):
-        room = str(random.randint(100, 110))  # аудитории 100-110
-        comp_name = f"PC-{i+1:02d}"
-        comp_id = add_computer(room, comp_name)
-        ids.append(comp_id)
-    return ids
+def seed_computers(n=20, rooms=10, rnd=random, log_changes=True):
+    """
+    Добавляет n компьютеров в rooms аудиторий и возвращает диапазон их id.
+    Размер аудитории неравномерный: вес аудитории — случайное число от 0.2 до 3.
+    log_changes=False — не записывать их в журнал изменений (только для новой базы).
+    """
+    conn = get_connection()
+    first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM computers").fetchone()[0]
+    room_numbers = [str(100 + i) for i in range(rooms)]
+    room_weights = list(accumulate(rnd.uniform(0.2, 3) for _ in range(rooms)))
 
+    def rows():
+        for offset, room in enumerate(rnd.choices(room_numbers, cum_weights=room_weights, k=n)):
+            yield room, f"PC-{first_id + offset:07d}"
 
-def seed_licenses(computer_ids, n=20):
-    softwares = ["MS Office 2021", "AutoCAD 2024", "Photoshop 2024", "VS Code", "PyCharm Pro"]
-    for i in range(n):
-        comp_id = random.choice(computer_ids)
-        software = random.choice(softwares)
-        start = random_date(datetime(2024, 1, 1), datetime(2025, 1, 1))
-        end = start + timedelta(days=365)  # лицензия на год
-        budget = random.choice([None, random.randint(10000, 30000)])
-        add_license(comp_id, software, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), budget)
+    with _triggers_suspended(conn, "computers", log_changes):
+        count = _insert_chunks(conn, "INSERT INTO computers (room_number, computer_name) VALUES (?, ?)", rows())
+    return range(first_id, first_id + count)
 
 
-if __name__ == "__main__":
+def license_rows(computer_ids, n, rnd=random, skew=1.1, renewal_rate=0.6, null_budget_rate=0.25,
+                 first_start=date(2019, 1, 1), last_start=None):
+    """
+    Генерирует n строк лицензий (computer_id, software, license_start, license_end, budget)
+    цепочками продлений: ПК и ПО выбираются на цепочку, каждая следующая лицензия
+    начинается после окончания предыдущей, пока не закончится last_start.
+    Даты — номера дней, как они хранятся в licenses (DB.to_day).
+    """
+    catalog, cum_weights = software_catalog(rnd, skew)
+    first_day = DB.to_day(first_start)
+    last_day = DB.to_day(last_start or date.today() + timedelta(days=180))
+    span = last_day - first_day
+    produced = 0
+    while produced < n:
+        computer_id = rnd.choice(computer_ids)
+        software, price = rnd.choices(catalog, cum_weights=cum_weights)[0]
+        start = first_day + rnd.randrange(span)
+        while produced < n and start <= last_day:
+            term = rnd.choices(TERMS, TERM_WEIGHTS)[0]
+            end = start + term - 1
+            if price == 0 or rnd.random() < null_budget_rate:
+                budget = None
+            else:
+                budget = round(price * term / 365 * rnd.lognormvariate(0, 0.2), 2)
+            yield computer_id, software, start, end, budget
+            produced += 1
+            if rnd.random() >= renewal_rate:
+                break
+            start = end + 1
+
+
+def seed_licenses(computer_ids, n=20, rnd=random, log_changes=True, **distribution):
+    """
+    Добавляет n лицензий (см. license_rows) и перестраивает производные данные.
+    log_changes — как у seed_computers.
+    """
+    conn = get_connection()
+    with _triggers_suspended(conn, "licenses", log_changes):
+        count = _insert_chunks(
+            conn,
+            "INSERT INTO licenses (computer_id, software, license_start, license_end, budget) "
+            "VALUES (?, ?, ?, ?, ?)",
+            license_rows(computer_ids, n, rnd, **distribution)
+        )
+    with conn:
+        conn.execute("INSERT INTO licenses_fts (licenses_fts) VALUES ('rebuild')")
+    refresh_license_summary()
+    return count
+
+
+def generate(rooms=10, computers=20, licenses=20, users=20, seed=None, **distribution):
+    """
+    Заполняет текущую базу (DB.DB_NAME) и возвращает число добавленных строк по таблицам.
+    distribution — параметры license_rows: skew, renewal_rate, null_budget_rate.
+    """
+    rnd = random.Random(seed)
     init_db()
-    seed_users(20)
-    comps = seed_computers(20)
-    seed_licenses(comps, 20)
+    # Новая база без журнала изменений — исходное состояние, клиенты начинают с полной
+    # выгрузки. В базу с данными строки добавляются с записью в журнал.
+    log_changes = not _is_empty(get_connection())
+    counts = {"users": seed_users(users)}
+    computer_ids = seed_computers(computers, rooms, rnd, log_changes)
+    counts["computers"] = len(computer_ids)
+    counts["licenses"] = (seed_licenses(computer_ids, licenses, rnd, log_changes, **distribution)
+                          if computer_ids else 0)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заполнение базы синтетическими данными")
+    parser.add_argument("--db", help="путь к базе (по умолчанию DB.DB_NAME)")
+    parser.add_argument("--rooms", type=int, default=10)
+    parser.add_argument("--computers", type=int, default=20)
+    parser.add_argument("--licenses", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed", type=int, help="зерно генератора для воспроизводимых данных")
+    parser.add_argument("--skew", type=float, default=1.1, help="показатель Ципфа для популярности ПО")
+    parser.add_argument("--renewal-rate", type=float, default=0.6)
+    parser.add_argument("--null-budget-rate", type=float, default=0.25)
+    args = parser.parse_args()
+
+    if args.db:
+        DB.DB_NAME = args.db
+    started = time.perf_counter()
+    counts = generate(args.rooms, args.computers, args.licenses, args.users, args.seed,
+                      skew=args.skew, renewal_rate=args.renewal_rate,
+                      null_budget_rate=args.null_budget_rate)
+    elapsed = time.perf_counter() - started
+    print(", ".join(f"{table}: {count}" for table, count in counts.items()) + f" за {elapsed:.1f} с")
     print("База успешно заполнена данными!")
+
+
+if __name__ == "__main__":
+    main()
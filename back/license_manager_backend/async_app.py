@@ -0,0 +1,241 @@
+"""
+Асинхронная версия API (Starlette + uvicorn).
+
+    python -m license_manager_backend.async_app
+
+Часто опрашиваемые GET-маршруты (списки, поиск, сводка) обрабатываются
+корутинами: запрос к SQLite выполняется в отдельном пуле потоков базы
+(DB_THREADS), а цикл событий тем временем обслуживает остальные соединения —
+простаивающее keep-alive соединение не занимает поток. Остальные маршруты
+отдаются тем же Flask-приложением через WSGI-адаптер, поэтому набор
+эндпоинтов и формат ответов совпадают с синхронной версией.
+"""
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+from database import DB, Metrics
+from database.Functions import (
+    get_users, get_computers, get_licenses, search_licenses,
+    count_licenses, get_license_summary,
+    USER_FIELDS, COMPUTER_FIELDS, LICENSE_FIELDS, SEARCH_FIELDS
+)
+
+from . import auth, config, serialization
+from .main import (
+    create_app, parse_page_args, parse_search_args, parse_computer_id, page_payload,
+    success_body, error_body, JSON_CONTENT_TYPE, SNAPSHOT_AGE_HEADER
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==================== #
+
+def _call_db(func, args, kwargs):
+    DB.pop_snapshot_age()
+    result = func(*args, **kwargs)
+    return result, DB.pop_snapshot_age()
+
+
+async def run_db(request, func, *args, **kwargs):
+    """
+    Выполняет функцию из Functions.py в пуле потоков базы. Возраст снимка,
+    если она читала снимок, запоминается для заголовка ответа.
+    """
+    loop = asyncio.get_running_loop()
+    result, age = await loop.run_in_executor(request.app.state.db_executor, partial(_call_db, func, args, kwargs))
+    if age is not None:
+        request.state.snapshot_age = max(age, getattr(request.state, 'snapshot_age', 0))
+    return result
+
+
+def json_response(request, content, status_code=200):
+    """
+    Ответ с JSON-телом; для успешных ответов — ETag и 304 по If-None-Match,
+    сжатие по Accept-Encoding — как во Flask-версии.
+    """
+    headers = {}
+    snapshot_age = getattr(request.state, 'snapshot_age', None)
+    if snapshot_age is not None:
+        headers[SNAPSHOT_AGE_HEADER] = f"{snapshot_age:.0f}"
+    # Сжатие решается до сравнения с If-None-Match: 304 отдаёт тот же
+    # слабый ETag и тот же Vary, что и сжатый ответ 200
+    encoding = None
+    if serialization.compressible(JSON_CONTENT_TYPE, len(content)):
+        headers['Vary'] = 'Accept-Encoding'
+        encoding = serialization.negotiate(request.headers.get('accept-encoding'))
+    if status_code == 200:
+        etag = '"' + hashlib.sha1(content).hexdigest() + '"'
+        headers['ETag'] = etag if encoding is None else 'W/' + etag
+        if_none_match = request.headers.get('if-none-match', '')
+        if etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+            return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        content = serialization.compress(content, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(content, status_code=status_code, headers=headers, media_type=JSON_CONTENT_TYPE)
+
+
+def success(request, data=None, message="Успешно", meta=None):
+    return json_response(request, success_body(data, message, meta))
+
+
+def error(request, message, status_code=400):
+    return json_response(request, error_body(message), status_code)
+
+
+def token_required(endpoint):
+    """То же, что auth.token_required для Flask: без действительного токена — 401."""
+    @wraps(endpoint)
+    async def wrapper(request):
+        try:
+            auth.authenticate_headers(request.headers)
+        except auth.AuthError as e:
+            return error(request, str(e), 401)
+        return await endpoint(request)
+    return wrapper
+
+
+def timed(route, endpoint):
+    """Замер маршрута для /metrics; маршруты Flask-приложения замеряются его обработчиками."""
+    @wraps(endpoint)
+    async def wrapper(request):
+        started = time.perf_counter()
+        response = await endpoint(request)
+        method = request.method
+        Metrics.http_duration.observe(time.perf_counter() - started, route, method)
+        Metrics.http_requests.inc(route, method, str(response.status_code))
+        Metrics.http_response_size.observe(len(response.body), route, method)
+        return response
+    return wrapper
+
+
+async def page(request, func, allowed_fields, entity, **filters):
+    """Общая обработка постраничных списков /users, /computers, /licenses."""
+    try:
+        after, limit, columns = parse_page_args(allowed_fields, request.query_params)
+    except ValueError as e:
+        return error(request, str(e))
+    try:
+        rows = await run_db(request, func, after=after, limit=limit, fields=columns, **filters)
+        items, meta = page_payload(rows, columns, limit)
+        return success(request, items, meta=meta)
+    except Exception as e:
+        return error(request, f"Ошибка при получении {entity}: {str(e)}", 500)
+
+
+# ==================== МАРШРУТЫ ==================== #
+
+@token_required
+async def list_users(request):
+    return await page(request, get_users, USER_FIELDS, "пользователей")
+
+
+@token_required
+async def list_computers(request):
+    return await page(request, get_computers, COMPUTER_FIELDS, "компьютеров")
+
+
+@token_required
+async def list_licenses(request):
+    try:
+        computer_id = parse_computer_id(request.query_params.get('computer_id'))
+    except ValueError as e:
+        return error(request, str(e))
+    return await page(request, get_licenses, LICENSE_FIELDS, "лицензий", computer_id=computer_id)
+
+
+@token_required
+async def search_licenses_endpoint(request):
+    try:
+        filters = parse_search_args(request.query_params)
+    except ValueError as e:
+        return error(request, str(e))
+    try:
+        licenses = await run_db(request, search_licenses, **filters)
+        return success(request, serialization.row_objects(licenses, SEARCH_FIELDS))
+    except Exception as e:
+        return error(request, f"Ошибка при поиске лицензий: {str(e)}", 500)
+
+
+@token_required
+async def licenses_summary_endpoint(request):
+    try:
+        if request.query_params.get('details', 'false').lower() == 'true':
+            return success(request, await run_db(request, get_license_summary))
+        return success(request, await run_db(request, count_licenses))
+    except Exception as e:
+        return error(request, f"Ошибка при подсчёте лицензий: {str(e)}", 500)
+
+
+# ==================== ПРИЛОЖЕНИЕ ==================== #
+
+def create_async_app(settings=None, **overrides):
+    """
+    Создаёт ASGI-приложение. Настройки и инициализация базы — как у create_app,
+    маршруты без асинхронной реализации передаются Flask-приложению.
+    """
+    flask_app = create_app(settings, **overrides)
+    executor = ThreadPoolExecutor(max_workers=flask_app.config['DB_THREADS'],
+                                  thread_name_prefix='db')
+
+    native = {
+        '/users': list_users,
+        '/computers': list_computers,
+        '/licenses': list_licenses,
+        '/licenses/search': search_licenses_endpoint,
+        '/licenses/summary': licenses_summary_endpoint,
+    }
+    if flask_app.config['METRICS_ENABLED']:
+        native = {path: timed(path, endpoint) for path, endpoint in native.items()}
+    routes = [Route(path, endpoint, methods=['GET']) for path, endpoint in native.items()]
+    routes.append(Mount('/', app=WSGIMiddleware(flask_app)))
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        app.state.db_executor = executor
+        yield
+        executor.shutdown(wait=False)
+
+    return Starlette(
+        routes=routes,
+        middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+        lifespan=lifespan,
+    )
+
+
+def main():
+    import uvicorn
+
+    from .serve import prepare_database
+
+    settings = config.from_env()
+    logging.basicConfig(level=settings['LOG_LEVEL'])
+    prepare_database(settings)
+    # Схема уже создана — воркерам uvicorn (отдельным процессам) это делать не нужно
+    os.environ[config.ENV_PREFIX + 'INIT_DB'] = 'false'
+    # Воркеры читают настройки из окружения, ключ подписи токенов должен быть общим
+    if not settings['SECRET_KEY']:
+        os.environ[config.ENV_PREFIX + 'SECRET_KEY'] = secrets.token_hex(32)
+
+    uvicorn.run('license_manager_backend.async_app:create_async_app', factory=True,
+                host=settings['HOST'], port=settings['PORT'], workers=settings['WORKERS'],
+                log_level=settings['LOG_LEVEL'].lower())
+
+
+if __name__ == "__main__":
+    main()
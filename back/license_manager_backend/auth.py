@@ -0,0 +1,186 @@
+"""
+Токены доступа и обновления.
+
+Токен — подписанный (HMAC, itsdangerous) JSON с логином, идентификатором jti
+и временем окончания exp. Проверка выполняется без обращения к базе:
+подпись, срок и список отозванных токенов в памяти. Недавно проверенные
+токены запоминаются (VERIFIED_CACHE_SIZE), повторная проверка — поиск в словаре.
+
+Выход из системы отзывает токены: jti попадает в ограниченный кэш процесса
+и в таблицу revoked_tokens, откуда остальные процессы дочитывают новые
+записи не чаще раза в REVOCATION_SYNC_INTERVAL секунд.
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, request
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from database.Functions import revoke_token, get_revoked_tokens
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+ENABLED = True
+ACCESS_TOKEN_TTL = 15 * 60
+REFRESH_TOKEN_TTL = 30 * 24 * 60 * 60
+VERIFIED_CACHE_SIZE = 4096
+REVOKED_CACHE_SIZE = 100_000
+REVOCATION_SYNC_INTERVAL = 5.0
+
+_serializers = {}
+
+
+class AuthError(Exception):
+    """Токен отсутствует, повреждён, просрочен или отозван."""
+
+
+def configure(secret_key, enabled=True, access_ttl=ACCESS_TOKEN_TTL, refresh_ttl=REFRESH_TOKEN_TTL):
+    """Задаёт ключ подписи и сроки жизни токенов (вызывается из create_app)."""
+    global ENABLED, ACCESS_TOKEN_TTL, REFRESH_TOKEN_TTL
+    ENABLED = enabled
+    ACCESS_TOKEN_TTL = access_ttl
+    REFRESH_TOKEN_TTL = refresh_ttl
+    _serializers[ACCESS] = URLSafeSerializer(secret_key, salt=ACCESS)
+    _serializers[REFRESH] = URLSafeSerializer(secret_key, salt=REFRESH)
+    verified.clear()
+    revoked.clear()
+
+
+class BoundedExpiringSet:
+    """
+    Множество ключей со временем окончания, не больше max_size элементов.
+    Истёкшие ключи не учитываются; при переполнении вытесняются самые старые.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key, expires_at, value=True):
+        with self._lock:
+            self._items[key] = (value, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def get(self, key, now=None):
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < (now or time.time()):
+            with self._lock:
+                self._items.pop(key, None)
+            return None
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class RevocationList(BoundedExpiringSet):
+    """Отозванные jti: запись в память и в revoked_tokens, дочитывание чужих отзывов из базы."""
+
+    def __init__(self, max_size):
+        super().__init__(max_size)
+        self._last_id = 0
+        self._synced_at = 0.0
+
+    def revoke(self, jti, expires_at):
+        self.add(jti, expires_at)
+        revoke_token(jti, expires_at)
+
+    def sync(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._synced_at < REVOCATION_SYNC_INTERVAL:
+            return
+        self._synced_at = now
+        for row_id, jti, expires_at in get_revoked_tokens(self._last_id):
+            self.add(jti, expires_at)
+            self._last_id = row_id
+
+    def clear(self):
+        super().clear()
+        self._last_id = 0
+        self._synced_at = 0.0
+
+
+verified = BoundedExpiringSet(VERIFIED_CACHE_SIZE)
+revoked = RevocationList(REVOKED_CACHE_SIZE)
+
+
+def _issue(login, kind, ttl):
+    expires_at = int(time.time()) + ttl
+    return _serializers[kind].dumps({"sub": login, "jti": secrets.token_urlsafe(12), "exp": expires_at})
+
+
+def issue_tokens(login):
+    """Пара токенов для ответа /auth/login и /auth/refresh."""
+    return {
+        "access_token": _issue(login, ACCESS, ACCESS_TOKEN_TTL),
+        "refresh_token": _issue(login, REFRESH, REFRESH_TOKEN_TTL),
+        "token_type": "Bearer",
+        "expires_in": ACCESS_TOKEN_TTL,
+    }
+
+
+def verify_token(token, kind=ACCESS):
+    """Возвращает данные токена (sub, jti, exp) или вызывает AuthError."""
+    now = time.time()
+    cache_key = (kind, token)
+    claims = verified.get(cache_key, now)
+    if claims is None:
+        try:
+            claims = _serializers[kind].loads(token)
+        except BadSignature:
+            raise AuthError("Недействительный токен")
+        if not isinstance(claims, dict) or claims.get("exp", 0) < now:
+            raise AuthError("Срок действия токена истёк")
+        verified.add(cache_key, claims["exp"], claims)
+    revoked.sync()
+    if claims["jti"] in revoked:
+        raise AuthError("Токен отозван")
+    return claims
+
+
+def revoke(claims):
+    revoked.revoke(claims["jti"], claims["exp"])
+
+
+def bearer_token(authorization):
+    """Достаёт токен из заголовка Authorization: Bearer <токен>."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        raise AuthError("Требуется заголовок Authorization: Bearer <токен>")
+    return token.strip()
+
+
+def authenticate_headers(headers):
+    """Проверка запроса по заголовкам; при выключенной аутентификации возвращает None."""
+    if not ENABLED:
+        return None
+    return verify_token(bearer_token(headers.get("Authorization")))
+
+
+def token_required(view):
+    """
+    Декоратор маршрута: без действительного токена доступа AuthError
+    (обработчик в main.py отвечает 401). Данные токена — в g.token.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.token = authenticate_headers(request.headers)
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,129 @@
+import os
+
+# Префикс переменных окружения: LICENSE_MANAGER_LOG_LEVEL, LICENSE_MANAGER_WORKERS и т.д.
+ENV_PREFIX = "LICENSE_MANAGER_"
+
+
+class Config:
+    """Общие настройки приложения."""
+    DEBUG = False
+    JSON_AS_ASCII = False
+    LOG_LEVEL = "INFO"
+
+    # Путь к файлу базы; None — оставить значение DB.DB_NAME
+    DB_PATH = None
+    # Создавать схему и применять миграции в create_app.
+    # При запуске через serve.py это делается один раз до старта воркеров.
+    INIT_DB = True
+
+    HOST = "0.0.0.0"
+    PORT = 5000
+    # Процессы и потоки WSGI-сервера (serve.py)
+    WORKERS = 4
+    THREADS = 8
+    # Одновременно ожидающих запросов GET /changes (wait=N и потоки SSE) на процесс:
+    # каждый держит поток сервера, поэтому лимит меньше THREADS; сверх него — 503
+    MAX_CHANGE_WAITERS = 4
+    # Потоки, в которых асинхронная версия API (async_app.py) выполняет запросы к базе
+    DB_THREADS = 8
+
+    # Ключ подписи токенов. Должен быть общим для всех воркеров: serve.py и
+    # async_app.py создают случайный ключ до их запуска, если он не задан.
+    SECRET_KEY = None
+    # Требовать токен доступа на /users, /computers, /licenses
+    AUTH_ENABLED = True
+    # POST /auth/register без токена. Выключено: новых пользователей создают
+    # вошедшие пользователи; первого — с временно включённым флагом.
+    OPEN_REGISTRATION = False
+    ACCESS_TOKEN_TTL = 15 * 60
+    REFRESH_TOKEN_TTL = 30 * 24 * 60 * 60
+
+    # Стоимость хэширования паролей scrypt (database/Passwords.py): память ~ 128 * N * R байт.
+    # Пароли со старыми параметрами перехэшируются при следующем входе.
+    PASSWORD_SCRYPT_N = 2 ** 14
+    PASSWORD_SCRYPT_R = 8
+    PASSWORD_SCRYPT_P = 1
+    # Не чаще одного раза за столько секунд записывать users.last_login при входе
+    LAST_LOGIN_INTERVAL = 300
+
+    # Фоновый планировщик событий истечения лицензий (database/Timeline.py)
+    EXPIRY_SCHEDULER = True
+    EXPIRY_CHECK_INTERVAL = 60
+    # Куда отправлять события POST-запросом; пусто — только журнал license_events и лог
+    EXPIRY_WEBHOOK_URL = ""
+
+    # Очистка журнала изменений /changes от записей старше 30 дней
+    # (database/maintenance.py), секунд между очистками; 0 — не очищать в сервере
+    CHANGES_TRIM_INTERVAL = 3600
+
+    # Отчёты /reports/* (database/Reports.py): полная перезагрузка данных из базы
+    # не реже чем раз в столько секунд, между ними — дочитывание изменений
+    REPORTS_RELOAD_INTERVAL = 600
+
+    # Метрики Prometheus на /metrics (database/Metrics.py): время и размер ответов по маршрутам.
+    # При выключенных метриках обработчики запросов не подключаются вовсе.
+    METRICS_ENABLED = True
+    # Профилирование SQL: время и число строк по каждому запросу, лог медленных запросов
+    PROFILE_SQL = True
+    SLOW_QUERY_MS = 100
+
+    # Снимок базы для тяжёлых чтений (поиск, выгрузка, сводка): копия обновляется раз в
+    # SNAPSHOT_INTERVAL секунд, снимок старше SNAPSHOT_MAX_AGE не читается. Путь по умолчанию —
+    # <база>.snapshot. Возраст прочитанного снимка — в заголовке ответа X-Snapshot-Age.
+    SNAPSHOT_ENABLED = False
+    SNAPSHOT_PATH = None
+    SNAPSHOT_INTERVAL = 60
+    SNAPSHOT_MAX_AGE = 300
+
+    # Кодировщик JSON (license_manager_backend/serialization.py): auto — orjson, если установлен
+    JSON_BACKEND = "auto"
+    # Сжатие ответов gzip/brotli по Accept-Encoding, начиная с COMPRESS_MIN_SIZE байт
+    COMPRESSION = True
+    COMPRESS_MIN_SIZE = 1024
+    GZIP_LEVEL = 1
+    BROTLI_QUALITY = 4
+
+
+class DevelopmentConfig(Config):
+    """Встроенный сервер Flask с отладчиком."""
+    DEBUG = True
+    LOG_LEVEL = "DEBUG"
+
+
+class ProductionConfig(Config):
+    """Многопроцессный WSGI-сервер, без отладчика."""
+    LOG_LEVEL = "WARNING"
+
+
+CONFIGS = {
+    "development": DevelopmentConfig,
+    "production": ProductionConfig,
+}
+
+
+def _convert(value, default):
+    """Приводит строку из окружения к типу значения по умолчанию."""
+    if isinstance(default, bool):
+        return value.lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(value)
+    return value
+
+
+def from_env():
+    """
+    Возвращает настройки в виде словаря: класс выбирается по LICENSE_MANAGER_ENV
+    (production по умолчанию), отдельные значения переопределяются переменными
+    LICENSE_MANAGER_<ИМЯ>.
+    """
+    name = os.environ.get(ENV_PREFIX + "ENV", "production")
+    if name not in CONFIGS:
+        raise ValueError(f"Неизвестное окружение {name}, ожидается одно из: {', '.join(CONFIGS)}")
+    config_class = CONFIGS[name]
+
+    settings = {key: getattr(config_class, key) for key in dir(config_class) if key.isupper()}
+    for key, default in settings.items():
+        value = os.environ.get(ENV_PREFIX + key)
+        if value is not None:
+            settings[key] = _convert(value, default)
+    return settings
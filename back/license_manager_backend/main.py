@@ -1,13 +1,15 @@
-from flask import Flask, request, jsonify, Response
+from flask import Flask, Blueprint, request, Response, g, current_app
 from flask_cors import CORS
-from datetime import datetime
+from datetime import date, datetime
 import sys
 import os
 import logging
-import json
+import csv
+import io
+import secrets
+import threading
+import time
 
-# Настройка логирования
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # Добавляем путь к папке database для импорта
@@ -16,87 +18,458 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'database'))
 from database.Functions import (
     add_user, authenticate_user, get_users,
     add_computer, get_computers, delete_computer,
-    add_license, get_licenses, update_license, delete_license, search_licenses
+    add_license, get_licenses, update_license, update_licenses, delete_license, search_licenses,
+    count_licenses, get_license_summary, iter_search_licenses, SEARCH_FIELDS, SEARCH_MATCH_MODES,
+    add_computers_bulk, add_licenses_bulk, computer_exists, forget_computer,
+    project_fields, USER_FIELDS, COMPUTER_FIELDS, LICENSE_FIELDS,
+    get_license_events, EVENT_FIELDS, EXPIRING_DAYS, get_room_trees, get_room_tree,
+    get_changes, get_last_change_seq, wait_for_changes, CHANGES_PAGE_LIMIT,
+    delete_computers, delete_room, delete_licenses, delete_expired_licenses
 )
+from database import DB, Functions, Metrics, Passwords, Reports, Timeline, maintenance
 from database.DB import init_db
+from database.Cache import cache
 
-app = Flask(__name__)
-CORS(app)  # Разрешаем CORS для фронтенда
-app.config['JSON_AS_ASCII'] = False
+from . import auth, config, schemas, serialization
+from .auth import token_required, AuthError
 
-# Инициализируем базу данных при запуске
-init_db()
+api = Blueprint('api', __name__)
+
+# Размер страницы для GET /users, /computers, /licenses
+DEFAULT_PAGE_LIMIT = 1000
+MAX_PAGE_LIMIT = 10000
+
+# Аудиторий на странице GET /rooms: в каждой — все компьютеры и лицензии
+DEFAULT_ROOM_LIMIT = 20
+MAX_ROOM_LIMIT = 200
+
+# GET /changes: записей журнала за ответ, ожидание новых (long-poll) и длительность
+# потока Server-Sent Events — после неё клиент переподключается с Last-Event-ID
+MAX_CHANGES_LIMIT = 10000
+MAX_CHANGES_WAIT = 60
+SSE_STREAM_SECONDS = 300
+SSE_HEARTBEAT_SECONDS = 15
+
+# Максимум записей в одном массовом импорте
+BULK_MAX_ITEMS = 50000
+
+
+def create_app(settings=None, **overrides):
+    """
+    Создаёт приложение Flask.
+
+    settings — словарь или класс настроек (по умолчанию config.from_env()),
+    overrides — отдельные значения поверх них, например INIT_DB=False.
+    """
+    app = Flask(__name__)
+    if settings is None:
+        app.config.update(config.from_env())
+    elif isinstance(settings, dict):
+        app.config.update(settings)
+    else:
+        app.config.from_object(settings)
+    app.config.update(overrides)
+
+    logging.basicConfig(level=app.config['LOG_LEVEL'])
+    logging.getLogger().setLevel(app.config['LOG_LEVEL'])
+
+    CORS(app)  # Разрешаем CORS для фронтенда
+
+    if app.config.get('DB_PATH'):
+        DB.DB_NAME = app.config['DB_PATH']
+    Passwords.SCRYPT_N = app.config['PASSWORD_SCRYPT_N']
+    Passwords.SCRYPT_R = app.config['PASSWORD_SCRYPT_R']
+    Passwords.SCRYPT_P = app.config['PASSWORD_SCRYPT_P']
+    Functions.LAST_LOGIN_INTERVAL = app.config['LAST_LOGIN_INTERVAL']
+    Reports.RELOAD_INTERVAL = app.config['REPORTS_RELOAD_INTERVAL']
+    Metrics.ENABLED = app.config['METRICS_ENABLED']
+    DB.PROFILE_SQL = app.config['PROFILE_SQL']
+    DB.SLOW_QUERY_MS = app.config['SLOW_QUERY_MS']
+    serialization.use(app.config['JSON_BACKEND'])
+    serialization.COMPRESSION = app.config['COMPRESSION']
+    serialization.MIN_SIZE = app.config['COMPRESS_MIN_SIZE']
+    serialization.GZIP_LEVEL = app.config['GZIP_LEVEL']
+    serialization.BROTLI_QUALITY = app.config['BROTLI_QUALITY']
+    DB.SNAPSHOT_ENABLED = app.config['SNAPSHOT_ENABLED']
+    DB.SNAPSHOT_PATH = app.config.get('SNAPSHOT_PATH') or None
+    DB.SNAPSHOT_INTERVAL = app.config['SNAPSHOT_INTERVAL']
+    DB.SNAPSHOT_MAX_AGE = app.config['SNAPSHOT_MAX_AGE']
+
+    if not app.config.get('SECRET_KEY'):
+        # Токены не переживут перезапуск и не подойдут другим процессам
+        logger.warning("SECRET_KEY не задан, используется случайный ключ")
+        app.config['SECRET_KEY'] = secrets.token_hex(32)
+    auth.configure(app.config['SECRET_KEY'], enabled=app.config['AUTH_ENABLED'],
+                   access_ttl=app.config['ACCESS_TOKEN_TTL'],
+                   refresh_ttl=app.config['REFRESH_TOKEN_TTL'])
+    app.extensions['change_waiters'] = threading.BoundedSemaphore(app.config['MAX_CHANGE_WAITERS'])
+    if app.config.get('INIT_DB'):
+        init_db()
+    if app.config.get('EXPIRY_SCHEDULER'):
+        Timeline.scheduler.start(interval=app.config['EXPIRY_CHECK_INTERVAL'],
+                                 webhook_url=app.config['EXPIRY_WEBHOOK_URL'])
+    if app.config['CHANGES_TRIM_INTERVAL']:
+        maintenance.changes_trimmer.start(interval=app.config['CHANGES_TRIM_INTERVAL'])
+    if app.config['SNAPSHOT_ENABLED']:
+        DB.snapshot_refresher.start(interval=app.config['SNAPSHOT_INTERVAL'])
+        app.before_request(reset_snapshot_age)
+        app.after_request(add_snapshot_age)
+    if app.config['METRICS_ENABLED']:
+        # До регистрации api: after_request вызываются в обратном порядке,
+        # так что замер видит окончательный ответ (в том числе 304 от ETag)
+        app.before_request(start_request_timer)
+        app.after_request(record_request_metrics)
+    if app.config['COMPRESSION']:
+        # Между ними: сжимается ответ с уже посчитанным ETag, метрики видят сжатый размер
+        app.after_request(compress_response)
+
+    app.register_blueprint(api)
+    return app
+
+# ==================== СНИМОК БАЗЫ ==================== #
+
+SNAPSHOT_AGE_HEADER = "X-Snapshot-Age"
+
+def reset_snapshot_age():
+    DB.pop_snapshot_age()
+
+def add_snapshot_age(response):
+    """Данные ответа прочитаны со снимка — сколько секунд назад он снят"""
+    age = DB.pop_snapshot_age()
+    if age is not None:
+        response.headers[SNAPSHOT_AGE_HEADER] = f"{age:.0f}"
+    return response
+
+# ==================== МЕТРИКИ ЗАПРОСОВ ==================== #
+
+def route_label(rule):
+    """Шаблон маршрута (/computers/<int:computer_id>), а не сам путь: число меток ограничено."""
+    return rule.rule if rule is not None else "<unmatched>"
+
+def start_request_timer():
+    request.environ['metrics.started'] = time.perf_counter()
+
+def record_request_metrics(response):
+    """Время обработки, код и размер ответа."""
+    req = request._get_current_object()  # один доступ через прокси вместо нескольких
+    started = req.environ.get('metrics.started')
+    if started is None:
+        return response
+    route, method = route_label(req.url_rule), req.method
+    Metrics.http_duration.observe(time.perf_counter() - started, route, method)
+    Metrics.http_requests.inc(route, method, str(response.status_code))
+    size = response.content_length  # Content-Length есть у всех ответов, кроме потоковых
+    if size is not None:
+        Metrics.http_response_size.observe(size, route, method)
+    return response
+
+def cache_metrics():
+    """Счётчики кэша результатов для /metrics (считаются в момент выдачи)."""
+    stats = cache.stats()
+    return [
+        "# HELP result_cache_hits_total Попаданий в кэш результатов",
+        "# TYPE result_cache_hits_total counter",
+        f"result_cache_hits_total {stats['hits']}",
+        "# HELP result_cache_misses_total Промахов кэша результатов",
+        "# TYPE result_cache_misses_total counter",
+        f"result_cache_misses_total {stats['misses']}",
+        "# HELP result_cache_entries Записей в кэше результатов",
+        "# TYPE result_cache_entries gauge",
+        f"result_cache_entries {stats['entries']}",
+    ]
+
+Metrics.registry.add_collector(cache_metrics)
+
+# ==================== СЖАТИЕ ОТВЕТОВ ==================== #
+
+def compressible(response):
+    """Ответ, который compress_response сожмёт при подходящем Accept-Encoding"""
+    return not (response.status_code < 200 or response.status_code in (204, 304) or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or not serialization.compressible(response.mimetype, response.content_length))
+
+def compress_response(response):
+    """
+    Сжимает тело gzip/brotli по Accept-Encoding. Потоковые выгрузки
+    не трогаем. ETag становится слабым: сжатое тело — то же представление,
+    и If-None-Match с ним по-прежнему даёт 304 (add_etag ставит слабый ETag
+    заранее, так что 304 на тот же запрос отдаёт тот же ETag).
+    """
+    if not compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = serialization.negotiate(request.headers.get('Accept-Encoding'))
+    if encoding is None:
+        return response
+    response.set_data(serialization.compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
 
 # ==================== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==================== #
 
-def validate_required_fields(data, required_fields):
-    """Проверяет наличие обязательных полей в данных"""
-    missing_fields = [field for field in required_fields if field not in data or not data[field]]
-    if missing_fields:
-        return False, f"Отсутствуют обязательные поля: {', '.join(missing_fields)}"
-    return True, None
+def read_json_body(schema):
+    """Тело запроса по схеме (schemas.py); возвращает (значения, ошибка)"""
+    data = request.get_json(silent=True)
+    if data is None:
+        logger.warning("Запрос %s без JSON-данных (Content-Type: %s)", request.path, request.content_type)
+        return None, "Не переданы данные в формате JSON"
+    return schema.parse(data)
+
+# Разбор параметров и сборка ответов не зависят от Flask:
+# их же использует асинхронная версия API (async_app.py)
+
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
 
-def validate_date_format(date_string):
-    """Проверяет формат даты YYYY-MM-DD"""
+def parse_page_args(allowed_fields, args=None):
+    """
+    Читает параметры страницы из запроса: limit, after и fields (через запятую).
+    Возвращает (after, limit, columns); при неверных значениях — ValueError.
+    """
+    args = request.args if args is None else args
     try:
-        datetime.strptime(date_string, '%Y-%m-%d')
-        return True
+        limit = int(args.get('limit', DEFAULT_PAGE_LIMIT))
+        after = args.get('after')
+        after = int(after) if after else None
     except ValueError:
-        return False
+        raise ValueError("Параметры limit и after должны быть целыми числами")
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise ValueError(f"Параметр limit должен быть от 1 до {MAX_PAGE_LIMIT}")
 
-def success_response(data=None, message="Успешно"):
-    """Стандартный успешный ответ"""
+    fields = args.get('fields')
+    fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+    return after, limit, project_fields(allowed_fields, fields)
+
+def parse_computer_id(value):
+    """Фильтр computer_id из строки запроса: целое число или None"""
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("Параметр computer_id должен быть целым числом") from None
+
+def parse_search_args(args=None, with_limit=True):
+    """
+    Читает фильтры поиска лицензий: software, room, active_only, match и limit.
+    Возвращает словарь аргументов для search_licenses; при неверных значениях — ValueError.
+    """
+    args = request.args if args is None else args
+    match = args.get('match', 'substring').lower()
+    if match not in SEARCH_MATCH_MODES:
+        raise ValueError(f"Параметр match должен быть одним из: {', '.join(SEARCH_MATCH_MODES)}")
+    filters = {
+        'software': args.get('software'),
+        'room': args.get('room'),
+        'active_only': args.get('active_only', 'false').lower() == 'true',
+        'match': match,
+    }
+    if with_limit:
+        limit = args.get('limit')
+        if limit is not None:
+            if not limit.isdigit() or not 1 <= int(limit) <= MAX_PAGE_LIMIT:
+                raise ValueError(f"Параметр limit должен быть от 1 до {MAX_PAGE_LIMIT}")
+            limit = int(limit)
+        filters['limit'] = limit
+    return filters
+
+def page_payload(rows, columns, limit):
+    """Страница строк в виде списка словарей и meta с курсором следующей страницы"""
+    items = serialization.row_objects(rows, columns)
+    id_index = columns.index('id')
+    next_cursor = rows[-1][id_index] if len(rows) == limit else None
+    return items, {"next_cursor": next_cursor, "limit": limit}
+
+def success_body(data=None, message="Успешно", meta=None):
+    """JSON успешного ответа (байты UTF-8)"""
     response = {"success": True, "message": message}
     if data is not None:
         response["data"] = data
-    return Response(
-        json.dumps(response, ensure_ascii=False),
-        content_type="application/json; charset=utf-8"
-    )
+    if meta is not None:
+        response["meta"] = meta
+    return serialization.dumps(response)
 
-def error_response(message, status_code=400):
-    """Стандартный ответ с ошибкой"""
+def error_body(message, data=None):
+    """JSON ответа с ошибкой (байты UTF-8)"""
     response = {"success": False, "error": message}
-    return Response(
-        json.dumps(response, ensure_ascii=False),
-        content_type="application/json; charset=utf-8"
-    ), status_code
+    if data is not None:
+        response["data"] = data
+    return serialization.dumps(response)
+
+def page_response(rows, columns, limit):
+    """Ответ со страницей строк и курсором следующей страницы в meta"""
+    items, meta = page_payload(rows, columns, limit)
+    return success_response(items, meta=meta)
+
+def success_response(data=None, message="Успешно", meta=None):
+    """Стандартный успешный ответ"""
+    return Response(success_body(data, message, meta), content_type=JSON_CONTENT_TYPE)
+
+def error_response(message, status_code=400, data=None):
+    """Стандартный ответ с ошибкой"""
+    return Response(error_body(message, data), content_type=JSON_CONTENT_TYPE), status_code
+
+
+def read_bulk_items():
+    """
+    Читает записи массового импорта: JSON-массив (или {"items": [...]}),
+    CSV-файл в поле file или тело запроса с типом text/csv.
+    """
+    if 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8-sig')
+        items = list(csv.DictReader(io.StringIO(text)))
+    elif request.mimetype == 'text/csv':
+        items = list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    else:
+        items = request.get_json(silent=True)
+        if isinstance(items, dict):
+            items = items.get('items')
+        if not isinstance(items, list):
+            raise ValueError("Ожидается массив записей в формате JSON или CSV-файл")
+    if not items:
+        raise ValueError("Не переданы записи для импорта")
+    if len(items) > BULK_MAX_ITEMS:
+        raise ValueError(f"За один импорт можно передать не больше {BULK_MAX_ITEMS} записей")
+    return items
+
+def read_id_list():
+    """Читает id для массового удаления: JSON-массив целых чисел или {"ids": [...]}"""
+    ids = request.get_json(silent=True)
+    if isinstance(ids, dict):
+        ids = ids.get('ids')
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("Ожидается непустой массив id в формате JSON")
+    if len(ids) > BULK_MAX_ITEMS:
+        raise ValueError(f"За один запрос можно удалить не больше {BULK_MAX_ITEMS} записей")
+    if not all(type(value) is int for value in ids):
+        raise ValueError("id должны быть целыми числами")
+    # Больше INTEGER SQLite запрос не примет (OverflowError)
+    if not all(1 <= value <= schemas.MAX_ID for value in ids):
+        raise ValueError(f"id должны быть от 1 до {schemas.MAX_ID}")
+    return ids
+
+def read_bulk_mode():
+    """Режим обработки ошибок: partial — добавить корректные строки, atomic — всё или ничего"""
+    mode = request.args.get('mode', 'partial').lower()
+    if mode not in ('partial', 'atomic'):
+        raise ValueError("Параметр mode должен быть partial или atomic")
+    return mode == 'atomic'
+
+def bulk_response(results, atomic, entity):
+    """Ответ массового импорта с результатом по каждой строке"""
+    created = sum(1 for result in results if result["status"] == "created")
+    failed = sum(1 for result in results if result["status"] == "error")
+    data = {
+        "created": created,
+        "failed": failed,
+        "results": [{"index": index, **result} for index, result in enumerate(results)],
+    }
+    if atomic and failed:
+        return error_response(f"Импорт отменён: ошибок в записях — {failed}", 400, data)
+    return success_response(data, f"Добавлено {entity}: {created}, с ошибками: {failed}")
+
+def bulk_update_response(results, atomic, entity):
+    """Ответ массового изменения с результатом по каждой строке"""
+    updated = sum(1 for result in results if result["status"] == "updated")
+    failed = sum(1 for result in results if result["status"] == "error")
+    data = {
+        "updated": updated,
+        "failed": failed,
+        "results": [{"index": index, **result} for index, result in enumerate(results)],
+    }
+    if atomic and failed:
+        return error_response(f"Изменение отменено: ошибок в записях — {failed}", 400, data)
+    return success_response(data, f"Изменено {entity}: {updated}, с ошибками: {failed}")
+
+def run_bulk(items, parse_item, insert_items, atomic):
+    """
+    Проверяет все записи за один проход и передаёт корректные в insert_items.
+    Возвращает результаты по строкам в исходном порядке.
+    """
+    results = [None] * len(items)
+    valid_indexes, valid_items = [], []
+    for index, item in enumerate(items):
+        value, error = parse_item(item)
+        if error:
+            results[index] = {"status": "error", "error": error}
+        else:
+            valid_indexes.append(index)
+            valid_items.append(value)
+
+    if atomic and len(valid_items) < len(items):
+        for index in valid_indexes:
+            results[index] = {"status": "skipped"}
+        return results
+
+    inserted = insert_items(valid_items, atomic=atomic) if valid_items else []
+    for index, result in zip(valid_indexes, inserted):
+        results[index] = result
+    return results
+
+def parse_bulk_computer(item):
+    """Проверяет запись импорта компьютеров; возвращает ((аудитория, имя), ошибка)"""
+    values, error = schemas.COMPUTER.parse(item)
+    if error:
+        return None, error
+    return (values['room_number'], values['computer_name']), None
+
+def parse_bulk_license(item):
+    """Проверяет запись импорта лицензий; возвращает (словарь для add_licenses_bulk, ошибка)"""
+    return schemas.BULK_LICENSE.parse(item)
+
+def parse_license_changes(item):
+    """
+    Проверяет изменения лицензии (PUT /licenses/<id>, элементы PATCH /licenses):
+    только поля из LICENSE_UPDATE_FIELDS. Возвращает (словарь для update_license, ошибка).
+    """
+    return schemas.LICENSE_CHANGES.parse(item)
+
+def parse_bulk_license_update(item):
+    """Запись PATCH /licenses: id и изменяемые поля; возвращает ((id, изменения), ошибка)"""
+    return schemas.parse_license_update(item)
+
+# Граница DELETE /licenses?expired_before=YYYY-MM-DD
+parse_expired_before = schemas.iso_date("Параметр expired_before должен быть датой YYYY-MM-DD")
+
+
+@api.after_app_request
+def add_etag(response):
+    """
+    ETag для успешных GET-ответов: при совпадении If-None-Match
+    клиент получает 304 без тела. Потоковые выгрузки не трогаем.
+    """
+    if request.method == 'GET' and response.status_code == 200 and not response.is_streamed:
+        # compress_response ещё не вызывался: слабый ETag сжатого ответа и Vary
+        # ставятся здесь, чтобы 304 на тот же запрос отдал те же заголовки
+        weak = False
+        if current_app.config.get('COMPRESSION') and compressible(response):
+            response.vary.add('Accept-Encoding')
+            weak = serialization.negotiate(request.headers.get('Accept-Encoding')) is not None
+        response.add_etag(weak=weak)
+        response.make_conditional(request)
+    return response
 
 
 # ==================== АУТЕНТИФИКАЦИЯ ==================== #
 
-@app.route('/auth/register', methods=['POST'])
+@api.route('/auth/register', methods=['POST'])
 def register():
-    """Регистрация нового пользователя"""
+    """
+    Регистрация нового пользователя. Без OPEN_REGISTRATION — только с токеном
+    доступа, как POST /users: иначе токен мог бы получить кто угодно.
+    """
+    if not current_app.config.get('OPEN_REGISTRATION'):
+        g.token = auth.authenticate_headers(request.headers)
+    return register_user()
+
+def register_user():
+    data, error = read_json_body(schemas.REGISTRATION)
+    if error:
+        return error_response(error)
     try:
-        logger.info("=== REGISTER REQUEST ===")
-        logger.info(f"Content-Type: {request.content_type}")
-        logger.info(f"Raw data: {request.data}")
-        
-        data = request.get_json()
-        logger.info(f"Parsed JSON: {data}")
-        
-        # Проверяем что данные переданы
-        if not data:
-            logger.error("ERROR: No JSON data received")
-            return error_response("Не переданы данные в формате JSON")
-        
-        # Валидация входных данных
-        is_valid, error_msg = validate_required_fields(data, ['login', 'password'])
-        if not is_valid:
-            return error_response(error_msg)
-        
-        login = data['login'].strip()
-        password = data['password']
-        
-        # Проверка минимальной длины
-        if len(login) < 3:
-            return error_response("Логин должен содержать минимум 3 символа")
-        if len(password) < 4:
-            return error_response("Пароль должен содержать минимум 4 символа")
-        
-        # Добавляем пользователя
-        add_user(login, password)
+        add_user(data['login'], data['password'])
         return success_response(message="Пользователь успешно зарегистрирован")
         
     except Exception as e:
@@ -104,96 +477,129 @@ def register():
             return error_response("Пользователь с таким логином уже существует")
         return error_response(f"Ошибка при регистрации: {str(e)}", 500)
 
-@app.route('/auth/login', methods=['POST'])
+@api.route('/auth/login', methods=['POST'])
 def login():
     """Аутентификация пользователя"""
+    data, error = read_json_body(schemas.CREDENTIALS)
+    if error:
+        return error_response(error)
     try:
-        data = request.get_json()
-        
-        # Проверяем что данные переданы
-        if not data:
-            return error_response("Не переданы данные в формате JSON")
-        
-        # Валидация входных данных
-        is_valid, error_msg = validate_required_fields(data, ['login', 'password'])
-        if not is_valid:
-            return error_response(error_msg)
-        
-        login = data['login'].strip()
-        password = data['password']
-        
+        login = data['login']
         # Проверяем аутентификацию
-        if authenticate_user(login, password):
-            return success_response({"login": login}, "Успешная аутентификация")
+        if authenticate_user(login, data['password']):
+            return success_response({"login": login, **auth.issue_tokens(login)}, "Успешная аутентификация")
         else:
             return error_response("Неверный логин или пароль", 401)
             
     except Exception as e:
         return error_response(f"Ошибка при аутентификации: {str(e)}", 500)
 
+@api.route('/auth/refresh', methods=['POST'])
+def refresh_tokens():
+    """Новая пара токенов по токену обновления (старый токен обновления отзывается)"""
+    data = request.get_json(silent=True) or {}
+    if not data.get('refresh_token'):
+        return error_response("Отсутствуют обязательные поля: refresh_token")
+    try:
+        # Отзыв мог случиться в другом процессе только что — сверяемся с базой
+        auth.revoked.sync(force=True)
+        claims = auth.verify_token(data['refresh_token'], auth.REFRESH)
+        auth.revoke(claims)
+        return success_response({"login": claims["sub"], **auth.issue_tokens(claims["sub"])},
+                                "Токены обновлены")
+    except AuthError as e:
+        return error_response(str(e), 401)
+    except Exception as e:
+        return error_response(f"Ошибка при обновлении токена: {str(e)}", 500)
+
+@api.route('/auth/logout', methods=['POST'])
+@token_required
+def logout():
+    """Отзыв токена доступа и (если передан) токена обновления"""
+    try:
+        if g.token:
+            auth.revoke(g.token)
+        data = request.get_json(silent=True) or {}
+        if data.get('refresh_token'):
+            try:
+                auth.revoke(auth.verify_token(data['refresh_token'], auth.REFRESH))
+            except AuthError:
+                pass
+        return success_response(message="Выход выполнен")
+    except Exception as e:
+        return error_response(f"Ошибка при выходе: {str(e)}", 500)
+
 # ==================== ПОЛЬЗОВАТЕЛИ ==================== #
 
-@app.route('/users', methods=['GET'])
+@api.route('/users', methods=['GET'])
+@token_required
 def get_all_users():
-    """Получить всех пользователей"""
-    try:
-        users = get_users()
-        users_list = []
-        for user in users:
-            users_list.append({
-                'id': user[0],
-                'login': user[1],
-                'last_login': user[2]
-            })
-        return success_response(users_list)
+    """Получить пользователей (постранично: limit, after, fields)"""
+    try:
+        after, limit, columns = parse_page_args(USER_FIELDS)
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        users = get_users(after=after, limit=limit, fields=columns)
+        return page_response(users, columns, limit)
     except Exception as e:
         return error_response(f"Ошибка при получении пользователей: {str(e)}", 500)
 
-@app.route('/users', methods=['POST'])
+@api.route('/users', methods=['POST'])
+@token_required
 def create_user():
     """Создать нового пользователя (то же что и регистрация)"""
-    return register()
+    return register_user()
 
 # ==================== КОМПЬЮТЕРЫ ==================== #
 
-@app.route('/computers', methods=['GET'])
+@api.route('/computers', methods=['GET'])
+@token_required
 def get_all_computers():
-    """Получить все компьютеры"""
-    try:
-        computers = get_computers()
-        computers_list = []
-        for computer in computers:
-            computers_list.append({
-                'id': computer[0],
-                'room_number': computer[1],
-                'computer_name': computer[2]
-            })
-        return success_response(computers_list)
+    """Получить компьютеры (постранично: limit, after, fields)"""
+    try:
+        after, limit, columns = parse_page_args(COMPUTER_FIELDS)
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        computers = get_computers(after=after, limit=limit, fields=columns)
+        return page_response(computers, columns, limit)
     except Exception as e:
         return error_response(f"Ошибка при получении компьютеров: {str(e)}", 500)
 
-@app.route('/computers', methods=['POST'])
+@api.route('/computers', methods=['POST'])
+@token_required
 def create_computer():
     """Добавить новый компьютер"""
+    data, error = read_json_body(schemas.COMPUTER)
+    if error:
+        return error_response(error)
     try:
-        data = request.get_json()
-        
-        # Валидация входных данных
-        is_valid, error_msg = validate_required_fields(data, ['room_number', 'computer_name'])
-        if not is_valid:
-            return error_response(error_msg)
-        
-        room_number = data['room_number'].strip()
-        computer_name = data['computer_name'].strip()
-        
-        # Добавляем компьютер
-        computer_id = add_computer(room_number, computer_name)
+        computer_id = add_computer(data['room_number'], data['computer_name'])
         return success_response({"id": computer_id}, "Компьютер успешно добавлен")
         
     except Exception as e:
+        if "UNIQUE constraint failed" in str(e):
+            return error_response("Компьютер с таким именем уже есть в этой аудитории")
         return error_response(f"Ошибка при добавлении компьютера: {str(e)}", 500)
 
-@app.route('/computers/<int:computer_id>', methods=['DELETE'])
+@api.route('/computers/bulk', methods=['POST'])
+@token_required
+def create_computers_bulk():
+    """Массовое добавление компьютеров (JSON-массив или CSV, mode=partial|atomic)"""
+    try:
+        items = read_bulk_items()
+        atomic = read_bulk_mode()
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        results = run_bulk(items, parse_bulk_computer, add_computers_bulk, atomic)
+        return bulk_response(results, atomic, "компьютеров")
+    except Exception as e:
+        return error_response(f"Ошибка при импорте компьютеров: {str(e)}", 500)
+
+@api.route('/computers/<int:computer_id>', methods=['DELETE'])
+@token_required
 def delete_computer_by_id(computer_id):
     """Удалить компьютер"""
     try:
@@ -202,100 +608,164 @@ def delete_computer_by_id(computer_id):
     except Exception as e:
         return error_response(f"Ошибка при удалении компьютера: {str(e)}", 500)
 
+@api.route('/computers', methods=['DELETE'])
+@token_required
+def delete_computers_bulk():
+    """Удалить компьютеры по списку id вместе с их лицензиями"""
+    try:
+        ids = read_id_list()
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        deleted = delete_computers(ids)
+        return success_response(deleted, f"Удалено компьютеров: {deleted['computers']}, "
+                                         f"лицензий: {deleted['licenses']}")
+    except Exception as e:
+        return error_response(f"Ошибка при удалении компьютеров: {str(e)}", 500)
+
+# ==================== АУДИТОРИИ ==================== #
+
+@api.route('/rooms', methods=['GET'])
+@token_required
+def get_rooms():
+    """Аудитории с компьютерами, лицензиями и итогами (постранично: limit, after — номер аудитории)"""
+    try:
+        limit = int_arg('limit', DEFAULT_ROOM_LIMIT, 1, MAX_ROOM_LIMIT)
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        rooms = get_room_trees(after=request.args.get('after'), limit=limit)
+        next_cursor = rooms[-1]["room_number"] if len(rooms) == limit else None
+        return success_response(rooms, meta={"next_cursor": next_cursor, "limit": limit})
+    except Exception as e:
+        return error_response(f"Ошибка при получении аудиторий: {str(e)}", 500)
+
+@api.route('/rooms/<room_number>', methods=['GET'])
+@token_required
+def get_room(room_number):
+    """Аудитория: компьютеры с лицензиями и итоги по лицензиям"""
+    try:
+        room = get_room_tree(room_number)
+        if room is None:
+            return error_response(f"Аудитория {room_number} не найдена", 404)
+        return success_response(room)
+    except Exception as e:
+        return error_response(f"Ошибка при получении аудитории: {str(e)}", 500)
+
+@api.route('/rooms/<room_number>/computers/<computer_name>/licenses', methods=['GET'])
+@token_required
+def get_room_computer_licenses(room_number, computer_name):
+    """Лицензии компьютера в дереве его аудитории (итоги — только по этому компьютеру)"""
+    try:
+        room = get_room_tree(room_number, computer_name)
+        if room is None:
+            return error_response(f"Компьютер {computer_name} в аудитории {room_number} не найден", 404)
+        return success_response(room)
+    except Exception as e:
+        return error_response(f"Ошибка при получении лицензий компьютера: {str(e)}", 500)
+
+@api.route('/rooms/<room_number>', methods=['DELETE'])
+@token_required
+def delete_room_endpoint(room_number):
+    """Удалить все компьютеры аудитории вместе с их лицензиями"""
+    try:
+        deleted = delete_room(room_number)
+        if not deleted["computers"]:
+            return error_response(f"Аудитория {room_number} не найдена", 404)
+        return success_response(deleted, f"Удалено компьютеров: {deleted['computers']}, "
+                                         f"лицензий: {deleted['licenses']}")
+    except Exception as e:
+        return error_response(f"Ошибка при удалении аудитории: {str(e)}", 500)
+
 # ==================== ЛИЦЕНЗИИ ==================== #
 
-@app.route('/licenses', methods=['GET'])
+@api.route('/licenses', methods=['GET'])
+@token_required
 def get_all_licenses():
-    """Получить все лицензии"""
+    """Получить лицензии (постранично: limit, after, fields; фильтр computer_id)"""
     try:
-        computer_id = request.args.get('computer_id')
-        if computer_id:
-            licenses = get_licenses(int(computer_id))
-        else:
-            licenses = get_licenses()
-            
-        licenses_list = []
-        for license_item in licenses:
-            licenses_list.append({
-                'id': license_item[0],
-                'computer_id': license_item[1],
-                'software': license_item[2],
-                'license_start': license_item[3],
-                'license_end': license_item[4],
-                'budget': license_item[5]
-            })
-        return success_response(licenses_list)
+        after, limit, columns = parse_page_args(LICENSE_FIELDS)
+        computer_id = parse_computer_id(request.args.get('computer_id'))
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        licenses = get_licenses(computer_id, after=after, limit=limit, fields=columns)
+        return page_response(licenses, columns, limit)
     except Exception as e:
         return error_response(f"Ошибка при получении лицензий: {str(e)}", 500)
 
-@app.route('/licenses', methods=['POST'])
+@api.route('/licenses', methods=['POST'])
+@token_required
 def create_license():
     """Добавить новую лицензию"""
+    # Типы, даты (уже объектами date) и их порядок проверены схемой
+    data, error = read_json_body(schemas.LICENSE)
+    if error:
+        return error_response(error)
+    computer_id = data['computer_id']
     try:
-        data = request.get_json()
-        
-        # Валидация входных данных
-        is_valid, error_msg = validate_required_fields(data, ['computer_id', 'software', 'license_start', 'license_end'])
-        if not is_valid:
-            return error_response(error_msg)
-        
-        computer_id = data['computer_id']
-        software = data['software'].strip()
-        license_start = data['license_start']
-        license_end = data['license_end']
-        budget = data.get('budget', 0.0)
-        
         # Проверка существования компьютера
-        computers = get_computers()
-        computer_exists = any(computer[0] == computer_id for computer in computers)
-        if not computer_exists:
+        if not computer_exists(computer_id):
             return error_response(f"Компьютер с ID {computer_id} не найден")
-        
-        # Валидация дат
-        if not validate_date_format(license_start):
-            return error_response("Неверный формат даты начала лицензии (требуется YYYY-MM-DD)")
-        if not validate_date_format(license_end):
-            return error_response("Неверный формат даты окончания лицензии (требуется YYYY-MM-DD)")
-        
-        # Проверка что дата окончания больше даты начала
-        start_date = datetime.strptime(license_start, '%Y-%m-%d')
-        end_date = datetime.strptime(license_end, '%Y-%m-%d')
-        if end_date <= start_date:
-            return error_response("Дата окончания лицензии должна быть больше даты начала")
-        
-        # Добавляем лицензию
-        add_license(computer_id, software, license_start, license_end, budget)
+
+        add_license(computer_id, data['software'], data['license_start'], data['license_end'], data['budget'])
         return success_response(message="Лицензия успешно добавлена")
         
     except Exception as e:
+        if "FOREIGN KEY constraint failed" in str(e):
+            # Компьютер удалили после проверки (например, в другом процессе)
+            forget_computer(computer_id)
+            return error_response(f"Компьютер с ID {computer_id} не найден")
         return error_response(f"Ошибка при добавлении лицензии: {str(e)}", 500)
 
-@app.route('/licenses/<int:license_id>', methods=['PUT'])
+@api.route('/licenses/bulk', methods=['POST'])
+@token_required
+def create_licenses_bulk():
+    """Массовое добавление лицензий (JSON-массив или CSV, mode=partial|atomic)"""
+    try:
+        items = read_bulk_items()
+        atomic = read_bulk_mode()
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        results = run_bulk(items, parse_bulk_license, add_licenses_bulk, atomic)
+        return bulk_response(results, atomic, "лицензий")
+    except Exception as e:
+        return error_response(f"Ошибка при импорте лицензий: {str(e)}", 500)
+
+@api.route('/licenses/<int:license_id>', methods=['PUT'])
+@token_required
 def update_license_by_id(license_id):
     """Обновить лицензию"""
+    changes, error = parse_license_changes(request.get_json(silent=True))
+    if error:
+        return error_response(error)
     try:
-        data = request.get_json()
-        if not data:
-            return error_response("Не переданы данные для обновления")
-        
-        # Валидация дат если они переданы
-        if 'license_start' in data and not validate_date_format(data['license_start']):
-            return error_response("Неверный формат даты начала лицензии (требуется YYYY-MM-DD)")
-        if 'license_end' in data and not validate_date_format(data['license_end']):
-            return error_response("Неверный формат даты окончания лицензии (требуется YYYY-MM-DD)")
-        
-        # Очистка строковых полей от пробелов
-        if 'software' in data:
-            data['software'] = data['software'].strip()
-        
-        # Обновляем лицензию
-        update_license(license_id, **data)
+        if not update_license(license_id, **changes):
+            return error_response(f"Лицензия с ID {license_id} не найдена", 404)
         return success_response(message="Лицензия успешно обновлена")
-        
+    except ValueError as e:
+        return error_response(str(e))
     except Exception as e:
         return error_response(f"Ошибка при обновлении лицензии: {str(e)}", 500)
 
-@app.route('/licenses/<int:license_id>', methods=['DELETE'])
+@api.route('/licenses', methods=['PATCH'])
+@token_required
+def update_licenses_bulk():
+    """Массовое изменение лицензий одной транзакцией: [{"id": ..., поля}, ...], mode=partial|atomic"""
+    try:
+        items = read_bulk_items()
+        atomic = read_bulk_mode()
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        results = run_bulk(items, parse_bulk_license_update, update_licenses, atomic)
+        return bulk_update_response(results, atomic, "лицензий")
+    except Exception as e:
+        return error_response(f"Ошибка при изменении лицензий: {str(e)}", 500)
+
+@api.route('/licenses/<int:license_id>', methods=['DELETE'])
+@token_required
 def delete_license_by_id(license_id):
     """Удалить лицензию"""
     try:
@@ -304,60 +774,353 @@ def delete_license_by_id(license_id):
     except Exception as e:
         return error_response(f"Ошибка при удалении лицензии: {str(e)}", 500)
 
-@app.route('/licenses/search', methods=['GET'])
+@api.route('/licenses', methods=['DELETE'])
+@token_required
+def delete_licenses_bulk():
+    """Удалить лицензии по списку id или все, истекшие раньше даты (expired_before=YYYY-MM-DD)"""
+    try:
+        expired_before = request.args.get('expired_before')
+        if expired_before is not None:
+            before = parse_expired_before(expired_before)
+            # Действующие лицензии так не удаляются: граница — не позже завтрашнего дня
+            if DB.to_day(before) > DB.to_day(date.today()) + 1:
+                raise ValueError("expired_before не может быть позже завтрашнего дня")
+        else:
+            ids = read_id_list()
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        if expired_before is not None:
+            deleted = delete_expired_licenses(before)
+        else:
+            deleted = delete_licenses(ids)
+        return success_response({"licenses": deleted}, f"Удалено лицензий: {deleted}")
+    except Exception as e:
+        return error_response(f"Ошибка при удалении лицензий: {str(e)}", 500)
+
+@api.route('/licenses/search', methods=['GET'])
+@token_required
 def search_licenses_endpoint():
-    """Поиск лицензий с фильтрацией"""
+    """Поиск лицензий с фильтрацией (match=substring|prefix|fuzzy для software, limit)"""
     try:
-        software = request.args.get('software')
-        room = request.args.get('room')
-        active_only = request.args.get('active_only', 'false').lower() == 'true'
-        
-        licenses = search_licenses(software=software, room=room, active_only=active_only)
-        
-        licenses_list = []
-        for license_item in licenses:
-            licenses_list.append({
-                'id': license_item[0],
-                'room_number': license_item[1],
-                'computer_name': license_item[2],
-                'software': license_item[3],
-                'license_start': license_item[4],
-                'license_end': license_item[5],
-                'budget': license_item[6]
-            })
-        return success_response(licenses_list)
+        filters = parse_search_args()
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        licenses = search_licenses(**filters)
+        return success_response(serialization.row_objects(licenses, SEARCH_FIELDS))
     except Exception as e:
         return error_response(f"Ошибка при поиске лицензий: {str(e)}", 500)
 
+def _export_ndjson(batches):
+    """Строки поиска лицензий в формате NDJSON: один JSON-объект на строку"""
+    for rows in batches:
+        yield serialization.dumps_lines(serialization.row_objects(rows, SEARCH_FIELDS))
+
+def _export_csv(batches):
+    """Строки поиска лицензий в формате CSV с заголовком"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SEARCH_FIELDS)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+EXPORT_FORMATS = {
+    'ndjson': (_export_ndjson, "application/x-ndjson; charset=utf-8"),
+    'csv': (_export_csv, "text/csv; charset=utf-8"),
+}
+
+@api.route('/licenses/export', methods=['GET'])
+@token_required
+def export_licenses_endpoint():
+    """Потоковая выгрузка лицензий (format=ndjson|csv, фильтры как у /licenses/search)"""
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        return error_response("Параметр format должен быть ndjson или csv")
+
+    try:
+        filters = parse_search_args(with_limit=False)
+    except ValueError as e:
+        return error_response(str(e))
+
+    encode, content_type = EXPORT_FORMATS[export_format]
+    batches = iter_search_licenses(**filters)
+    headers = {"Content-Disposition": f"attachment; filename=licenses.{export_format}"}
+    # Строки читаются уже после отправки заголовков: возраст снимка — на момент запроса
+    age = DB.snapshot_age()
+    if age is not None:
+        headers[SNAPSHOT_AGE_HEADER] = f"{age:.0f}"
+    return Response(encode(batches), content_type=content_type, headers=headers)
+
+@api.route('/licenses/summary', methods=['GET'])
+@token_required
+def licenses_summary_endpoint():
+    """Счётчики лицензий для дашборда (details=true — с разбивкой по аудиториям и ПО)"""
+    try:
+        if request.args.get('details', 'false').lower() == 'true':
+            return success_response(get_license_summary())
+        return success_response(count_licenses())
+    except Exception as e:
+        return error_response(f"Ошибка при подсчёте лицензий: {str(e)}", 500)
+
+@api.route('/licenses/expiring', methods=['GET'])
+@token_required
+def expiring_licenses_endpoint():
+    """Лицензии, истекающие в ближайшие days дней (по умолчанию EXPIRING_DAYS), по дате окончания"""
+    try:
+        days = int(request.args.get('days', EXPIRING_DAYS))
+        if not 0 <= days <= 3650:
+            raise ValueError
+    except ValueError:
+        return error_response("Параметр days должен быть целым числом от 0 до 3650")
+    try:
+        licenses = Timeline.expiring_licenses(days)
+        return success_response(serialization.row_objects(licenses, SEARCH_FIELDS))
+    except Exception as e:
+        return error_response(f"Ошибка при получении истекающих лицензий: {str(e)}", 500)
+
+@api.route('/licenses/events', methods=['GET'])
+@token_required
+def license_events_endpoint():
+    """Журнал событий истечения лицензий (постранично: limit, after, fields)"""
+    try:
+        after, limit, columns = parse_page_args(EVENT_FIELDS)
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        events = get_license_events(after=after, limit=limit, fields=columns)
+        return page_response(events, columns, limit)
+    except Exception as e:
+        return error_response(f"Ошибка при получении событий: {str(e)}", 500)
+
+# ==================== ЖУРНАЛ ИЗМЕНЕНИЙ ==================== #
+
+CHANGES_TRIMMED = "Журнал изменений после since уже очищен, нужна полная синхронизация"
+TOO_MANY_WAITERS = "Слишком много ожидающих запросов /changes, повторите позже"
+
+def too_many_waiters():
+    """503, когда заняты все MAX_CHANGE_WAITERS мест ожидания: клиент повторит запрос позже"""
+    body, status = error_response(TOO_MANY_WAITERS, 503)
+    return body, status, {"Retry-After": "1"}
+
+def _sse_changes(since, limit):
+    """
+    Поток Server-Sent Events: событие changes на каждую порцию изменений
+    (id — last_seq), комментарий-пинг раз в SSE_HEARTBEAT_SECONDS, событие
+    reset, если журнал после since очищен. Через SSE_STREAM_SECONDS поток
+    закрывается, EventSource переподключается с Last-Event-ID.
+    """
+    deadline = time.monotonic() + SSE_STREAM_SECONDS
+    yield "retry: 1000\n\n"
+    while True:
+        result = get_changes(since, limit)
+        if result is None:
+            yield f"event: reset\ndata: {serialization.dumps({'error': CHANGES_TRIMMED}).decode()}\n\n"
+            return
+        if result["changes"]:
+            since = result["last_seq"]
+            yield f"id: {since}\nevent: changes\ndata: {serialization.dumps(result['changes']).decode()}\n\n"
+            if result["has_more"]:
+                continue
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if not wait_for_changes(since, min(SSE_HEARTBEAT_SECONDS, remaining)):
+            yield ": ping\n\n"
+
+@api.route('/changes', methods=['GET'])
+@token_required
+def get_changes_endpoint():
+    """
+    Изменения компьютеров и лицензий после seq=since (вставки и изменения —
+    с текущими данными, удаления — data: null). Без since — только текущий
+    last_seq, с которого начинать после полной выгрузки. wait=N — подождать
+    до N секунд, если изменений ещё нет; Accept: text/event-stream — поток SSE.
+    """
+    stream = request.accept_mimetypes.best == 'text/event-stream'
+    since = (request.headers.get('Last-Event-ID') if stream else None) or request.args.get('since')
+    if since is not None and not since.isdigit():
+        return error_response("Параметр since должен быть неотрицательным целым числом")
+    try:
+        limit = int_arg('limit', CHANGES_PAGE_LIMIT, 1, MAX_CHANGES_LIMIT)
+        wait = int_arg('wait', 0, 0, MAX_CHANGES_WAIT)
+    except ValueError as e:
+        return error_response(str(e))
+
+    try:
+        if since is None:
+            # Точка отсчёта: поток SSE начинается с неё, обычный запрос просто её возвращает
+            since = get_last_change_seq()
+            if not stream:
+                return success_response([], meta={"last_seq": since, "has_more": False})
+        since = int(since)
+        # Ожидание держит поток сервера: одновременно ждут не больше MAX_CHANGE_WAITERS запросов
+        waiters = current_app.extensions['change_waiters']
+        if stream:
+            if not waiters.acquire(blocking=False):
+                return too_many_waiters()
+            response = Response(_sse_changes(since, limit), content_type="text/event-stream; charset=utf-8",
+                                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+            response.call_on_close(waiters.release)
+            return response
+        if wait and get_last_change_seq() <= since:
+            if not waiters.acquire(blocking=False):
+                return too_many_waiters()
+            try:
+                wait_for_changes(since, wait)
+            finally:
+                waiters.release()
+        result = get_changes(since, limit)
+        if result is None:
+            return error_response(CHANGES_TRIMMED, 410)
+        return success_response(result["changes"],
+                                meta={"last_seq": result["last_seq"], "has_more": result["has_more"]})
+    except Exception as e:
+        return error_response(f"Ошибка при получении изменений: {str(e)}", 500)
+
+# ==================== ОТЧЁТЫ ==================== #
+
+def reports_unavailable():
+    """Ответ 503, если для отчётов не установлен numpy (группа reports в pyproject.toml)"""
+    if not Reports.available():
+        return error_response("Отчёты недоступны: не установлен numpy", 503)
+    return None
+
+def int_arg(name, default, low, high):
+    """Целый параметр запроса в диапазоне [low, high]; иначе ValueError с понятным текстом"""
+    try:
+        value = int(request.args.get(name, default))
+        if not low <= value <= high:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f"Параметр {name} должен быть целым числом от {low} до {high}")
+    return value
+
+@api.route('/reports/spend', methods=['GET'])
+@token_required
+def spend_report():
+    """Бюджет по аудиториям, ПО или месяцам (by=room|software|month; from, to — месяц начала YYYY-MM)"""
+    unavailable = reports_unavailable()
+    if unavailable:
+        return unavailable
+    by = request.args.get('by', 'room')
+    if by not in Reports.SPEND_GROUPS:
+        return error_response(f"Параметр by должен быть одним из: {', '.join(Reports.SPEND_GROUPS)}")
+    month_from, month_to = request.args.get('from'), request.args.get('to')
+    try:
+        for value in (month_from, month_to):
+            if value is not None:
+                datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        return error_response("Неверный формат месяца в from/to (требуется YYYY-MM)")
+    try:
+        return success_response(Reports.spend(by, month_from, month_to))
+    except Exception as e:
+        return error_response(f"Ошибка при построении отчёта: {str(e)}", 500)
+
+@api.route('/reports/forecast', methods=['GET'])
+@token_required
+def renewal_forecast_report():
+    """Непродлённые лицензии и бюджет продлений по месяцам на months месяцев вперёд"""
+    unavailable = reports_unavailable()
+    if unavailable:
+        return unavailable
+    try:
+        months = int_arg('months', 12, 1, 120)
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        return success_response(Reports.renewal_forecast(months))
+    except Exception as e:
+        return error_response(f"Ошибка при построении отчёта: {str(e)}", 500)
+
+@api.route('/reports/overlaps', methods=['GET'])
+@token_required
+def overlaps_report():
+    """Одно и то же ПО на одном компьютере с пересекающимися сроками (первые limit групп)"""
+    unavailable = reports_unavailable()
+    if unavailable:
+        return unavailable
+    try:
+        limit = int_arg('limit', 100, 0, 10000)
+    except ValueError as e:
+        return error_response(str(e))
+    try:
+        return success_response(Reports.overlaps(limit))
+    except Exception as e:
+        return error_response(f"Ошибка при построении отчёта: {str(e)}", 500)
+
+# ==================== КЭШ ==================== #
+
+@api.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Счётчики попаданий и промахов кэша результатов"""
+    return success_response(cache.stats())
+
+# ==================== МЕТРИКИ ==================== #
+
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Метрики в текстовом формате Prometheus. Значения свои у каждого процесса:
+    при нескольких воркерах каждый отдаёт собственные счётчики.
+    """
+    if not current_app.config.get('METRICS_ENABLED'):
+        return error_response("Метрики выключены", 404)
+    return Response(Metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ==================== ГЛАВНАЯ СТРАНИЦА ==================== #
 
-@app.route('/', methods=['GET'])
+@api.route('/', methods=['GET'])
 def home():
     """Главная страница API"""
     return success_response({
         "message": "License Manager API",
         "version": "1.0",
         "endpoints": {
-            "auth": ["/auth/login", "/auth/register"],
+            "auth": ["/auth/login", "/auth/register", "/auth/refresh", "/auth/logout"],
             "users": ["/users"],
-            "computers": ["/computers"],
-            "licenses": ["/licenses", "/licenses/search"]
+            "computers": ["/computers", "/computers/bulk"],
+            "changes": ["/changes"],
+            "rooms": ["/rooms", "/rooms/<room>", "/rooms/<room>/computers/<name>/licenses"],
+            "licenses": ["/licenses", "/licenses/search", "/licenses/summary", "/licenses/export", "/licenses/bulk",
+                         "/licenses/expiring", "/licenses/events"],
+            "reports": ["/reports/spend", "/reports/forecast", "/reports/overlaps"],
+            "cache": ["/cache/stats"],
+            "metrics": ["/metrics"]
         }
     })
 
 # ==================== ОБРАБОТКА ОШИБОК ==================== #
 
-@app.errorhandler(404)
+@api.app_errorhandler(AuthError)
+def unauthorized(error):
+    return error_response(str(error), 401)
+
+@api.app_errorhandler(404)
 def not_found(error):
     return error_response("Эндпоинт не найден", 404)
 
-@app.errorhandler(405)
+@api.app_errorhandler(405)
 def method_not_allowed(error):
     return error_response("Метод не разрешен", 405)
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
     return error_response("Внутренняя ошибка сервера", 500)
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Встроенный сервер для разработки; для работы под нагрузкой — license_manager_backend.serve
+    # Перезагрузчик debug-режима запускает модуль дважды: наблюдающий процесс и
+    # рабочий (WERKZEUG_RUN_MAIN). Фоновые потоки нужны только рабочему, иначе
+    # планировщик, очистка журнала и обновление снимка работают в двух процессах сразу.
+    reloader_parent = os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+    background = {'EXPIRY_SCHEDULER': False, 'CHANGES_TRIM_INTERVAL': 0,
+                  'SNAPSHOT_ENABLED': False} if reloader_parent else {}
+    dev_app = create_app(config.DevelopmentConfig, **background)
+    dev_app.run(debug=True, host=dev_app.config['HOST'], port=dev_app.config['PORT'])
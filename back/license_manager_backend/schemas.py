@@ -0,0 +1,261 @@
+"""
+Схемы тел запросов.
+
+Схема — набор полей с типами и ограничениями и проверки, связывающие
+несколько полей (например, порядок дат). Она собирается один раз при
+импорте модуля; parse(data) за один проход по полям приводит значения
+к нужным типам (даты — объекты date, которые дальше идут в Functions.py
+без повторного разбора) и возвращает (значения, ошибка) — как разборщики
+массового импорта в main.py. Одни и те же схемы используют одиночные и
+массовые маршруты, поэтому 0 и пустая строка, CSV и JSON проверяются
+одинаково, а неверный тип даёт 400, а не исключение.
+
+Пустые значения (None и пустая строка — пустой столбец CSV) считаются
+отсутствующими: обязательное поле — ошибка, необязательное получает
+значение по умолчанию. В частичной схеме (изменение записи) пустым может
+быть только поле с nullable=True, остальные — ошибка.
+"""
+import math
+from datetime import date
+
+# Сообщение при отсутствии обязательных полей (одно на все поля)
+MISSING = "Отсутствуют обязательные поля: {}"
+NOT_OBJECT = "Запись должна быть объектом"
+
+
+# Наибольший id строки: INTEGER в SQLite — 64-битное целое со знаком
+MAX_ID = 2 ** 63 - 1
+
+_fromisoformat = date.fromisoformat
+
+
+# ---------------- Типы полей ---------------- #
+
+def text(strip=True, min_length=None, max_length=None, short_error=None):
+    """Строка; short_error — своё сообщение, если она короче min_length"""
+    def parse(value):
+        if not isinstance(value, str):
+            raise ValueError("{name} должен быть строкой")
+        if strip:
+            value = value.strip()
+        if min_length is not None and len(value) < min_length:
+            raise ValueError(short_error or f"{{name}} должен содержать минимум {min_length} символа")
+        if max_length is not None and len(value) > max_length:
+            raise ValueError(f"{{name}} должен содержать не больше {max_length} символов")
+        return value
+    return parse
+
+
+def integer(low=None, high=None):
+    """Целое число; строка из цифр (CSV) тоже подходит, true/false и дробные — нет"""
+    def parse(value):
+        if value.__class__ is not int:
+            if not isinstance(value, str):
+                raise ValueError("{name} должен быть целым числом")
+            try:
+                value = int(value)
+            except ValueError:
+                raise ValueError("{name} должен быть целым числом") from None
+        return value if low is None and high is None else _in_range(value, low, high)
+    return parse
+
+
+def number(low=None, high=None):
+    """Конечное число (int, float или строка с числом)"""
+    def parse(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError("{name} должен быть числом")
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError("{name} должен быть числом") from None
+        if not math.isfinite(value):
+            raise ValueError("{name} должен быть числом")
+        return value if low is None and high is None else _in_range(value, low, high)
+    return parse
+
+
+def iso_date(error=None):
+    """Дата YYYY-MM-DD -> date; error — своё сообщение вместо общего"""
+    def parse(value):
+        if value.__class__ is str and len(value) == 10 and value[4] == '-' and value[7] == '-':
+            try:
+                return _fromisoformat(value)
+            except ValueError:
+                pass
+        raise ValueError(error or f"Неверный формат даты: {value!r}")
+    return parse
+
+
+def _in_range(value, low, high):
+    if low is not None and value < low:
+        raise ValueError(f"{{name}} должен быть не меньше {low}")
+    if high is not None and value > high:
+        raise ValueError(f"{{name}} должен быть не больше {high}")
+    return value
+
+
+class Field:
+    """
+    Поле схемы: parse — разбор значения из типов выше (в их сообщениях
+    {name} заменяется именем поля), nullable — явный null сохраняется как None.
+    """
+
+    def __init__(self, parse, required=False, default=None, nullable=False):
+        self.parse = parse
+        self.required = required
+        self.default = default
+        self.nullable = nullable
+
+    def but(self, **changes):
+        """Копия поля с другими параметрами — для схем, различающихся одним полем"""
+        field = Field(self.parse, self.required, self.default, self.nullable)
+        for key, value in changes.items():
+            setattr(field, key, value)
+        return field
+
+
+class Schema:
+    """
+    fields — {имя: Field}; checks — функции values -> сообщение об ошибке или None,
+    вызываются после разбора всех полей. partial — схема изменения: в результат
+    попадают только переданные поля, пустой набор — ошибка. Поля не из схемы —
+    ошибка, если не задан allow_unknown.
+    """
+
+    def __init__(self, fields, checks=(), partial=False, allow_unknown=False,
+                 unknown_error="Неизвестные поля: {}", empty_error="Не переданы данные"):
+        self.names = frozenset(fields)
+        self._fields = tuple((name, field.parse, field.required, field.default, field.nullable)
+                             for name, field in fields.items())
+        self._checks = tuple(checks)
+        self._partial = partial
+        self._allow_unknown = allow_unknown
+        self._unknown_error = unknown_error
+        self._empty_error = empty_error
+
+    def parse(self, data):
+        """Проверяет словарь data; возвращает (значения, None) или (None, сообщение)"""
+        if not isinstance(data, dict):
+            return None, NOT_OBJECT
+        if not self._allow_unknown:
+            unknown = [key for key in data if key not in self.names]
+            if unknown:
+                return None, self._unknown_error.format(", ".join(map(str, unknown)))
+        if self._partial and not data:
+            return None, self._empty_error
+
+        values = {}
+        missing = None
+        for name, parse, required, default, nullable in self._fields:
+            value = data.get(name)
+            if value is not None and value != "":
+                try:
+                    value = parse(value)
+                except ValueError as e:
+                    return None, str(e).replace("{name}", name)
+            # Пустое и после разбора (строка из пробелов) — то же, что отсутствующее
+            if value is None or value == "":
+                if required:
+                    missing = (missing or []) + [name]
+                elif nullable and name in data:
+                    values[name] = None
+                elif self._partial:
+                    if name in data:
+                        return None, f"{name} не может быть пустым"
+                else:
+                    values[name] = default
+                continue
+            values[name] = value
+        if missing:
+            return None, MISSING.format(", ".join(missing))
+        for check in self._checks:
+            error = check(values)
+            if error:
+                return None, error
+        return values, None
+
+
+# ---------------- Схемы маршрутов ---------------- #
+
+def _dates_ordered(values):
+    start, end = values.get('license_start'), values.get('license_end')
+    if start is not None and end is not None and end <= start:
+        return "Дата окончания лицензии должна быть больше даты начала"
+    return None
+
+
+def _computer_given(values):
+    if values['computer_id'] is None and not (values['room_number'] and values['computer_name']):
+        return "Нужно указать computer_id или room_number и computer_name"
+    return None
+
+
+_TEXT = Field(text(), required=True)
+# id записи: за пределами INTEGER SQLite запрос падал бы с OverflowError
+ID = Field(integer(low=1, high=MAX_ID))
+_COMPUTER_ID = ID
+_LICENSE_START = Field(iso_date("Неверный формат даты начала лицензии (требуется YYYY-MM-DD)"), required=True)
+_LICENSE_END = Field(iso_date("Неверный формат даты окончания лицензии (требуется YYYY-MM-DD)"), required=True)
+_BUDGET = Field(number(low=0), nullable=True)
+
+# POST /auth/register, POST /users
+REGISTRATION = Schema({
+    'login': Field(text(min_length=3, short_error="Логин должен содержать минимум 3 символа"), required=True),
+    'password': Field(text(strip=False, min_length=4, short_error="Пароль должен содержать минимум 4 символа"),
+                      required=True),
+}, allow_unknown=True)
+
+# POST /auth/login
+CREDENTIALS = Schema({
+    'login': _TEXT,
+    'password': _TEXT.but(parse=text(strip=False)),
+}, allow_unknown=True)
+
+# POST /computers и записи POST /computers/bulk
+COMPUTER = Schema({'room_number': _TEXT, 'computer_name': _TEXT}, allow_unknown=True)
+
+# POST /licenses: компьютер по id, бюджет по умолчанию 0
+LICENSE = Schema({
+    'computer_id': _COMPUTER_ID.but(required=True),
+    'software': _TEXT,
+    'license_start': _LICENSE_START,
+    'license_end': _LICENSE_END,
+    'budget': _BUDGET.but(default=0.0),
+}, checks=[_dates_ordered], allow_unknown=True)
+
+# Записи POST /licenses/bulk: компьютер по id или по аудитории и имени
+BULK_LICENSE = Schema({
+    'computer_id': _COMPUTER_ID,
+    'room_number': Field(text()),
+    'computer_name': Field(text()),
+    'software': _TEXT,
+    'license_start': _LICENSE_START,
+    'license_end': _LICENSE_END,
+    'budget': _BUDGET,
+}, checks=[_computer_given, _dates_ordered], allow_unknown=True)
+
+# PUT /licenses/<id> и записи PATCH /licenses (без id): только изменяемые поля.
+# Порядок дат, если передана одна из них, проверяет update_license по сохранённой строке.
+LICENSE_CHANGES = Schema({
+    'computer_id': _COMPUTER_ID,
+    'software': Field(text()),
+    'license_start': _LICENSE_START.but(required=False),
+    'license_end': _LICENSE_END.but(required=False),
+    'budget': _BUDGET,
+}, checks=[_dates_ordered], partial=True,
+    unknown_error="Эти поля нельзя изменить: {}", empty_error="Не переданы данные для обновления")
+
+# id записи PATCH /licenses; остальные поля записи проверяет LICENSE_CHANGES
+LICENSE_ID = Schema({'id': ID.but(required=True)}, allow_unknown=True)
+
+
+def parse_license_update(item):
+    """Запись PATCH /licenses: id и изменения; возвращает ((id, изменения), None) или (None, сообщение)"""
+    values, error = LICENSE_ID.parse(item)
+    if error:
+        return None, error
+    changes, error = LICENSE_CHANGES.parse({key: value for key, value in item.items() if key != 'id'})
+    if error:
+        return None, error
+    return (values['id'], changes), None
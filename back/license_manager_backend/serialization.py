@@ -0,0 +1,131 @@
+"""
+Сериализация ответов API и сжатие тела.
+
+JSON кодируется orjson, если он установлен (группа speedups в pyproject.toml),
+иначе стандартным json. Оба варианта дают компактный JSON в UTF-8 (байты)
+и пишут даты текстом YYYY-MM-DD. Вариант выбирается настройкой JSON_BACKEND
+(auto, orjson, json).
+
+Строки из Functions.py (кортежи) превращаются в объекты JSON функцией
+row_objects: словари собираются через map/zip без цикла на Python и
+сразу уходят в кодировщик.
+
+Тело ответа сжимается gzip или brotli (если установлен brotli), смотря что
+клиент перечислил в Accept-Encoding. Короткие ответы (меньше MIN_SIZE байт)
+не сжимаются.
+"""
+import gzip
+import json
+from datetime import date
+from itertools import repeat
+
+from werkzeug.http import parse_accept_header
+
+try:
+    import orjson
+except ImportError:  # только стандартный json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # только gzip
+    brotli = None
+
+BACKENDS = ("auto", "orjson", "json")
+
+# Сжатие: не короче MIN_SIZE байт; уровень gzip 1-9, качество brotli 0-11.
+# Для ответов, которые собираются на каждый запрос, важнее скорость:
+# на списках лицензий gzip 1 лишь на несколько процентов больше gzip 6.
+COMPRESSION = True
+MIN_SIZE = 1024
+GZIP_LEVEL = 1
+BROTLI_QUALITY = 4
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def json_default(value):
+    """Типы, которых нет в JSON: даты из строк Functions.py — текстом YYYY-MM-DD"""
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+# ---------------- JSON ---------------- #
+
+_std_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=json_default)
+
+
+def _std_dumps(value):
+    return _std_encoder.encode(value).encode("utf-8")
+
+
+def _std_dumps_lines(objects):
+    encode = _std_encoder.encode
+    return "".join([encode(obj) + "\n" for obj in objects]).encode("utf-8")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def _orjson_dumps(value):
+        return orjson.dumps(value, default=json_default, option=_ORJSON_OPTIONS)
+
+    def _orjson_dumps_lines(objects):
+        options = _ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE
+        dumps = orjson.dumps
+        return b"".join([dumps(obj, default=json_default, option=options) for obj in objects])
+
+backend = None
+dumps = _std_dumps
+dumps_lines = _std_dumps_lines
+
+
+def use(name="auto"):
+    """Выбирает кодировщик JSON: auto (orjson, если установлен), orjson или json."""
+    global backend, dumps, dumps_lines
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный JSON_BACKEND {name}, ожидается один из: {', '.join(BACKENDS)}")
+    if name == "orjson" and orjson is None:
+        raise ValueError("JSON_BACKEND=orjson, но пакет orjson не установлен")
+    if name != "json" and orjson is not None:
+        backend, dumps, dumps_lines = "orjson", _orjson_dumps, _orjson_dumps_lines
+    else:
+        backend, dumps, dumps_lines = "json", _std_dumps, _std_dumps_lines
+
+
+use()
+
+
+def row_objects(rows, columns):
+    """Кортежи строк -> список словарей {столбец: значение}"""
+    return list(map(dict, map(zip, repeat(columns), rows)))
+
+
+# ---------------- Сжатие ---------------- #
+
+def encodings():
+    """Поддерживаемые Content-Encoding в порядке предпочтения"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding):
+    """Лучшее из поддерживаемых сжатий по заголовку Accept-Encoding; None — без сжатия"""
+    if not COMPRESSION or not accept_encoding:
+        return None
+    return parse_accept_header(accept_encoding).best_match(encodings())
+
+
+def compressible(content_type, size):
+    """Стоит ли сжимать тело такого типа и размера"""
+    return (COMPRESSION and size is not None and size >= MIN_SIZE
+            and (content_type or "").startswith(COMPRESSIBLE_TYPES))
+
+
+def compress(body, encoding):
+    """Сжимает тело (байты) выбранным negotiate способом"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        # mtime=0: одинаковое тело — одинаковый результат
+        return gzip.compress(body, GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Неподдерживаемое сжатие {encoding}")
@@ -0,0 +1,82 @@
+"""
+Запуск API в рабочем режиме.
+
+    python -m license_manager_backend.serve
+
+Используется gunicorn (несколько процессов с потоками, worker gthread),
+а если его нет — waitress (один процесс, несколько потоков; подходит для Windows).
+Параметры берутся из config.from_env(): LICENSE_MANAGER_WORKERS,
+LICENSE_MANAGER_THREADS, LICENSE_MANAGER_PORT и т.д.
+"""
+import logging
+import secrets
+
+from database import DB
+from database.DB import init_db
+
+from . import config
+from .main import create_app
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_database(settings):
+    """
+    Создаёт схему и применяет миграции один раз до запуска воркеров,
+    чтобы процессы не соревновались за изменение схемы.
+    """
+    if settings.get('DB_PATH'):
+        DB.DB_NAME = settings['DB_PATH']
+    init_db()
+    DB.close_connection()
+
+
+def run_gunicorn(settings):
+    from gunicorn.app.base import BaseApplication
+
+    class LicenseManagerApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{settings['HOST']}:{settings['PORT']}")
+            self.cfg.set('workers', settings['WORKERS'])
+            self.cfg.set('threads', settings['THREADS'])
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('loglevel', settings['LOG_LEVEL'].lower())
+
+        def load(self):
+            return create_app(settings, INIT_DB=False)
+
+    LicenseManagerApplication().run()
+
+
+def run_waitress(settings):
+    from waitress import serve
+
+    serve(create_app(settings, INIT_DB=False),
+          host=settings['HOST'], port=settings['PORT'], threads=settings['THREADS'])
+
+
+def main():
+    settings = config.from_env()
+    logging.basicConfig(level=settings['LOG_LEVEL'])
+    prepare_database(settings)
+    # Один ключ подписи токенов на все воркеры
+    if not settings['SECRET_KEY']:
+        logger.warning("SECRET_KEY не задан, токены станут недействительны после перезапуска")
+        settings['SECRET_KEY'] = secrets.token_hex(32)
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        try:
+            import waitress  # noqa: F401
+        except ImportError:
+            raise SystemExit("Для рабочего режима установите gunicorn или waitress: "
+                             "pip install 'license-manager-backend[server]'")
+        logger.warning("gunicorn не найден, запуск через waitress в одном процессе")
+        run_waitress(settings)
+    else:
+        run_gunicorn(settings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import logging
+
+import pytest
+
+from database import DB, Cache
+
+# Тесты проверяют запросы, а не кэш результатов
+Cache.ENABLED = False
+logging.getLogger("database.slow_queries").setLevel(logging.ERROR)
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Пустая временная база (без схемы): DB.DB_NAME указывает на неё до конца теста."""
+    DB.close_connection()
+    path = str(tmp_path / "test.db")
+    monkeypatch.setattr(DB, "DB_NAME", path)
+    yield path
+    DB.close_connection()
+
+
+@pytest.fixture
+def database(db_path):
+    """Временная база с текущей схемой."""
+    DB.init_db()
+    return db_path
@@ -0,0 +1,197 @@
+import pytest
+
+from database import DB, maintenance, seed
+import database.Functions as F
+from license_manager_backend.main import create_app
+
+
+@pytest.fixture
+def client(database):
+    app = create_app(INIT_DB=False, EXPIRY_SCHEDULER=False, AUTH_ENABLED=False, METRICS_ENABLED=False,
+                     SECRET_KEY="test", MAX_CHANGE_WAITERS=1)
+    return app.test_client()
+
+
+def by_row(result):
+    return {(change["entity"], change["id"]): change for change in result["changes"]}
+
+
+def test_changes_of_one_row_collapse_into_latest(database):
+    computer_id = F.add_computer("101", "PC-01")
+    license_id = F.add_license(computer_id, "Office", "2025-01-01", "2026-01-01", 100)
+    F.update_license(license_id, software="Office 2024")
+    F.update_license(license_id, budget=200)
+
+    result = F.get_changes(0)
+
+    assert result["last_seq"] == F.get_last_change_seq() == 4
+    assert result["has_more"] is False
+    changes = by_row(result)
+    assert set(changes) == {("computers", computer_id), ("licenses", license_id)}
+    license_change = changes[("licenses", license_id)]
+    assert (license_change["seq"], license_change["op"]) == (4, "update")
+    assert license_change["data"]["software"] == "Office 2024"
+    assert license_change["data"]["budget"] == 200
+    # Порядок — по seq последнего изменения
+    assert [change["seq"] for change in result["changes"]] == [1, 4]
+
+
+def test_limit_counts_log_entries(database):
+    computer_id = F.add_computer("101", "PC-01")
+    for _ in range(3):
+        F.add_license(computer_id, "Office", "2025-01-01", "2026-01-01", None)
+
+    first = F.get_changes(0, limit=2)
+    second = F.get_changes(first["last_seq"], limit=2)
+
+    assert (first["last_seq"], first["has_more"]) == (2, True)
+    # Страница кончается ровно на последнем seq — продолжения нет
+    assert (second["last_seq"], second["has_more"]) == (4, False)
+    assert F.get_changes(4, limit=2) == {"changes": [], "last_seq": 4, "has_more": False}
+    assert F.get_changes(0, limit=4)["has_more"] is False
+    assert F.get_changes(0, limit=3)["has_more"] is True
+
+
+def test_deleted_rows_are_tombstones(database):
+    computer_id = F.add_computer("101", "PC-01")
+    kept = F.add_computer("101", "PC-02")
+    license_id = F.add_license(computer_id, "Office", "2025-01-01", "2026-01-01", None)
+    since = F.get_last_change_seq()
+    F.update_license(license_id, software="Office 2024")
+    # Лицензия удаляется каскадно вместе с компьютером
+    F.delete_computer(computer_id)
+
+    changes = by_row(F.get_changes(since))
+
+    assert set(changes) == {("computers", computer_id), ("licenses", license_id)}
+    for change in changes.values():
+        assert change["op"] == "delete"
+        assert change["data"] is None
+    assert ("computers", kept) not in changes
+
+
+def test_deleted_computer_notifies_its_licenses(database):
+    computer_id = F.add_computer("101", "PC-01")
+    kept = F.add_computer("101", "PC-02")
+    license_ids = [F.add_license(computer_id, "Office", "2025-01-01", "2026-01-01", None) for _ in range(2)]
+    F.add_license(kept, "Office", "2025-01-01", "2026-01-01", None)
+    notified = []
+
+    def listener(license_id, license_end):
+        notified.append((license_id, license_end))
+
+    F.subscribe_license_changes(listener)
+    try:
+        F.delete_computer(computer_id)
+    finally:
+        F.unsubscribe_license_changes(listener)
+
+    # Шкала истечения убирает только эти лицензии, а не перечитывается целиком
+    assert sorted(notified) == [(license_id, None) for license_id in license_ids]
+
+
+def test_row_deleted_later_in_window_comes_as_delete(database):
+    computer_id = F.add_computer("101", "PC-01")
+    since = F.get_last_change_seq()
+    license_id = F.add_license(computer_id, "Office", "2025-01-01", "2026-01-01", None)
+    first = F.get_changes(since)
+    F.delete_license(license_id)
+
+    # Запрос, прочитанный до удаления, видел вставку; следующий — уже удаление
+    assert by_row(first)[("licenses", license_id)]["op"] == "insert"
+    change = by_row(F.get_changes(since))[("licenses", license_id)]
+    assert (change["op"], change["data"]) == ("delete", None)
+
+
+def test_trimmed_log_requires_full_sync(database):
+    computer_id = F.add_computer("101", "PC-01")
+    for _ in range(3):
+        F.add_license(computer_id, "Office", "2025-01-01", "2026-01-01", None)
+    with DB.get_connection() as conn:
+        conn.execute("DELETE FROM changes WHERE seq <= 2")
+
+    assert F.get_changes(0) is None
+    assert F.get_changes(1) is None
+    assert [change["seq"] for change in F.get_changes(2)["changes"]] == [3, 4]
+    # Курсор больше последнего seq — от другой базы
+    assert F.get_changes(10) is None
+
+
+def test_trimmed_log_is_410(client):
+    F.add_computer("101", "PC-01")
+    F.add_computer("101", "PC-02")
+    with DB.get_connection() as conn:
+        conn.execute("DELETE FROM changes WHERE seq = 1")
+
+    assert client.get("/changes?since=0").status_code == 410
+    response = client.get("/changes?since=1")
+    assert response.status_code == 200
+    assert response.get_json()["meta"] == {"last_seq": 2, "has_more": False}
+
+
+def test_server_trims_log_without_expiry_scheduler(database):
+    for name in ("PC-01", "PC-02", "PC-03"):
+        F.add_computer("101", name)
+    with DB.get_connection() as conn:
+        conn.execute("UPDATE changes SET changed_at = changed_at - ? WHERE seq <= 2",
+                     ((F.CHANGES_RETENTION_DAYS + 1) * 86400,))
+
+    maintenance.changes_trimmer.stop()
+    try:
+        create_app(INIT_DB=False, EXPIRY_SCHEDULER=False, AUTH_ENABLED=False, METRICS_ENABLED=False,
+                   SECRET_KEY="test", CHANGES_TRIM_INTERVAL=3600)
+        assert maintenance.changes_trimmer.running
+    finally:
+        maintenance.changes_trimmer.stop()
+    assert F.get_changes(0) is None
+    assert [change["seq"] for change in F.get_changes(2)["changes"]] == [3]
+
+
+def test_waiters_over_limit_get_503(client):
+    app = client.application
+    waiters = app.extensions["change_waiters"]
+    assert waiters.acquire(blocking=False)
+    try:
+        response = client.get("/changes?since=0&wait=5")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        response = client.get("/changes?since=0", headers={"Accept": "text/event-stream"})
+        assert response.status_code == 503
+    finally:
+        waiters.release()
+
+    # Изменения уже есть — запрос не ждёт и места не занимает
+    F.add_computer("101", "PC-01")
+    assert waiters.acquire(blocking=False)
+    try:
+        assert client.get("/changes?since=0&wait=5").status_code == 200
+    finally:
+        waiters.release()
+
+
+def test_closed_stream_frees_its_waiter_slot(client):
+    waiters = client.application.extensions["change_waiters"]
+    response = client.get("/changes?since=0", headers={"Accept": "text/event-stream"}, buffered=False)
+    assert response.status_code == 200
+    assert next(response.response) == b"retry: 1000\n\n"
+    assert not waiters.acquire(blocking=False)
+
+    response.close()
+
+    assert waiters.acquire(blocking=False)
+    waiters.release()
+
+
+def test_seed_logs_changes_only_into_existing_database(db_path):
+    seed.generate(rooms=2, computers=5, licenses=10, users=1, seed=1)
+    assert F.get_last_change_seq() == 0
+
+    seed.generate(rooms=2, computers=5, licenses=10, users=1, seed=2)
+    result = F.get_changes(0, limit=100)
+    assert F.get_last_change_seq() == 15
+    assert {change["entity"] for change in result["changes"]} == {"computers", "licenses"}
+    # Остальные триггеры licenses вернулись на место
+    with DB.get_connection() as conn:
+        names = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'licenses'")}
+    assert {"trg_licenses_fts_insert", "trg_license_summary_insert", "trg_changes_licenses_insert"} <= names
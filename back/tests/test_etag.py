@@ -0,0 +1,43 @@
+import pytest
+
+import database.Functions as F
+from license_manager_backend.main import create_app
+
+SETTINGS = dict(INIT_DB=False, EXPIRY_SCHEDULER=False, AUTH_ENABLED=False, METRICS_ENABLED=False,
+                SECRET_KEY="test")
+
+
+@pytest.fixture
+def computers(database):
+    # Ответ /computers больше COMPRESS_MIN_SIZE — сжимается
+    for number in range(50):
+        F.add_computer("101", f"PC-{number:02d}")
+
+
+def check_revalidation(get):
+    """ETag и Vary в 304 совпадают с ответом 200 — со сжатием и без"""
+    for headers, weak in (({"Accept-Encoding": "gzip"}, True), ({"Accept-Encoding": "identity"}, False)):
+        response = get("/computers", headers)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert etag.startswith('W/') == weak
+        assert (response.headers.get("Content-Encoding") == "gzip") == weak
+
+        revalidated = get("/computers", {**headers, "If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["ETag"] == etag
+        assert revalidated.headers.get("Vary") == response.headers.get("Vary")
+        assert "Accept-Encoding" in response.headers["Vary"]
+
+
+def test_flask_304_repeats_compressed_etag(computers):
+    client = create_app(**SETTINGS).test_client()
+    check_revalidation(lambda url, headers: client.get(url, headers=headers))
+
+
+def test_async_304_repeats_compressed_etag(computers):
+    from starlette.testclient import TestClient
+    from license_manager_backend.async_app import create_async_app
+
+    with TestClient(create_async_app(**SETTINGS)) as client:
+        check_revalidation(lambda url, headers: client.get(url, headers=headers))
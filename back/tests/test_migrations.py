@@ -0,0 +1,43 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from database import DB
+
+
+def make_v5_database(licenses):
+    """База на версии 5 (даты текстом) с компьютером 1 и лицензиями (start, end)."""
+    DB.init_db(version=5)
+    with DB.get_connection() as conn:
+        conn.execute("INSERT INTO computers (room_number, computer_name) VALUES ('101', 'PC-01')")
+        conn.executemany(
+            "INSERT INTO licenses (computer_id, software, license_start, license_end, budget) "
+            "VALUES (1, 'Office', ?, ?, NULL)", licenses)
+    return DB.get_connection()
+
+
+def test_dates_without_leading_zeros_are_migrated(db_path):
+    conn = make_v5_database([("2025-01-01", "2026-01-01"), ("2025-1-5", "2026-2-3"), (" 2025-3-07 ", "2026-03-07")])
+
+    assert DB.migrate() == len(DB.MIGRATIONS)
+
+    rows = conn.execute("SELECT id, license_start, license_end FROM licenses ORDER BY id").fetchall()
+    assert rows == [
+        (1, DB.to_day(date(2025, 1, 1)), DB.to_day(date(2026, 1, 1))),
+        (2, DB.to_day(date(2025, 1, 5)), DB.to_day(date(2026, 2, 3))),
+        (3, DB.to_day(date(2025, 3, 7)), DB.to_day(date(2026, 3, 7))),
+    ]
+    assert conn.execute("SELECT license_start FROM licenses_iso WHERE id = 2").fetchone() == ("2025-01-05",)
+
+
+def test_unparsable_dates_stop_migration_with_ids(db_path):
+    conn = make_v5_database([("2025-01-01", "2026-01-01"), ("01.02.2025", "2026-01-01"), ("2025-01-01", "never")])
+
+    with pytest.raises(sqlite3.IntegrityError, match=r"id 2, 3"):
+        DB.migrate()
+
+    # Миграция откатилась целиком: версия и данные прежние
+    assert DB.get_schema_version(conn) == 5
+    assert conn.execute("SELECT license_start FROM licenses ORDER BY id").fetchall() == [
+        ("2025-01-01",), ("01.02.2025",), ("2025-01-01",)]
@@ -0,0 +1,14 @@
+from benchmarks.common import fill_database
+from benchmarks.query_plans import LOOKUPS, check
+
+import database.Functions as F
+
+
+def test_lookups_use_indexes(database):
+    fill_database(computers=200, licenses=2000)
+    F.refresh_license_summary()
+
+    failures = check(LOOKUPS)
+
+    assert not failures, "\n".join(f"SCAN в {name}: {sql}\n  " + "; ".join(plan) for name, sql, plan in failures)
+
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from database import DB, Cache
+import database.Functions as F
+from license_manager_backend.main import create_app
+
+
+@pytest.fixture
+def snapshot_client(database, monkeypatch):
+    monkeypatch.setattr(Cache, "ENABLED", True)
+    Cache.cache.clear()
+    computer_id = F.add_computer("101", "PC-01")
+    F.add_license(computer_id, "Office", "2025-01-01", "2026-01-01", 100)
+    app = create_app(INIT_DB=False, EXPIRY_SCHEDULER=False, AUTH_ENABLED=False, METRICS_ENABLED=False,
+                     SECRET_KEY="test", SNAPSHOT_ENABLED=True, SNAPSHOT_INTERVAL=3600)
+    yield app.test_client()
+    DB.snapshot_refresher.stop()
+    DB.SNAPSHOT_ENABLED = False
+    DB.close_connection()
+    os.remove(DB.snapshot_path())
+
+
+@pytest.mark.parametrize("url", ["/licenses/search?software=Office", "/licenses/summary"])
+def test_repeated_snapshot_read_keeps_age_header(snapshot_client, url):
+    for _ in range(2):
+        response = snapshot_client.get(url)
+        assert response.status_code == 200
+        assert "X-Snapshot-Age" in response.headers
+
+
+def test_snapshot_reads_bypass_result_cache(snapshot_client):
+    hits = Cache.cache.hits
+    F.search_licenses(software="Office")
+    F.search_licenses(software="Office")
+    assert Cache.cache.hits == hits
+
+    # Новая лицензия видна со снимка только после его обновления
+    F.add_license(1, "Office", "2025-01-01", "2026-01-01", None)
+    assert len(F.search_licenses(software="Office")) == 1
+    assert len(F.get_licenses()) == 1
+    DB.refresh_snapshot()
+    assert len(F.search_licenses(software="Office")) == 2
+    assert len(F.get_licenses()) == 2
+
+
+def test_license_pages_read_main_database(snapshot_client):
+    F.add_license(1, "Office", "2025-01-01", "2026-01-01", None)
+    response = snapshot_client.get("/licenses?limit=10")
+    assert "X-Snapshot-Age" not in response.headers
+    assert len(response.get_json()["data"]) == 2
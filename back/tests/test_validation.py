@@ -0,0 +1,65 @@
+import pytest
+
+import database.Functions as F
+from license_manager_backend import schemas
+from license_manager_backend.main import create_app
+
+TOO_BIG = 2 ** 70
+LICENSE = {"software": "Office", "license_start": "2025-01-01", "license_end": "2026-01-01"}
+
+
+@pytest.fixture
+def client(database):
+    computer_id = F.add_computer("101", "PC-01")
+    F.add_license(computer_id, "Office", "2025-01-01", "2026-01-01", None)
+    app = create_app(INIT_DB=False, EXPIRY_SCHEDULER=False, AUTH_ENABLED=False, METRICS_ENABLED=False,
+                     SECRET_KEY="test")
+    return app.test_client()
+
+
+@pytest.mark.parametrize("value", [0, -1, TOO_BIG, schemas.MAX_ID + 1, 1.5, True, "x"])
+def test_id_field_rejects_out_of_range_and_non_integers(value):
+    values, error = schemas.LICENSE.parse(dict(LICENSE, computer_id=value))
+    assert values is None
+    assert error.startswith("computer_id должен быть")
+
+
+def test_id_field_accepts_largest_sqlite_integer():
+    values, error = schemas.LICENSE.parse(dict(LICENSE, computer_id=schemas.MAX_ID))
+    assert error is None
+    assert values["computer_id"] == schemas.MAX_ID
+
+
+@pytest.mark.parametrize("method, url", [("post", "/licenses"), ("put", "/licenses/1")])
+def test_huge_computer_id_is_400(client, method, url):
+    response = getattr(client, method)(url, json=dict(LICENSE, computer_id=TOO_BIG))
+    assert response.status_code == 400
+    assert str(schemas.MAX_ID) in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("license_id", [1.9, True, TOO_BIG, None, "1x"])
+def test_bulk_update_item_id_goes_through_schema(client, license_id):
+    item = {"software": "Changed"} if license_id is None else {"id": license_id, "software": "Changed"}
+    response = client.patch("/licenses?mode=atomic", json=[item])
+    assert response.status_code == 400
+    assert F.get_licenses()[0].software == "Office"
+
+
+def test_bulk_update_accepts_numeric_string_id(client):
+    response = client.patch("/licenses", json=[{"id": "1", "software": "Changed"}])
+    assert response.status_code == 200
+    assert F.get_licenses()[0].software == "Changed"
+
+
+def test_expired_before_uses_schema_date_parser(client):
+    response = client.delete("/licenses?expired_before=2025-1-1")
+    assert response.status_code == 400
+    assert "expired_before" in response.get_json()["error"]
+
+
+@pytest.mark.parametrize("url", ["/licenses", "/computers"])
+@pytest.mark.parametrize("ids", [[TOO_BIG], [1, 0], [True], [1.0]])
+def test_bulk_delete_rejects_bad_ids(client, url, ids):
+    response = client.delete(url, json=ids)
+    assert response.status_code == 400
+    assert len(F.get_licenses()) == 1